@@ -0,0 +1,72 @@
+"""
+Per-robot cost of monitoring a fleet: N synthetic robotmon streams replayed
+in real time into one Fleet, with CPU time of the shared reader thread, of
+the whole process, thread count and memory per robot.
+
+    python benchmarks/bench_fleet.py [--robots 1 4 16 32] [--seconds 10] [--rate 20]
+"""
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fleet import Fleet
+from robotmon_capture import synthesize_capture
+
+
+def thread_cpu(native_id):
+    """CPU seconds used by one thread (Linux); None elsewhere."""
+    try:
+        with open(f"/proc/self/task/{native_id}/stat", "r") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def run(count, seconds, rate, captures):
+    rss0 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    threads0 = threading.active_count()
+    robots = {f"cell{i}": {"replay_file": captures[i % len(captures)]} for i in range(count)}
+    with Fleet(robots, log=lambda msg, debug=False: None) as fleet:
+        cpu0 = time.process_time()
+        fleet.start()
+        time.sleep(seconds)
+        cpu = time.process_time() - cpu0
+        reader_cpu = thread_cpu(fleet.reader_thread.native_id)
+        updates = sum(link.state.seq for link in fleet.links.values())
+        chunks = sum(link.reader.chunks for link in fleet.links.values())
+        threads = threading.active_count() - threads0
+        live = sum(1 for entry in fleet.status().values() if entry["stream"] == "streaming")
+    rss = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss0) / 1024
+    reader = "n/a" if reader_cpu is None else f"{reader_cpu / seconds / count * 100:.2f}%"
+    print(f"{count:>4} robots ({live} live): {chunks / seconds:7.0f} chunks/s, {updates / seconds:7.0f} state changes/s;"
+          f" reader thread {reader} CPU per robot, process {cpu / seconds / count * 100:.2f}% per robot"
+          f" (incl. replay feeders); {threads} threads; +{rss:.1f} MB peak RSS")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--robots", type=int, nargs="+", default=[1, 4, 16, 32])
+    ap.add_argument("--seconds", type=float, default=10.0)
+    ap.add_argument("--rate", type=float, default=20.0, help="robotmon redraws per second per robot")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        frames = int(args.seconds * args.rate) + 50
+        captures = []
+        for seed in range(4):
+            path = os.path.join(tmp, f"cell{seed}.rmcap")
+            synthesize_capture(path, frames=frames, seed=seed, rate_hz=args.rate)
+            captures.append(path)
+        for count in args.robots:
+            run(count, args.seconds, args.rate, captures)
+
+
+if __name__ == "__main__":
+    main()
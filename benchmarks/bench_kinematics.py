@@ -0,0 +1,88 @@
+"""
+Kinematics throughput: poses per second for batched FK, warm-started IK
+along a jog path (the interactive case), batched IK and cold IK.
+
+    python benchmarks/bench_kinematics.py [--poses N] [--seed S]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from kinematics import EI65Kinematics
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def bench_fk(kin, joints):
+    _, elapsed = timed(kin.fk, joints)
+    print(f"FK batch of {len(joints)}: {elapsed * 1e3:.1f} ms -> {len(joints) / elapsed:,.0f} poses/s")
+    _, elapsed = timed(kin.jacobian, joints)
+    print(f"Jacobian batch of {len(joints)}: {elapsed * 1e3:.1f} ms -> {len(joints) / elapsed:,.0f} /s")
+    start = time.perf_counter()
+    for q in joints[:1000]:
+        kin.fk(q)
+    elapsed = time.perf_counter() - start
+    print(f"FK one at a time: {min(1000, len(joints)) / elapsed:,.0f} poses/s")
+
+
+def bench_jog(kin, start, steps):
+    """Cartesian jog: 0.1 mm steps along a line, each solve seeded by the previous one."""
+    base = kin.fk(start)
+    targets = np.repeat(base[None], steps, axis=0)
+    targets[:, 0, 3] += 0.1 * np.arange(steps)
+    kin.last_solution = start.copy()
+    solved = 0
+    t0 = time.perf_counter()
+    for target in targets:
+        solved += kin.ik(target).success
+    elapsed = time.perf_counter() - t0
+    print(f"IK jog, warm start: {solved}/{steps} solved, {steps / elapsed:,.0f} poses/s"
+          f" ({elapsed / steps * 1e6:.0f} us each)")
+
+
+def bench_batch(kin, joints, rng):
+    targets = kin.fk(joints)
+    seeds = joints + rng.normal(0, 5.0, joints.shape)
+    (q, success), elapsed = timed(kin.ik_batch, targets, seeds)
+    print(f"IK batch of {len(joints)}, seeds within ~5 deg: {success.sum()}/{len(joints)} solved,"
+          f" {len(joints) / elapsed:,.0f} poses/s")
+
+
+def bench_cold(kin, joints):
+    targets = kin.fk(joints)
+    solved = 0
+    t0 = time.perf_counter()
+    for target in targets:
+        solved += kin.ik(target, seed=np.zeros(6)).success
+    elapsed = time.perf_counter() - t0
+    print(f"IK cold start from zero: {solved}/{len(joints)} solved, {len(joints) / elapsed:,.0f} poses/s")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--poses", type=int, default=10000, help="batch size for FK and batched IK")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    kin = EI65Kinematics()
+    joints = rng.uniform(kin.lower * 0.8, kin.upper * 0.8, (args.poses, 6))
+
+    bench_fk(kin, joints)
+    bench_jog(kin, np.array([0.0, 20.0, 60.0, 0.0, 45.0, 0.0]), 1000)
+    bench_batch(kin, joints[:2000], rng)
+    bench_cold(kin, joints[:100])
+    print(f"Jacobian cache: {kin.cache_hits} hits, {kin.cache_misses} misses")
+
+
+if __name__ == "__main__":
+    main()
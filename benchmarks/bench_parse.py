@@ -0,0 +1,81 @@
+"""
+Compares the full-screen regex parse with the dirty-row RobotmonParser.
+
+Both paths feed the same robotmon chunks through pyte; the regex path then
+parses the joints and PLC bits from the whole display after every chunk, the
+way ssh_stream_function originally did.
+
+    python benchmarks/bench_parse.py [--capture FILE | --frames N --seed N]
+
+Without --capture the synthetic stream from robotmon_sim is used.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import pyte
+
+from robotmon_capture import load_chunks
+from robotmon_parser import RobotmonParser, parse_joint_angles, parse_plc_states
+from robotmon_sim import COLS, ROWS, RobotmonSimulator
+
+
+def run_regex(chunks):
+    screen = pyte.Screen(COLS, ROWS)
+    stream = pyte.ByteStream(screen)
+    parse_time = 0.0
+    start = time.perf_counter()
+    for chunk in chunks:
+        stream.feed(chunk)
+        t0 = time.perf_counter()
+        parse_joint_angles(screen.display)
+        parse_plc_states(screen.display)
+        parse_time += time.perf_counter() - t0
+    return time.perf_counter() - start, parse_time
+
+
+def run_incremental(chunks):
+    screen = pyte.Screen(COLS, ROWS)
+    stream = pyte.ByteStream(screen)
+    parser = RobotmonParser()
+    parse_time = 0.0
+    start = time.perf_counter()
+    for chunk in chunks:
+        stream.feed(chunk)
+        t0 = time.perf_counter()
+        parser.update(screen)
+        parse_time += time.perf_counter() - t0
+    return time.perf_counter() - start, parse_time
+
+
+def report(name, chunks, total, parse_time):
+    n = len(chunks)
+    size = sum(len(c) for c in chunks)
+    print(f"{name:<12} total {total * 1e3:8.1f} ms  parse {parse_time / n * 1e6:8.1f} us/chunk"
+          f"  {n / total:9.0f} chunks/s  {size / total / 1e6:6.2f} MB/s")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--capture", help="robotmon capture recorded with CAPTURE_FILE")
+    ap.add_argument("--frames", type=int, default=5000)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    if args.capture:
+        chunks = load_chunks(args.capture)
+    else:
+        chunks = list(RobotmonSimulator(seed=args.seed).chunks(args.frames))
+    print(f"{len(chunks)} chunks, {sum(len(c) for c in chunks)} bytes")
+    regex = run_regex(chunks)
+    incremental = run_incremental(chunks)
+    report("regex", chunks, *regex)
+    report("incremental", chunks, *incremental)
+    print(f"parse speed-up {regex[1] / incremental[1]:.1f}x, end-to-end {regex[0] / incremental[0]:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
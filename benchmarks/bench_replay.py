@@ -0,0 +1,78 @@
+"""
+End-to-end ingestion and command benchmarks without the robot.
+
+Replays a robotmon capture through ReplayChannel into RobotmonReader (the
+same loop ssh_stream_function runs) and times mcserver round trips against
+the local FakeMcServer.
+
+    python benchmarks/bench_replay.py [--capture FILE] [--realtime] [--queries N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fake_mcserver import FakeMcServer
+from latency_stats import LatencyTracker
+from mcserver_client import McServerClient
+from robotmon_capture import ReplayChannel, synthesize_capture
+from robotmon_session import RobotmonReader
+
+
+def bench_ingest(capture, speed):
+    latency = LatencyTracker(size=100000)
+
+    def on_joints(arrival, angles):
+        latency.record(time.perf_counter() - arrival)
+
+    reader = RobotmonReader(on_joints=on_joints, select_timeout=0.1)
+    channel = ReplayChannel(capture, speed=speed)
+    start = time.perf_counter()
+    reason = reader.run(channel)
+    elapsed = time.perf_counter() - start
+    channel.close()
+    print(f"ingest ({'real time' if speed else 'as fast as possible'}): {reason}")
+    print(f"  {reader.chunks} parse batches, {reader.bytes} bytes in {elapsed:.2f} s"
+          f" -> {reader.chunks / elapsed:.0f} batches/s, {reader.bytes / elapsed / 1e3:.0f} kB/s")
+    print(f"  joint updates: {latency.format()}  (arrival -> callback)")
+
+
+def bench_commands(queries):
+    with FakeMcServer() as server:
+        client = McServerClient("127.0.0.1", server.port)
+        client.query("mode")  # connect outside the timing
+        rtt = LatencyTracker(size=queries)
+        for _ in range(queries):
+            t0 = time.perf_counter()
+            client.query("speed")
+            rtt.record(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        for _ in range(queries):
+            client.move("runForward 0 0 0 0 0 0 0 0")
+        client.query("mode")
+        moves = time.perf_counter() - t0
+        client.close()
+    print(f"mcserver query round trip: {rtt.format()}")
+    print(f"mcserver queued moves: {queries / moves:.0f} commands/s")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--capture", help="robotmon capture; a synthetic one is generated if omitted")
+    ap.add_argument("--realtime", action="store_true", help="replay at the recorded pace")
+    ap.add_argument("--queries", type=int, default=2000)
+    args = ap.parse_args()
+
+    capture = args.capture
+    if capture is None:
+        capture = os.path.join(tempfile.mkdtemp(), "synthetic.rmcap")
+        synthesize_capture(capture, frames=200 if args.realtime else 5000)
+    bench_ingest(capture, 1.0 if args.realtime else None)
+    bench_commands(args.queries)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+State server push latency and fan-out: time from a RobotState change in the
+server process to the change showing up in each client's mirrored state,
+plus the size of a typical delta frame.
+
+    python benchmarks/bench_state_server.py [--clients 1 4 16] [--updates N]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from latency_stats import LatencyTracker
+from robot_core import RobotLink
+from robot_state import JOINT_NAMES, JOINTS_MASK
+from state_server import StateClient, StateServer, encode_delta
+
+
+def bench(count, updates):
+    link = RobotLink(log=lambda msg, debug=False: None)
+    with StateServer(link, port=0) as server:
+        clients = [StateClient(port=server.port) for _ in range(count)]
+        time.sleep(0.1)
+        latency = LatencyTracker(size=updates * count)
+        angles = dict.fromkeys(JOINT_NAMES, 0.0)
+        seqs = [c.state.seq for c in clients]
+        for i in range(updates):
+            angles["S"] = angles["T"] = i * 0.01
+            t0 = time.perf_counter()
+            link.state.update_joints(angles)
+            for n, client in enumerate(clients):
+                snap, _ = client.state.wait(seqs[n], timeout=1.0)
+                seqs[n] = snap.seq
+                latency.record(time.perf_counter() - t0)
+        for client in clients:
+            client.close()
+    print(f"{count:>3} clients: change -> client mirror {latency.format()}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16])
+    ap.add_argument("--updates", type=int, default=2000)
+    args = ap.parse_args()
+
+    link = RobotLink(log=lambda msg, debug=False: None)
+    link.state.update_joints(dict.fromkeys(JOINT_NAMES, 1.0))
+    snap, _ = link.state.snapshot()
+    print(f"delta frame: {len(encode_delta(snap, 0b100001))} bytes for 2 joints,"
+          f" {len(encode_delta(snap, JOINTS_MASK))} bytes for all 8")
+    for count in args.clients:
+        bench(count, args.updates)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Telemetry store throughput: appends per second through the RobotState
+listener path, and how long opening a shift and range-querying it takes.
+
+    python benchmarks/bench_telemetry.py [--rows N] [--keep DIR]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from robot_state import JOINT_NAMES, RobotState
+from telemetry import TelemetryStore
+
+
+def bench_append(path, rows):
+    state = RobotState()
+    store = TelemetryStore(path)
+    store.attach(state)
+    state.update_status({"mode": "TEACH", "speed": "50", "coord": "JOINT", "servo": "ON"})
+    angles = dict.fromkeys(JOINT_NAMES, 0.0)
+    start = time.perf_counter()
+    for i in range(rows):
+        angles["S"] = i * 1e-3
+        state.update_joints(angles)
+        if i % 50 == 0:
+            state.update_plc({"plc_in": i, "plc_out": i >> 1})
+    elapsed = time.perf_counter() - start
+    store.close()
+    print(f"append via RobotState listener: {len(store)} rows in {elapsed:.2f} s"
+          f" -> {len(store) / elapsed:,.0f} rows/s")
+
+
+def bench_bulk(path, rows):
+    """Writes a synthetic shift directly (spread over 8 hours) for the read benchmarks."""
+    store = TelemetryStore(path)
+    t0 = time.time() - 8 * 3600
+    dt = 8 * 3600 / rows
+    joints = [0.0] * len(JOINT_NAMES)
+    start = time.perf_counter()
+    for i in range(rows):
+        joints[0] = np.sin(i * 1e-4) * 90
+        store.append(t0 + i * dt, i, joints, i, i, "TEACH", "50", "JOINT", "ON")
+    elapsed = time.perf_counter() - start
+    store.close()
+    print(f"append direct: {rows / elapsed:,.0f} rows/s")
+    return t0
+
+
+def bench_read(path, t0):
+    start = time.perf_counter()
+    store = TelemetryStore(path, mode="r")
+    opened = time.perf_counter() - start
+    start = time.perf_counter()
+    hour = store.query(t0 + 3600, t0 + 7200, columns=("time", "joints"))
+    queried = time.perf_counter() - start
+    start = time.perf_counter()
+    peak = float(np.abs(store.column("joints")[:, 0]).max())
+    scanned = time.perf_counter() - start
+    size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+    print(f"open {len(store):,} rows ({size / 1e6:.0f} MB on disk): {opened * 1e3:.2f} ms")
+    print(f"query one hour ({len(hour['time']):,} rows): {queried * 1e3:.3f} ms")
+    print(f"full scan of S for its peak ({peak:.1f} deg): {scanned * 1e3:.1f} ms")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--rows", type=int, default=1_000_000, help="rows in the synthetic shift")
+    ap.add_argument("--keep", help="write the stores here and keep them")
+    args = ap.parse_args()
+
+    root = args.keep or tempfile.mkdtemp(prefix="telemetry-bench-")
+    try:
+        bench_append(os.path.join(root, "listener"), min(args.rows, 200_000))
+        shift = os.path.join(root, "shift")
+        t0 = bench_bulk(shift, args.rows)
+        bench_read(shift, t0)
+    finally:
+        if not args.keep:
+            shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+"""
+Benchmark suite for the stream-decode and command hot paths.
+
+Runs every benchmark against a recorded robotmon capture (or the synthetic
+robotmon_sim stream) and the local FakeMcServer, prints one table and can
+save the results as JSON and compare them with an earlier run:
+
+    python benchmarks/suite.py [--capture FILE] [--frames N] [--only decode ...]
+    python benchmarks/suite.py --json before.json
+    python benchmarks/suite.py --compare before.json
+
+Benchmarks:
+    decode      bytes/s and chunks/s through RobotmonScreen + RobotmonParser +
+                RobotState (what RobotLink runs), next to the same with pyte and
+                the old pyte + full-screen regex path
+    parse       per-chunk latency percentiles, split into the feed, parse and
+                enqueue stages via instrumentation.StageTimings
+    gui         cost of one update_gui pass per changed snapshot; with a display
+                the Tk widgets are updated and drawn, without one only the text
+                formatting is timed
+    command     mcserver query and runForward round trips against FakeMcServer
+    envelope    SafetyEnvelope.check per move: target only, and with the
+                interpolated path from the previous target
+    plot        plot_panel.SampleHistory: cost of recording one row, and of
+                decimating a 30 s and a one hour window to 800 pixel columns;
+                columns() is first checked against a brute-force per-column
+                min/max, including a long idle gap inside a block
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import pyte
+
+from fake_mcserver import FakeMcServer
+from instrumentation import StageTimings
+from mcserver_client import McServerClient
+from plc_bits import format_bits
+from robot_state import JOINT_NAMES, JOINTS_MASK, PLC_IN_MASK, PLC_OUT_MASK, STATUS_MASK, RobotState
+from robotmon_capture import load_chunks
+from robotmon_parser import parse_joint_angles, parse_plc_states
+from robotmon_session import COLS, ROWS, RobotmonReader
+from robotmon_sim import RobotmonSimulator
+
+
+def percentiles(samples, prefix, scale=1e6, unit="us"):
+    """p50/p95/p99/max of a list of seconds, as {prefix_p50_us: ...}."""
+    ordered = sorted(samples)
+    if not ordered:
+        return {}
+    pick = lambda p: ordered[min(len(ordered) - 1, round(p / 100 * (len(ordered) - 1)))] * scale
+    return {f"{prefix}_p50_{unit}": pick(50), f"{prefix}_p95_{unit}": pick(95),
+            f"{prefix}_p99_{unit}": pick(99), f"{prefix}_max_{unit}": ordered[-1] * scale}
+
+
+def linked_reader(state, timings=None, decoder="fast"):
+    """A RobotmonReader wired into `state` the way RobotLink wires it."""
+    return RobotmonReader(
+        on_joints=lambda arrival, angles: state.update_joints(angles, arrival),
+        on_plc=lambda arrival, plc: state.update_plc(plc),
+        timings=timings,
+        decoder=decoder,
+    )
+
+
+# --- Benchmarks; each returns {metric: value} ---
+def bench_decode(chunks, args):
+    size = sum(len(c) for c in chunks)
+    result = {}
+    for decoder, prefix in (("fast", ""), ("pyte", "pyte_")):
+        reader = linked_reader(RobotState(), decoder=decoder)
+        start = time.perf_counter()
+        for chunk in chunks:
+            reader.feed(chunk)
+        elapsed = time.perf_counter() - start
+        result[prefix + "MB_per_s"] = size / elapsed / 1e6
+        result[prefix + "chunks_per_s"] = len(chunks) / elapsed
+
+    screen = pyte.Screen(COLS, ROWS)
+    stream = pyte.Stream(screen)
+    start = time.perf_counter()
+    for chunk in chunks:
+        stream.feed(chunk.decode(errors="ignore"))
+        parse_joint_angles(screen.display)
+        parse_plc_states(screen.display)
+    regex = time.perf_counter() - start
+    result["regex_MB_per_s"] = size / regex / 1e6
+    result["regex_chunks_per_s"] = len(chunks) / regex
+    return result
+
+
+def bench_parse(chunks, args):
+    timings = StageTimings()
+    reader = linked_reader(RobotState(), timings)
+    per_chunk = []
+    for chunk in chunks:
+        t0 = time.perf_counter()
+        reader.feed(chunk)
+        per_chunk.append(time.perf_counter() - t0)
+    result = percentiles(per_chunk, "chunk")
+    for stage in ("feed", "parse", "enqueue"):
+        hist = timings.histogram(stage)
+        if hist.count:
+            result[f"{stage}_mean_us"] = hist.total / hist.count * 1e6
+            result[f"{stage}_p99_us"] = hist.percentile(99) * 1e6
+    return result
+
+
+class _TextGui:
+    """The formatting update_gui does, without widgets."""
+
+    def set_joints(self, text):
+        pass
+
+    def set_plc(self, which, text, color):
+        pass
+
+    def set_status(self, *values):
+        pass
+
+    def draw(self):
+        pass
+
+
+class _TkGui:
+    """The same widgets rob_arm_pos updates: a joint label, two PLC labels, four StringVars."""
+
+    def __init__(self):
+        import tkinter as tk
+        self.root = tk.Tk()
+        self.joint_label = tk.Label(self.root, font=("Courier", 10))
+        self.joint_label.pack()
+        self.plc = {which: tk.Label(self.root, font=("Courier", 10)) for which in ("in", "out")}
+        for label in self.plc.values():
+            label.pack()
+        self.vars = [tk.StringVar(self.root) for _ in range(4)]
+        for var in self.vars:
+            tk.Label(self.root, textvariable=var).pack()
+        self.root.update()
+
+    def set_joints(self, text):
+        self.joint_label.config(text=text)
+
+    def set_plc(self, which, text, color):
+        self.plc[which].config(text=text, fg=color)
+
+    def set_status(self, *values):
+        for var, value in zip(self.vars, values):
+            var.set(value)
+
+    def draw(self):
+        self.root.update_idletasks()
+
+
+def bench_gui(chunks, args):
+    try:
+        gui, with_tk = _TkGui(), 1.0
+    except Exception:
+        gui, with_tk = _TextGui(), 0.0
+    state = RobotState()
+    reader = linked_reader(state)
+    state.update_status({"mode": "teach", "speed": "50", "coord": "joint", "servo": "on"})
+    seq = 0
+    costs = []
+    for chunk in chunks:
+        reader.feed(chunk)
+        t0 = time.perf_counter()
+        # Mirrors rob_arm_pos.update_gui
+        snap, changed = state.snapshot(seq)
+        seq = snap.seq
+        if not changed:
+            continue
+        if changed & JOINTS_MASK and snap.joints is not None:
+            angles = snap.joint_dict()
+            gui.set_joints("   ".join([f"{j}: {angles[j]:.6f}" for j in JOINT_NAMES]))
+        if changed & PLC_IN_MASK:
+            gui.set_plc("in", format_bits(snap.plc_in), "green" if snap.plc_in else "red")
+        if changed & PLC_OUT_MASK:
+            gui.set_plc("out", format_bits(snap.plc_out), "green" if snap.plc_out else "red")
+        if changed & STATUS_MASK:
+            gui.set_status(snap.mode, snap.speed, snap.coord, snap.servo)
+        gui.draw()
+        costs.append(time.perf_counter() - t0)
+    if with_tk:
+        gui.root.destroy()
+    result = percentiles(costs, "update")
+    result["snapshots"] = len(costs)
+    result["with_tk"] = with_tk
+    return result
+
+
+def bench_command(chunks, args):
+    with FakeMcServer() as server:
+        client = McServerClient("127.0.0.1", server.port)
+        client.query("mode")   # connect outside the timing
+        queries, moves = [], []
+        for _ in range(args.queries):
+            t0 = time.perf_counter()
+            client.query("speed")
+            queries.append(time.perf_counter() - t0)
+        for _ in range(args.queries):
+            t0 = time.perf_counter()
+            client.submit_query("runForward 0 0 0 0 0 0 0 0").result(timeout=2.0)
+            moves.append(time.perf_counter() - t0)
+        client.close()
+    result = percentiles(queries, "query")
+    result.update(percentiles(moves, "move"))
+    result["queries_per_s"] = len(queries) / sum(queries)
+    return result
+
+
+def bench_envelope(chunks, args):
+    import numpy as np
+    from kinematics import EI65Kinematics
+    from safety_envelope import SafetyEnvelope
+    envelope = SafetyEnvelope(EI65Kinematics())
+    rng = np.random.default_rng(args.seed)
+    # Moves of up to 30 degrees per joint around a pose well above the floor
+    home = np.array([0.0, 10.0, 45.0, 0.0, 35.0, 0.0, 0.0, 0.0])
+    targets = home + rng.uniform(-15.0, 15.0, (args.queries, len(home)))
+    single, paths, steps = [], [], 0
+    for target in targets:
+        t0 = time.perf_counter()
+        envelope.check(target)
+        single.append(time.perf_counter() - t0)
+    previous = home
+    for target in targets:
+        t0 = time.perf_counter()
+        steps += envelope.check(target, previous)
+        paths.append(time.perf_counter() - t0)
+        previous = target
+    result = percentiles(single, "target")
+    result.update(percentiles(paths, "path"))
+    result["path_steps_mean"] = steps / len(paths)
+    return result
+
+
+def brute_columns(history, t0, t1, width, bits):
+    """columns() computed directly from the raw rows of the window, for checking it."""
+    import numpy as np
+    from plot_panel import column_starts
+    t, joints, plc = history.window(t0, t1)
+    t, joints, plc = np.append(t, t1), np.vstack((joints, joints[-1:])), np.vstack((plc, plc[-1:]))
+    cols, starts = column_starts(t, t0, t1, width)
+    ends = np.append(starts[1:], len(t))
+    joint_min = np.array([np.fmin.reduce(joints[a:b]) for a, b in zip(starts, ends)])
+    joint_max = np.array([np.fmax.reduce(joints[a:b]) for a, b in zip(starts, ends)])
+    lanes = np.array([[(int(row[word]) >> bit) & 1 for word, bit in bits] for row in plc])
+    bit_min = np.array([lanes[a:b].min(axis=0) for a, b in zip(starts, ends)])
+    bit_max = np.array([lanes[a:b].max(axis=0) for a, b in zip(starts, ends)])
+    return cols, joint_min, joint_max, bit_min, bit_max
+
+
+def check_plot_columns():
+    """
+    Compares SampleHistory.columns() with brute force on a full, wrapped ring
+    holding a 3000 s idle gap followed by a short burst, in a 30 s and a one
+    hour view. Raises AssertionError on any difference.
+    """
+    import numpy as np
+    from plot_panel import SampleHistory
+    history = SampleHistory(36000)
+    t = 0.0
+    for i in range(30012):
+        t = i * 0.01
+        history.append(t, tuple(float(np.sin(i * 0.001 + j)) for j in range(len(JOINT_NAMES))), i & 1, 0)
+    t += 3000.0
+    for i in range(20):
+        history.append(t + i * 0.01, (90.0,) + (0.0,) * (len(JOINT_NAMES) - 1), 1, 0)
+    newest = history.span()[1]
+    bits = [(0, 0), (1, 0)]
+    for window in (30, 3600):
+        got = history.columns(newest - window, newest, 800, bits)
+        want = brute_columns(history, newest - window, newest, 800, bits)
+        for name, a, b in zip(("cols", "joint_min", "joint_max", "bit_min", "bit_max"),
+                              (got.cols, got.joint_min, got.joint_max, got.bit_min, got.bit_max), want):
+            assert np.array_equal(a, b, equal_nan=True), f"columns() {name} differs from brute force ({window} s)"
+
+
+def bench_plot(chunks, args):
+    from plot_panel import DEFAULT_CAPACITY, SampleHistory
+    check_plot_columns()
+    history = SampleHistory()
+    joints = tuple(float(i) for i in range(len(JOINT_NAMES)))
+    # One hour at 100 changes per second, so the ring is full and wrapped
+    start = time.perf_counter()
+    for i in range(DEFAULT_CAPACITY + 1000):
+        history.append(i * 0.01, joints, i & 0xff, 3)
+    result = {"append_us": (time.perf_counter() - start) / (DEFAULT_CAPACITY + 1000) * 1e6}
+    newest = history.span()[1]
+    for window in (30, 3600):
+        costs = []
+        for _ in range(50):
+            t0 = time.perf_counter()
+            history.columns(newest - window, newest, 800, [(0, 0), (0, 1), (1, 0)])
+            costs.append(time.perf_counter() - t0)
+        result.update(percentiles(costs, f"window{window}s"))
+    return result
+
+
+BENCHMARKS = {
+    "decode": bench_decode,
+    "parse": bench_parse,
+    "gui": bench_gui,
+    "command": bench_command,
+    "envelope": bench_envelope,
+    "plot": bench_plot,
+}
+
+
+# --- Reporting ---
+def compare(results, baseline):
+    """Lines of metric: baseline -> now (ratio) for every metric both runs have."""
+    lines = []
+    for name, metrics in results.items():
+        old = baseline.get(name, {})
+        for metric, value in metrics.items():
+            if metric in old and old[metric]:
+                lines.append(f"{name + '.' + metric:<32} {old[metric]:>12.3f} -> {value:>12.3f}"
+                             f"  ({value / old[metric]:.2f}x)")
+    return lines
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--capture", help="robotmon capture; the synthetic stream is used if omitted")
+    ap.add_argument("--frames", type=int, default=5000, help="synthetic redraws")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--queries", type=int, default=1000, help="mcserver round trips per command kind")
+    ap.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="run only these benchmarks")
+    ap.add_argument("--json", help="save the results here")
+    ap.add_argument("--compare", help="results JSON of an earlier run to compare against")
+    args = ap.parse_args()
+
+    if args.capture:
+        chunks = load_chunks(args.capture)
+        source = args.capture
+    else:
+        chunks = list(RobotmonSimulator(seed=args.seed).chunks(args.frames))
+        source = f"synthetic, {args.frames} frames, seed {args.seed}"
+    print(f"{source}: {len(chunks)} chunks, {sum(len(c) for c in chunks)} bytes")
+
+    results = {}
+    for name in args.only or BENCHMARKS:
+        start = time.perf_counter()
+        results[name] = BENCHMARKS[name](chunks, args)
+        print(f"\n{name} ({time.perf_counter() - start:.1f} s)")
+        for metric, value in results[name].items():
+            print(f"  {metric:<24} {value:12.3f}")
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)["results"]
+        print(f"\ncompared with {args.compare}")
+        print("\n".join(compare(results, baseline)) or "  no common metrics")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "source": source,
+                "results": results,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""
+Command line access to an EI65 controller, without the GUI.
+
+    python ei65_cli.py stream [--count N] [--max-rate HZ]    JSON line per state change
+    python ei65_cli.py status                                MODE/SPEED/COORD/SERVO as JSON
+    python ei65_cli.py move S L U R B T J7 J8                one runForward
+    python ei65_cli.py move -                                one runForward per stdin line
+    python ei65_cli.py pose X Y Z RX RY RZ                   IK from the live joints, then runForward
+    python ei65_cli.py run PROGRAM [--loops N] [--lead DEG]  waypoint program, prints segment timings
+    python ei65_cli.py jog AXIS=V [AXIS=V ...] --duration S   jog (V in -1..1) for S seconds, then stop
+    python ei65_cli.py jog -                                 one jog step per stdin line
+    python ei65_cli.py record DIR [--duration S]             append state changes to a telemetry store
+    python ei65_cli.py serve [--bind ADDR] [--serve-port N]  share state and commands with local clients
+    python ei65_cli.py speed N
+    python ei65_cli.py stop
+
+stdin moves are either 8 whitespace separated numbers, a JSON list of 8
+numbers, or a JSON object keyed by joint name. Global options: --host,
+--port, --ssh-host, --credentials, --replay FILE, --replay-speed X,
+--envelope FILE (joint limits and keep-out boxes every move is checked
+against, see safety_envelope), --timings (per-stage robotmon timings on stderr at exit) and --timings-file
+FILE (the same in Prometheus text format).
+"""
+import argparse
+import json
+import sys
+import time
+
+from robot_core import DEFAULT_CREDENTIALS_FILE, DEFAULT_ENVELOPE_FILE, DEFAULT_HOST, MCSERVER_PORT, RobotLink
+from robot_state import JOINT_NAMES
+
+
+def log_to_stderr(msg, debug=False):
+    print(f"[{time.strftime('%H:%M:%S')}] {msg}", file=sys.stderr, flush=True)
+
+
+def parse_move_line(line):
+    """Returns 8 joint values from a stdin line, or None for blank/comment lines."""
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+    if line[0] in "[{":
+        data = json.loads(line)
+        if isinstance(data, dict):
+            return [float(data[name]) for name in JOINT_NAMES]
+        return [float(v) for v in data]
+    return [float(v) for v in line.split()]
+
+
+def cmd_stream(link, args):
+    link.start_stream()
+    min_interval = 1.0 / args.max_rate if args.max_rate else 0.0
+    seq = 0
+    printed = 0
+    last = 0.0
+    while args.count is None or printed < args.count:
+        result = link.state.wait(seq, timeout=1.0)
+        if result is None:
+            if not link.streaming:  # stream ended or could not be opened
+                return 0
+            continue
+        if min_interval:
+            wait = last + min_interval - time.monotonic()
+            if wait > 0:
+                # Coalesce everything that arrives meanwhile into one line
+                time.sleep(wait)
+                result = link.state.snapshot(seq)
+        snap, changed = result
+        seq = snap.seq
+        last = time.monotonic()
+        record = snap.as_dict(changed)
+        record["t"] = time.time()
+        print(json.dumps(record), flush=True)
+        printed += 1
+    return 0
+
+
+def cmd_record(link, args):
+    from telemetry import TelemetryStore
+    with TelemetryStore(args.store) as store:
+        before = len(store)
+        store.attach(link.state)
+        link.start_stream()
+        deadline = None if args.duration is None else time.monotonic() + args.duration
+        try:
+            while link.streaming and (deadline is None or time.monotonic() < deadline):
+                time.sleep(0.2)
+        finally:
+            log_to_stderr(f"Recorded {len(store) - before} rows to {args.store}")
+    return 0
+
+
+def cmd_serve(link, args):
+    from state_server import StateServer
+    with StateServer(link, host=args.bind, port=args.serve_port):
+        link.start_stream()
+        while link.streaming:
+            time.sleep(0.5)
+    return 0
+
+
+def cmd_status(link, args):
+    print(json.dumps(link.query_status(args.timeout)))
+    return 0
+
+
+def cmd_move(link, args):
+    if link.envelope is not None:
+        # The path to each target is checked from the live joints
+        link.start_stream()
+        if link.state.wait_live(timeout=args.timeout) is None:
+            raise ValueError("No live joint state from robotmon to check the move path from")
+    if args.values == ["-"]:
+        moves = (parse_move_line(line) for line in sys.stdin)
+    else:
+        moves = [[float(v) for v in args.values]]
+    count = 0
+    for values in moves:
+        if values is None:
+            continue
+        link.move(values).result(timeout=args.timeout)
+        count += 1
+    log_to_stderr(f"Sent {count} move command(s)")
+    return 0
+
+
+def cmd_pose(link, args):
+    from kinematics import pose_matrix
+    link.start_stream()
+    if link.state.wait_live(timeout=args.timeout) is None:
+        raise ValueError("No live joint state from robotmon to seed IK from")
+    future, values = link.move_pose(pose_matrix(args.pose[:3], args.pose[3:]))
+    future.result(timeout=args.timeout)
+    print(json.dumps(dict(zip(JOINT_NAMES, values))))
+    return 0
+
+
+def cmd_run(link, args):
+    from program_runner import ProgramRunner, format_report
+    runner = ProgramRunner.from_file(link, args.program, tolerance=args.tolerance, lead=args.lead)
+    link.start_stream()
+    try:
+        runner.run(args.loops)
+    except KeyboardInterrupt:
+        runner.stop()
+        raise
+    finally:
+        print(format_report(runner.timings))
+    return 0
+
+
+def parse_jog_axes(words):
+    """{axis: deflection} from words like "L=0.5" or "Z=-1"."""
+    axes = {}
+    for word in words:
+        axis, sep, value = word.partition("=")
+        if not sep:
+            raise ValueError(f"jog axes are AXIS=VALUE, not {word!r}")
+        axes[axis.upper()] = float(value)
+    return axes
+
+
+def cmd_jog(link, args):
+    """
+    Jogs with the given deflections for --duration seconds. With '-', every
+    stdin line is "AXIS=V ... SECONDS" (blank deflections: pause), so jog
+    sequences can be scripted; stop goes out after each step.
+    """
+    from jog import Jogger
+    jogger = Jogger(link, rate=args.rate, joint_speed=args.joint_speed,
+                    linear_speed=args.linear_speed, angular_speed=args.angular_speed)
+    link.start_stream()
+    if link.state.wait_live(timeout=args.timeout) is None:
+        raise ValueError("No live joint state from robotmon to jog from")
+    if args.axes == ["-"]:
+        steps = (line.split() for line in sys.stdin if line.strip() and not line.startswith("#"))
+        steps = ((parse_jog_axes(words[:-1]), float(words[-1])) for words in steps)
+    else:
+        steps = [(parse_jog_axes(args.axes), args.duration)]
+    jogger.start()
+    try:
+        for axes, duration in steps:
+            jogger.set_axes(axes, args.frame)
+            end = time.monotonic() + duration
+            while time.monotonic() < end:
+                if axes and not jogger.jogging:
+                    raise RuntimeError("jog aborted, see log")
+                time.sleep(0.01)
+            jogger.release_all()
+    finally:
+        jogger.close()
+    log_to_stderr(f"Jog: {jogger.sent} targets sent, {jogger.coalesced} ticks coalesced, "
+                  f"{jogger.stops} stop(s); ack {jogger.ack_latency.format()}")
+    return 0
+
+
+def cmd_speed(link, args):
+    link.set_speed(args.speed).result(timeout=args.timeout)
+    return 0
+
+
+def cmd_stop(link, args):
+    link.stop()
+    return 0
+
+
+def build_parser():
+    ap = argparse.ArgumentParser(description="Headless EI65 controller access")
+    ap.add_argument("--host", default=DEFAULT_HOST, help="controller address (mcserver and SSH)")
+    ap.add_argument("--port", type=int, default=MCSERVER_PORT, help="mcserver port")
+    ap.add_argument("--ssh-host", help="robotmon SSH host if different from --host")
+    ap.add_argument("--credentials", default=DEFAULT_CREDENTIALS_FILE)
+    ap.add_argument("--replay", help="use a robotmon capture instead of SSH")
+    ap.add_argument("--replay-speed", type=float, default=1.0, help="0 = as fast as possible")
+    ap.add_argument("--timeout", type=float, default=2.0, help="seconds to wait for mcserver")
+    ap.add_argument("--envelope", default=DEFAULT_ENVELOPE_FILE, help="safety envelope file checked before every move")
+    ap.add_argument("--debug", action="store_true")
+    ap.add_argument("--timings", action="store_true", help="print per-stage robotmon timings at exit")
+    ap.add_argument("--timings-file", help="write per-stage timings here at exit (Prometheus text format)")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("stream", help="print joint/PLC/status changes as JSON lines")
+    p.add_argument("--count", type=int, help="exit after this many lines")
+    p.add_argument("--max-rate", type=float, help="at most this many lines per second")
+    p.set_defaults(func=cmd_stream)
+
+    p = sub.add_parser("record", help="record state changes into a telemetry store directory")
+    p.add_argument("store")
+    p.add_argument("--duration", type=float, help="seconds to record (default: until the stream ends)")
+    p.set_defaults(func=cmd_record)
+
+    p = sub.add_parser("serve", help="run the local state/command server (see state_server)")
+    p.add_argument("--bind", default="127.0.0.1")
+    p.add_argument("--serve-port", type=int, default=8056)
+    p.set_defaults(func=cmd_serve)
+
+    sub.add_parser("status", help="query MODE/SPEED/COORD/SERVO").set_defaults(func=cmd_status)
+
+    p = sub.add_parser("move", help="send runForward; '-' reads one move per stdin line")
+    p.add_argument("values", nargs="+")
+    p.set_defaults(func=cmd_move)
+
+    p = sub.add_parser("pose", help="move the flange to X Y Z (mm) RX RY RZ (deg, extrinsic XYZ)")
+    p.add_argument("pose", nargs=6, type=float)
+    p.set_defaults(func=cmd_pose)
+
+    p = sub.add_parser("run", help="run a waypoint program (see program_runner)")
+    p.add_argument("program")
+    p.add_argument("--loops", type=int, default=1)
+    p.add_argument("--tolerance", type=float, help="arrival window in degrees (overrides the file)")
+    p.add_argument("--lead", type=float, help="send the next target this many degrees before arrival")
+    p.set_defaults(func=cmd_run)
+
+    p = sub.add_parser("jog", help="jog axes at a fraction of jog speed for a while (see jog)")
+    p.add_argument("axes", nargs="+", help="AXIS=V with V in -1..1, or '-' for steps from stdin")
+    p.add_argument("--duration", type=float, default=1.0, help="seconds to jog")
+    p.add_argument("--frame", choices=("joint", "cartesian"), default="joint")
+    p.add_argument("--rate", type=float, default=20.0, help="control ticks per second")
+    p.add_argument("--joint-speed", type=float, default=10.0, help="deg/s at full deflection")
+    p.add_argument("--linear-speed", type=float, default=50.0, help="mm/s at full deflection")
+    p.add_argument("--angular-speed", type=float, default=10.0, help="deg/s at full deflection")
+    p.set_defaults(func=cmd_jog)
+
+    p = sub.add_parser("speed", help="set the speed (0-10000)")
+    p.add_argument("speed", type=int)
+    p.set_defaults(func=cmd_speed)
+
+    sub.add_parser("stop", help="stop the robot").set_defaults(func=cmd_stop)
+    return ap
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == "move" and args.values != ["-"] and len(args.values) != len(JOINT_NAMES):
+        build_parser().error(f"move needs {len(JOINT_NAMES)} joint values or '-'")
+    timings = None
+    if args.timings or args.timings_file:
+        from instrumentation import StageTimings
+        timings = StageTimings()
+    link = RobotLink(
+        host=args.host, port=args.port, ssh_host=args.ssh_host,
+        credentials_file=args.credentials, replay_file=args.replay, envelope_file=args.envelope,
+        replay_speed=args.replay_speed or None, timings=timings, log=log_to_stderr, debug=args.debug,
+    )
+    try:
+        return args.func(link, args)
+    except KeyboardInterrupt:
+        return 130
+    except Exception as e:
+        log_to_stderr(f"Error: {e}")
+        return 1
+    finally:
+        link.close()
+        if args.timings:
+            print(timings.format(), file=sys.stderr, flush=True)
+        if args.timings_file:
+            with open(args.timings_file, "w") as f:
+                f.write(timings.prometheus())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""
+Local stand-in for the mcserver command port.
+
+Speaks the same prompt-framed line protocol the controller does: a greeting
+ending in "mcserver>", then one reply plus a fresh prompt per command. It
+understands the commands the GUI uses (mode, speed, coord, servo, runForward,
+stop) and records everything it receives, so command paths can be tested and
+benchmarked without the robot.
+
+    python fake_mcserver.py [--host 127.0.0.1] [--port 8055] [--delay SECONDS]
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+PROMPT = b"mcserver>"
+
+
+class FakeMcServerState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.mode = "teach"
+        self.coord = "joint"
+        self.speed = 50
+        self.servo = "on"
+        self.target = None
+        self.commands = []   # (monotonic time, command) for every line received
+
+    def handle(self, line):
+        """Returns the reply text for one command line."""
+        with self.lock:
+            self.commands.append((time.monotonic(), line))
+            parts = line.split()
+            if not parts:
+                return ""
+            cmd, args = parts[0], parts[1:]
+            if cmd == "mode":
+                return f"current mode: {self.mode}"
+            if cmd == "coord":
+                return f"current mode: {self.coord}"
+            if cmd == "servo":
+                if args:
+                    self.servo = args[0].lower()
+                return f"servo {self.servo}"
+            if cmd == "speed":
+                if args:
+                    self.speed = int(args[0])
+                return str(self.speed)
+            if cmd == "runForward":
+                self.target = [float(a) for a in args]
+                return "ok"
+            if cmd == "stop":
+                self.target = None
+                return "ok"
+            return f"unknown command: {cmd}"
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        server = self.server
+        sock = self.request
+        sock.sendall(b"Elite mcserver (fake)\r\n" + PROMPT)
+        buf = b""
+        while True:
+            try:
+                data = sock.recv(4096)
+            except OSError:
+                return
+            if not data:
+                return
+            buf += data
+            while b"\n" in buf:
+                raw, buf = buf.split(b"\n", 1)
+                line = raw.decode(errors="ignore").strip()
+                reply = server.state.handle(line)
+                if server.reply_delay:
+                    time.sleep(server.reply_delay)
+                try:
+                    sock.sendall(reply.encode() + b"\r\n" + PROMPT)
+                except OSError:
+                    return
+
+
+class FakeMcServer(socketserver.ThreadingTCPServer):
+    """Threaded fake mcserver. Port 0 picks a free port; see .port."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=0, reply_delay=0.0):
+        super().__init__((host, port), _Handler)
+        self.state = FakeMcServerState()
+        self.reply_delay = reply_delay
+        self._thread = None
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        """Serves from a background thread and returns self."""
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-mcserver", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        if self._thread is not None:
+            self.shutdown()
+            self._thread.join()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Fake mcserver for offline testing")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8055)
+    ap.add_argument("--delay", type=float, default=0.0, help="seconds to wait before each reply")
+    args = ap.parse_args()
+    server = FakeMcServer(args.host, args.port, args.delay)
+    print(f"Fake mcserver listening on {args.host}:{server.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+"""
+Several EI65 cells from one process.
+
+Each robot is a RobotLink with its own pyte screen, parser, RobotState and
+mcserver connection. Instead of one blocking reader thread per robot, a
+single selector thread reads every robotmon channel that has data and feeds
+it to that robot's reader. Connecting (SSH login plus robotmon start-up
+takes seconds) runs on a bounded thread pool, and broadcast commands on a
+second one, so a slow or unreachable cell never holds up the others and a
+stop-all is never queued behind SSH logins.
+
+The reader thread also runs each robot's watchdog (stream_supervisor's
+SessionWatch, with the timeouts of that link's StreamSupervisor): a session
+that goes quiet is probed, marked stale and dropped like under run_stream,
+and a lost or failed connection is retried on the connect pool after the
+supervisor's backoff.
+
+Fleet files are JSON, one entry per cell with RobotLink arguments:
+
+    {"robots": [
+        {"name": "cell1", "host": "192.168.1.200"},
+        {"name": "cell2", "host": "192.168.1.201", "credentials_file": "cell2_credentials"},
+        {"name": "bench", "replay_file": "captures/cell1.rmcap"}
+    ]}
+
+    python fleet.py FLEET.json [--interval S] [--stop-all]
+"""
+import argparse
+import json
+import queue
+import selectors
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from robot_core import RobotLink
+
+# Longest wait between watchdog passes over the open sessions and due reconnects
+WATCHDOG_INTERVAL = 0.25
+
+
+def load_fleet(path):
+    """Reads a fleet file. Returns {name: RobotLink keyword arguments}."""
+    with open(path, "r") as f:
+        data = json.load(f)
+    robots = {}
+    for i, entry in enumerate(data["robots"] if isinstance(data, dict) else data):
+        entry = dict(entry)
+        name = entry.pop("name", None) or entry.get("host") or f"robot{i + 1}"
+        if name in robots:
+            raise ValueError(f"{path}: duplicate robot name {name!r}")
+        robots[name] = entry
+    return robots
+
+
+class Fleet:
+    """N RobotLinks sharing one robotmon reader thread and bounded worker pools."""
+
+    def __init__(self, robots, max_workers=8, log=print):
+        """
+        Args:
+            robots: {name: RobotLink or dict of RobotLink keyword arguments}.
+            max_workers: Threads for connecting, and separately for broadcast commands.
+            log: Called with (message) from any thread; messages are prefixed with the robot name.
+        """
+        self._log = log
+        self.links = {}
+        for name, robot in robots.items():
+            if not isinstance(robot, RobotLink):
+                robot = RobotLink(log=self._robot_log(name), **robot)
+            self.links[name] = robot
+        self._connect_pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fleet-connect")
+        self._command_pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fleet-command")
+        self._selector = selectors.DefaultSelector()
+        self._pending = queue.SimpleQueue()
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._selector.register(self._wake_r, selectors.EVENT_READ, None)
+        self._retry_at = {}   # name -> monotonic time of the next reconnect; reader thread only
+        self.reader_thread = None
+        self._stopped = False
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        return cls(load_fleet(path), **kwargs)
+
+    def _robot_log(self, name):
+        def log(msg, debug=False):
+            if debug:
+                self._log(f"[{name}] {msg}", debug=True)
+            else:
+                self._log(f"[{name}] {msg}")
+        return log
+
+    def __getitem__(self, name):
+        return self.links[name]
+
+    def __iter__(self):
+        return iter(self.links)
+
+    def __len__(self):
+        return len(self.links)
+
+    # --- robotmon streams ---
+    def start(self):
+        """Starts the reader thread and connects every robot in the background."""
+        self._stopped = False
+        self.reader_thread = threading.Thread(target=self._read_loop, name="fleet-reader", daemon=True)
+        self.reader_thread.start()
+        for name in self.links:
+            self.connect(name)
+
+    def connect(self, name):
+        """(Re)opens one robot's robotmon stream on the pool. Returns a Future."""
+        return self._connect_pool.submit(self._open, name)
+
+    def _open(self, name):
+        # begin_stream() (reader reset, capture) is left to the reader thread, see _register_pending
+        opened = self.links[name].open_stream(begin=False)
+        # A failed attempt is queued as well, so the reader thread can schedule the retry
+        self._pending.put((name,) + (opened or (None, None)))
+        self._wake_w.send(b"\0")
+        return opened is not None
+
+    def _read_loop(self):
+        registered = {}   # name -> selector key
+        next_check = time.monotonic() + WATCHDOG_INTERVAL
+        while not self._stopped:
+            for key, _ in self._selector.select(max(0.0, next_check - time.monotonic())):
+                if key.data is None:
+                    self._register_pending(registered)
+                    continue
+                name, closeable, channel, watch = key.data
+                if registered.get(name) is not key:
+                    # Ready in the same batch as the wake-up that replaced it: the old
+                    # channel is already closed, and its data must not reach the new screen
+                    self._drop_stale(key)
+                    continue
+                reader = self.links[name].reader
+                try:
+                    data, arrival = reader.read_burst(channel)
+                except OSError as e:
+                    data, arrival = b"", None
+                    self._robot_log(name)(f"robotmon read error: {e}")
+                if data:
+                    watch.data(arrival, time.monotonic())
+                    reader.feed(data, arrival)
+                else:
+                    self._unregister(registered, name, "robotmon stream ended")
+            now = time.monotonic()
+            if now >= next_check:
+                next_check = now + self._watchdog(registered, now)
+        for name in list(registered):
+            self._unregister(registered, name, "stopped", retry=False)
+
+    def _watchdog(self, registered, now):
+        """
+        Checks every open session and starts the reconnects that are due.
+        Returns the seconds until the next pass is needed.
+        """
+        wait = WATCHDOG_INTERVAL
+        for name, key in list(registered.items()):
+            channel, watch = key.data[2], key.data[3]
+            if channel.closed or channel.exit_status_ready():
+                self._unregister(registered, name, "robotmon channel closed")
+                continue
+            reason, tick = watch.check(now)
+            if reason is not None:
+                self._unregister(registered, name, reason)
+            else:
+                wait = min(wait, tick)
+        for name, due in list(self._retry_at.items()):
+            if now >= due:
+                del self._retry_at[name]
+                self.links[name].supervisor.reconnects += 1
+                self.connect(name)
+            else:
+                wait = min(wait, due - now)
+        return wait
+
+    def _register_pending(self, registered):
+        try:
+            self._wake_r.recv(4096)
+        except BlockingIOError:
+            pass
+        while True:
+            try:
+                name, closeable, channel = self._pending.get_nowait()
+            except queue.Empty:
+                return
+            if closeable is None:   # the connect attempt failed
+                if name not in registered and name not in self._retry_at:
+                    self._schedule_reconnect(name, was_ready=False)
+                continue
+            if name in registered:
+                self._unregister(registered, name, "replaced by a new connection", retry=False)
+            self._retry_at.pop(name, None)
+            link = self.links[name]
+            link.begin_stream()
+            link.supervisor.sessions += 1
+            watch = link.supervisor.watch(channel)
+            registered[name] = self._selector.register(channel, selectors.EVENT_READ,
+                                                       (name, closeable, channel, watch))
+
+    def _unregister(self, registered, name, reason, retry=True):
+        key = registered.pop(name)
+        self._selector.unregister(key.fileobj)
+        link = self.links[name]
+        was_ready = link.ready
+        link.close_stream(key.data[1], reason)
+        if retry:
+            self._schedule_reconnect(name, was_ready)
+
+    def _schedule_reconnect(self, name, was_ready):
+        """Reconnects `name` after its supervisor's backoff (not for replays or when reconnect is off)."""
+        link = self.links[name]
+        if self._stopped or not link.supervisor.reconnect or link.replay_file:
+            return
+        delay = link.supervisor.reconnect_delay(was_ready)
+        link.log(f"SSH: Reconnecting in {delay:.1f} s.")
+        self._retry_at[name] = time.monotonic() + delay
+
+    def _drop_stale(self, key):
+        """Forgets a selector key whose robot has since been reconnected."""
+        try:
+            self._selector.unregister(key.fileobj)
+        except (KeyError, ValueError):
+            pass
+        try:
+            key.fileobj.close()
+        except Exception:
+            pass
+
+    # --- Aggregated view ---
+    def status(self):
+        """
+        {name: dict} with each robot's stream status, age of its newest state
+        change in seconds (None before the first one) and RobotSnapshot.as_dict().
+        """
+        now = time.perf_counter()
+        view = {}
+        for name, link in self.links.items():
+            snap, _ = link.state.snapshot()
+            entry = snap.as_dict()
+            entry["stream"] = link.stream_status
+            entry["age"] = None if snap.updated is None else now - snap.updated
+            view[name] = entry
+        return view
+
+    def format_status(self):
+        """One line per robot for terminals and logs."""
+        lines = []
+        for name, entry in self.status().items():
+            joints = entry["joints"]
+            joint_text = " ".join(f"{v:8.2f}" for v in joints.values()) if joints else "-"
+            age = "-" if entry["age"] is None else f"{entry['age']:.1f}s"
+            lines.append(f"{name:<10} {entry['stream']:<28} {age:>7} {entry['mode'] or '-':<6} "
+                         f"{entry['servo'] or '-':<4} {joint_text}")
+        return "\n".join(lines)
+
+    # --- Broadcast commands ---
+    def broadcast(self, fn, names=None, timeout=None):
+        """
+        Runs fn(link) for every robot (or `names`) concurrently on the pool.
+        Returns {name: result or the exception it raised}.
+        """
+        futures = {name: self._command_pool.submit(fn, self.links[name]) for name in (names or self.links)}
+        results = {}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result(timeout)
+            except Exception as e:
+                results[name] = e
+        return results
+
+    def stop_all(self, timeout=2.0):
+        """Sends stop to every robot at once. Returns {name: None or exception}."""
+        return self.broadcast(lambda link: link.stop(), timeout=timeout)
+
+    def set_speed_all(self, speed, timeout=2.0):
+        return self.broadcast(lambda link: link.set_speed(speed).result(timeout), timeout=timeout)
+
+    def refresh_status_all(self, timeout=0.5):
+        """Queries MODE/SPEED/COORD/SERVO on every robot; results land in each RobotState."""
+        return self.broadcast(lambda link: link.query_status(timeout))
+
+    def close(self):
+        self._stopped = True
+        self._wake_w.send(b"\0")
+        if self.reader_thread is not None:
+            self.reader_thread.join()
+        self._connect_pool.shutdown(wait=False, cancel_futures=True)
+        self._command_pool.shutdown(wait=False, cancel_futures=True)
+        for link in self.links.values():
+            link.close()
+        self._selector.close()
+        self._wake_r.close()
+        self._wake_w.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Watch several EI65 controllers")
+    ap.add_argument("fleet", help="fleet JSON file")
+    ap.add_argument("--interval", type=float, default=1.0, help="seconds between status tables")
+    ap.add_argument("--stop-all", action="store_true", help="send stop to every robot and exit")
+    args = ap.parse_args()
+
+    def log(msg, debug=False):
+        print(f"[{time.strftime('%H:%M:%S')}] {msg}", file=sys.stderr, flush=True)
+
+    with Fleet.from_file(args.fleet, log=log) as fleet:
+        if args.stop_all:
+            for name, error in fleet.stop_all().items():
+                print(f"{name}: {'stopped' if error is None else f'error: {error}'}")
+            return
+        fleet.start()
+        try:
+            while True:
+                time.sleep(args.interval)
+                print(fleet.format_status() + "\n", flush=True)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
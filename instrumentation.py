@@ -0,0 +1,157 @@
+"""
+Opt-in per-stage timings for the robotmon ingestion path.
+
+A StageTimings object is handed to the code that should be measured
+(RobotmonReader(timings=...), RobotLink(timings=...)); with None, the
+default, the hot paths skip timing entirely. Each stage keeps a call
+counter, a total, the largest sample and a fixed-bucket histogram, so
+recording is a few additions and a bisect no matter how long it runs.
+
+Stages recorded by this repo:
+    recv     reading one burst off the channel (RobotmonReader.read_burst)
+    feed     the screen decoder drawing it (RobotmonScreen, or pyte as the fallback)
+    parse    RobotmonParser.update on the dirty rows
+    enqueue  the on_joints/on_plc callbacks storing into RobotState
+    render   one GUI redraw of a changed snapshot (rob_arm_pos.update_gui)
+    plot     one plot window redraw (plot_panel.PlotPanel)
+
+Counters ("bytes", "chunks", ...) are plain running totals.
+
+    timings = StageTimings()
+    link = RobotLink(timings=timings)
+    ...
+    print(timings.format())
+    open("ei65.prom", "w").write(timings.prometheus())
+"""
+import bisect
+import threading
+import time
+
+STAGES = ("recv", "feed", "parse", "enqueue", "render")
+
+# Histogram upper bounds in seconds: five per decade from 1 us to 1 s
+BUCKETS = tuple(float(f"{10 ** (k / 5 - 6):.3g}") for k in range(31))
+
+
+class StageHistogram:
+    """Count, total, max and bucket counts of one stage's durations."""
+
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)   # last one is +Inf
+
+    def record(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+
+    def percentile(self, p):
+        """Upper bound of the bucket holding the p-th percentile (0-100), or None."""
+        if not self.count:
+            return None
+        rank = p / 100 * self.count
+        seen = 0
+        for bound, n in zip(BUCKETS, self.buckets):
+            seen += n
+            if seen >= rank and n:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self):
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "total_s": self.total,
+            "mean_us": self.total / self.count * 1e6,
+            "p50_us": self.percentile(50) * 1e6,
+            "p99_us": self.percentile(99) * 1e6,
+            "max_us": self.max * 1e6,
+        }
+
+
+class StageTimings:
+    """Thread-safe per-stage histograms and counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {name: StageHistogram() for name in STAGES}
+        self._counters = {}
+        self.started = time.perf_counter()
+
+    def record(self, stage, seconds):
+        """Adds one duration (seconds) to `stage`; unknown stages are created on first use."""
+        with self._lock:
+            hist = self._stages.get(stage)
+            if hist is None:
+                hist = self._stages[stage] = StageHistogram()
+            hist.record(seconds)
+
+    def count(self, counter, n=1):
+        with self._lock:
+            self._counters[counter] = self._counters.get(counter, 0) + n
+
+    def reset(self):
+        with self._lock:
+            self._stages = {name: StageHistogram() for name in STAGES}
+            self._counters = {}
+            self.started = time.perf_counter()
+
+    def histogram(self, stage):
+        """Copy of one stage's StageHistogram."""
+        with self._lock:
+            source = self._stages.get(stage) or StageHistogram()
+            hist = StageHistogram()
+            hist.count, hist.total, hist.max = source.count, source.total, source.max
+            hist.buckets = list(source.buckets)
+        return hist
+
+    def snapshot(self):
+        """{"elapsed_s", "counters": {name: n}, "stages": {name: StageHistogram.summary()}}."""
+        with self._lock:
+            stages = {name: hist.summary() for name, hist in self._stages.items()}
+            counters = dict(self._counters)
+        return {"elapsed_s": time.perf_counter() - self.started, "counters": counters, "stages": stages}
+
+    def format(self):
+        """Per-stage table plus counter rates, for logs and terminals."""
+        snap = self.snapshot()
+        elapsed = snap["elapsed_s"]
+        lines = [f"{'stage':<8} {'count':>8} {'mean us':>9} {'p50 us':>9} {'p99 us':>9} {'max us':>9} {'busy %':>7}"]
+        for name, s in snap["stages"].items():
+            if not s["count"]:
+                lines.append(f"{name:<8} {0:>8}")
+                continue
+            busy = s["total_s"] / elapsed * 100 if elapsed > 0 else 0.0
+            lines.append(f"{name:<8} {s['count']:>8} {s['mean_us']:>9.1f} {s['p50_us']:>9.1f} "
+                         f"{s['p99_us']:>9.1f} {s['max_us']:>9.1f} {busy:>7.2f}")
+        for name, n in sorted(snap["counters"].items()):
+            rate = f" ({n / elapsed:.1f}/s)" if elapsed > 0 else ""
+            lines.append(f"{name}: {n}{rate}")
+        return "\n".join(lines)
+
+    def prometheus(self, prefix="ei65"):
+        """Prometheus text exposition: one histogram per stage, one counter per counter."""
+        with self._lock:
+            stages = {name: (list(h.buckets), h.count, h.total) for name, h in self._stages.items()}
+            counters = dict(self._counters)
+        metric = f"{prefix}_stage_seconds"
+        lines = [f"# HELP {metric} Time spent per robotmon ingestion stage.", f"# TYPE {metric} histogram"]
+        for name, (buckets, count, total) in stages.items():
+            cumulative = 0
+            for bound, n in zip(BUCKETS, buckets):
+                cumulative += n
+                lines.append(f'{metric}_bucket{{stage="{name}",le="{bound:.3g}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{stage="{name}",le="+Inf"}} {count}')
+            lines.append(f'{metric}_sum{{stage="{name}"}} {total:.9f}')
+            lines.append(f'{metric}_count{{stage="{name}"}} {count}')
+        for name, n in sorted(counters.items()):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {n}")
+        return "\n".join(lines) + "\n"
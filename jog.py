@@ -0,0 +1,233 @@
+"""
+Jogging: move the arm while a key (or stick) is held.
+
+A Jogger turns held axes into a stream of small runForward targets on the
+link's persistent mcserver connection. Every control tick (rate Hz) the
+target is computed afresh from the latest live joint snapshot: the current
+joints plus velocity x lead, in joint space or, in the Cartesian frame, as
+a small flange translation/rotation in the base frame solved with IK
+seeded from the current joints. Targets are relative to where the arm is,
+not to the previous target, so the commanded position never runs ahead of
+the arm by more than one step.
+
+Latest command wins: at most one runForward is in flight, i.e. written
+and not yet answered by mcserver. A tick that finds it still outstanding
+does not queue another; the next tick
+computes a fresh target from the newer state instead, so held keys never
+build up a backlog. Releasing the last held axis sends stop at once,
+from the caller's thread, ahead of anything queued (McServerClient.stop),
+and moves computed concurrently with the release are dropped.
+
+Every target goes through RobotLink.move, so the safety envelope applies;
+a rejected target or a non-live joint state ends the jog with a stop.
+With hold_timeout set, the jog also stops when no input has refreshed it
+(press, set_axes or refresh) for that long: a release that never arrives
+(focus moved, input device gone) cannot leave the arm moving.
+
+    jogger = Jogger(link).start()
+    jogger.press("L", +1)          # key down
+    jogger.release("L")            # key up: stop goes out immediately
+    jogger.set_axes({"X": 0.4, "Z": -1.0}, frame="cartesian")   # stick
+"""
+import threading
+import time
+
+from latency_stats import LatencyTracker
+from robot_state import JOINT_NAMES
+
+JOINT_FRAME = "joint"
+CARTESIAN_FRAME = "cartesian"
+CARTESIAN_AXES = ("X", "Y", "Z", "RX", "RY", "RZ")
+FRAME_AXES = {JOINT_FRAME: JOINT_NAMES, CARTESIAN_FRAME: CARTESIAN_AXES}
+
+
+class Jogger:
+    """Held-axis jogging for one RobotLink at a fixed control rate."""
+
+    def __init__(self, link, rate=20.0, joint_speed=10.0, linear_speed=50.0, angular_speed=10.0, lead=None,
+                 hold_timeout=None):
+        """
+        Args:
+            link: robot_core.RobotLink; its state, mcserver and envelope are used.
+            rate: Control ticks per second.
+            joint_speed: deg/s per joint at full deflection (joint frame).
+            linear_speed: mm/s along X/Y/Z at full deflection (Cartesian frame).
+            angular_speed: deg/s about X/Y/Z at full deflection (Cartesian frame).
+            lead: Seconds of motion each target asks for; defaults to two ticks, so the
+                next target arrives before the arm reaches the previous one.
+            hold_timeout: Seconds without press/set_axes/refresh after which the jog
+                stops (None: held axes stay held until released).
+        """
+        self.link = link
+        self.period = 1.0 / rate
+        self.joint_speed = joint_speed
+        self.linear_speed = linear_speed
+        self.angular_speed = angular_speed
+        self.lead = 2.0 * self.period if lead is None else lead
+        self.hold_timeout = hold_timeout
+        self.frame = JOINT_FRAME
+        self.sent = 0
+        self.coalesced = 0
+        self.stops = 0
+        self.ack_latency = LatencyTracker()
+
+        self._lock = threading.Lock()
+        self._active = threading.Event()
+        self._axes = {}            # axis -> deflection in -1..1
+        self._generation = 0       # bumped by every stop; targets of an older one are dropped
+        self._refreshed = time.monotonic()
+        self._inflight = None
+        self._thread = None
+        self._stopped = False
+
+    # --- Control ---
+    def start(self):
+        """Starts the control thread. Returns self."""
+        # Load the envelope (and kinematics) now: a move is queued under the lock a stop
+        # waits for, so the first one must not pay for imports and file parsing
+        self.link.mcserver
+        self.link.envelope
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="jog", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        self.release_all()
+        self._stopped = True
+        self._active.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    @property
+    def jogging(self):
+        return bool(self._axes)
+
+    def press(self, axis, direction=1.0, frame=None):
+        """Starts (or changes) jogging `axis` at `direction` (-1..1) of full speed."""
+        with self._lock:
+            axes = dict(self._axes) if frame in (None, self.frame) else {}
+        axes[axis] = direction
+        self.set_axes(axes, frame)
+
+    def refresh(self):
+        """Confirms the held axes are still held (e.g. on key auto-repeat); see hold_timeout."""
+        self._refreshed = time.monotonic()
+
+    def release(self, axis):
+        """Stops jogging `axis`; stop goes out at once when it was the last one held."""
+        with self._lock:
+            if self._axes.pop(axis, None) is None or self._axes:
+                return
+        self._stop("released")
+
+    def set_axes(self, axes, frame=None):
+        """
+        Replaces all deflections at once, e.g. from a gamepad: {axis: -1..1}.
+        Zero entries are dropped; if nothing is left, stop is sent.
+        """
+        frame = frame or self.frame
+        if frame not in FRAME_AXES:
+            raise ValueError(f"frame must be {JOINT_FRAME!r} or {CARTESIAN_FRAME!r}, not {frame!r}")
+        axes = {axis: max(-1.0, min(1.0, float(value))) for axis, value in axes.items() if value}
+        unknown = set(axes) - set(FRAME_AXES[frame])
+        if unknown:
+            raise ValueError(f"Not {frame} axes: {', '.join(sorted(unknown))}")
+        with self._lock:
+            was_jogging = bool(self._axes)
+            changed_frame = frame != self.frame
+            self.frame = frame
+            self._axes = axes
+            self._refreshed = time.monotonic()
+            if axes:
+                self._active.set()
+        if was_jogging and (not axes or changed_frame):
+            self._stop("released")
+
+    def release_all(self):
+        with self._lock:
+            jogging = bool(self._axes)
+            self._axes = {}
+        if jogging:
+            self._stop("released")
+
+    def _stop(self, reason):
+        with self._lock:
+            self._generation += 1
+            self._inflight = None
+        self.stops += 1
+        self.link.stop()
+        if reason != "released":
+            self.link.log(f"Jog stopped: {reason}")
+
+    # --- Control thread ---
+    def _run(self):
+        deadline = time.monotonic()
+        while not self._stopped:
+            if not self._axes:
+                self._active.clear()
+                if not self._axes:
+                    self._active.wait()
+                deadline = time.monotonic()
+                continue
+            deadline += self.period
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                deadline = time.monotonic()   # fell behind; don't try to catch up with a burst
+            self._tick()
+
+    def _tick(self):
+        with self._lock:
+            axes, frame, generation, inflight = dict(self._axes), self.frame, self._generation, self._inflight
+        if not axes:
+            return
+        if self.hold_timeout is not None and time.monotonic() - self._refreshed > self.hold_timeout:
+            self._abort(f"no jog input for {self.hold_timeout:g} s")
+            return
+        if inflight is not None and not inflight.done():
+            self.coalesced += 1   # the next tick computes a fresher target instead
+            return
+        snap = self.link.state.snapshot()[0]
+        if snap.stale or snap.joints is None:
+            self._abort(f"no live joint state (robotmon link: {snap.link})")
+            return
+        try:
+            target = self.target(snap.joints, axes, frame)
+            with self._lock:
+                if generation != self._generation or not self._axes:
+                    return   # released while this target was being computed
+                sent = time.perf_counter()
+                future = self.link.move(target, reply=True)
+                self._inflight = future
+        except Exception as e:
+            self._abort(str(e))
+            return
+        self.sent += 1
+        future.add_done_callback(lambda f: self.ack_latency.record(time.perf_counter() - sent))
+
+    def _abort(self, reason):
+        with self._lock:
+            self._axes = {}
+        self._stop(reason)
+
+    # --- Targets ---
+    def target(self, joints, axes, frame=JOINT_FRAME):
+        """8 joint values one lead ahead of `joints` for the given deflections."""
+        if frame == JOINT_FRAME:
+            step = self.joint_speed * self.lead
+            return [value + axes.get(name, 0.0) * step for name, value in zip(JOINT_NAMES, joints)]
+        import numpy as np
+        from scipy.spatial.transform import Rotation
+        kinematics = self.link.kinematics
+        current = dict(zip(JOINT_NAMES, joints))
+        pose = kinematics.fk([current[name] for name in JOINT_NAMES[:6]])
+        move = np.array([axes.get(axis, 0.0) for axis in CARTESIAN_AXES])
+        target = pose.copy()
+        target[:3, 3] += move[:3] * self.linear_speed * self.lead
+        if move[3:].any():
+            turn = Rotation.from_rotvec(np.radians(move[3:] * self.angular_speed * self.lead)).as_matrix()
+            target[:3, :3] = turn @ pose[:3, :3]
+        solved = kinematics.solve_joints(target, current)
+        return [solved[name] for name in JOINT_NAMES]
@@ -0,0 +1,289 @@
+"""
+EI65 forward and inverse kinematics.
+
+The six arm joints (S L U R B T) are described by standard DH parameters
+loaded from a JSON file (ei65_dh.json by default), in mm and degrees like
+the joint values robotmon reports. J7/J8 are external axes and are passed
+through unchanged.
+
+Forward kinematics and Jacobians are NumPy-vectorized over any number of
+joint vectors. IK first runs a few damped least-squares Newton steps (batched
+across all targets), which converge in one to three steps when the seed is
+close, as it is when jogging from the current pose or following a path.
+Targets that are not solved that way fall back to scipy's least_squares
+with the joint limits as bounds. Each solver warm-starts from its previous
+solution, and Jacobians of recently evaluated joint vectors are cached so
+least_squares' residual and Jacobian calls share one FK evaluation.
+
+    kin = EI65Kinematics()
+    pose = kin.fk(joints6)                        # 4x4 flange pose
+    result = kin.ik(pose_matrix((400, 0, 600), (180, 0, 0)), seed=joints6)
+"""
+import collections
+import json
+import os
+
+import numpy as np
+from scipy.optimize import least_squares
+from scipy.spatial.transform import Rotation
+
+ARM_JOINTS = ("S", "L", "U", "R", "B", "T")
+DEFAULT_DH_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ei65_dh.json")
+
+# Orientation errors (rad) are scaled by this many mm so both parts of the residual weigh alike
+ORIENTATION_WEIGHT = 200.0
+POSITION_TOLERANCE = 0.01      # mm
+ORIENTATION_TOLERANCE = 1e-5   # rad
+
+IKResult = collections.namedtuple("IKResult", "joints success position_error orientation_error iterations method")
+IKResult.__doc__ = """
+IK solution. joints are the 6 arm joints in degrees; the errors are the
+remaining flange error in mm and rad; method is "newton" or "least_squares".
+"""
+
+
+def pose_matrix(xyz, rpy=(0.0, 0.0, 0.0)):
+    """4x4 pose from a position in mm and extrinsic X-Y-Z angles in degrees. Broadcasts over leading axes."""
+    xyz = np.asarray(xyz, dtype=float)
+    rpy = np.asarray(rpy, dtype=float)
+    shape = np.broadcast_shapes(xyz.shape, rpy.shape)[:-1]
+    T = np.zeros(shape + (4, 4))
+    T[..., :3, :3] = Rotation.from_euler("xyz", np.broadcast_to(rpy, shape + (3,)).reshape(-1, 3),
+                                         degrees=True).as_matrix().reshape(shape + (3, 3))
+    T[..., :3, 3] = xyz
+    T[..., 3, 3] = 1.0
+    return T
+
+
+def matrix_pose(T):
+    """Inverse of pose_matrix: returns (xyz mm, rpy degrees)."""
+    T = np.asarray(T, dtype=float)
+    rpy = Rotation.from_matrix(T[..., :3, :3].reshape(-1, 3, 3)).as_euler("xyz", degrees=True)
+    return T[..., :3, 3], rpy.reshape(T.shape[:-2] + (3,))
+
+
+def load_dh(path=DEFAULT_DH_FILE):
+    """Reads the DH file. Returns (joint rows, tool 4x4)."""
+    with open(path, "r") as f:
+        data = json.load(f)
+    joints = data["joints"]
+    if len(joints) != len(ARM_JOINTS):
+        raise ValueError(f"{path}: expected {len(ARM_JOINTS)} DH rows, got {len(joints)}")
+    tool = data.get("tool", {})
+    return joints, pose_matrix(tool.get("xyz", (0, 0, 0)), tool.get("rpy", (0, 0, 0)))
+
+
+def _rotation_error(R, R_target):
+    """Rotation vector taking R_target to R, i.e. log(R @ R_target^T), for stacks of 3x3."""
+    M = R @ np.swapaxes(R_target, -1, -2)
+    # Closed-form log map; the skew part alone is exact enough except near 180 degrees
+    skew = np.stack([M[..., 2, 1] - M[..., 1, 2], M[..., 0, 2] - M[..., 2, 0], M[..., 1, 0] - M[..., 0, 1]], axis=-1)
+    cos = np.clip((np.trace(M, axis1=-2, axis2=-1) - 1.0) * 0.5, -1.0, 1.0)
+    angle = np.arccos(cos)
+    sin = np.sin(angle)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scale = np.where(angle < 1e-6, 0.5, angle / (2.0 * sin))
+    rotvec = skew * scale[..., None]
+    flipped = angle > np.pi - 1e-3
+    if flipped.any():
+        rotvec[flipped] = Rotation.from_matrix(M[flipped]).as_rotvec()
+    return rotvec
+
+
+class EI65Kinematics:
+    """FK, Jacobians and IK for the six arm joints. Angles in degrees, lengths in mm."""
+
+    def __init__(self, dh_file=DEFAULT_DH_FILE, base=None, jacobian_cache_size=64, damping=0.05):
+        joints, self.tool = load_dh(dh_file)
+        self.dh_file = dh_file
+        self.a = np.array([j["a"] for j in joints], dtype=float)
+        self.d = np.array([j["d"] for j in joints], dtype=float)
+        alpha = np.radians([j["alpha"] for j in joints])
+        self._ca = np.cos(alpha)
+        self._sa = np.sin(alpha)
+        self.offset = np.array([j.get("offset", 0.0) for j in joints], dtype=float)
+        self.sign = np.array([j.get("sign", 1) for j in joints], dtype=float)
+        self.lower = np.array([j.get("min", -360.0) for j in joints], dtype=float)
+        self.upper = np.array([j.get("max", 360.0) for j in joints], dtype=float)
+        self.base = np.eye(4) if base is None else np.asarray(base, dtype=float)
+        self.damping = damping
+
+        self._jac_cache = collections.OrderedDict()
+        self._jac_cache_size = jacobian_cache_size
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.last_solution = None
+
+    # --- Forward kinematics ---
+    def _frames(self, q):
+        """q (N, 6) degrees -> list of 7 (N, 4, 4) frames (base, after each joint) and the flange."""
+        theta = np.radians(q * self.sign + self.offset)
+        ct, st = np.cos(theta), np.sin(theta)
+        A = np.zeros(q.shape + (4, 4))
+        A[..., 0, 0] = ct
+        A[..., 0, 1] = -st * self._ca
+        A[..., 0, 2] = st * self._sa
+        A[..., 0, 3] = self.a * ct
+        A[..., 1, 0] = st
+        A[..., 1, 1] = ct * self._ca
+        A[..., 1, 2] = -ct * self._sa
+        A[..., 1, 3] = self.a * st
+        A[..., 2, 1] = self._sa
+        A[..., 2, 2] = self._ca
+        A[..., 2, 3] = self.d
+        A[..., 3, 3] = 1.0
+        frames = [np.broadcast_to(self.base, (len(q), 4, 4))]
+        for i in range(len(ARM_JOINTS)):
+            frames.append(frames[-1] @ A[:, i])
+        return frames, frames[-1] @ self.tool
+
+    def fk(self, q):
+        """Flange pose(s) for joint vector(s) of shape (6,) or (N, 6). Returns (4, 4) or (N, 4, 4)."""
+        q = np.asarray(q, dtype=float)
+        _, flange = self._frames(np.atleast_2d(q))
+        return flange[0] if q.ndim == 1 else flange
+
+    def _fk_jacobian(self, q):
+        """q (N, 6) -> flange poses (N, 4, 4) and geometric Jacobians (N, 6, 6) per degree."""
+        frames, flange = self._frames(q)
+        axes = np.stack(frames[:-1], axis=-1)    # (N, 4, 4, 6): frame i-1 of every joint i
+        z = axes[:, :3, 2]                        # (N, 3, 6) joint axes
+        r = flange[:, :3, 3, None] - axes[:, :3, 3]
+        J = np.empty((len(q), 6, 6))
+        J[:, 0] = z[:, 1] * r[:, 2] - z[:, 2] * r[:, 1]
+        J[:, 1] = z[:, 2] * r[:, 0] - z[:, 0] * r[:, 2]
+        J[:, 2] = z[:, 0] * r[:, 1] - z[:, 1] * r[:, 0]
+        J[:, 3:] = z
+        J *= np.radians(self.sign)
+        return flange, J
+
+    def jacobian(self, q):
+        """Geometric Jacobian(s) [linear mm/deg; angular rad/deg] in the base frame."""
+        q = np.asarray(q, dtype=float)
+        _, J = self._fk_jacobian(np.atleast_2d(q))
+        return J[0] if q.ndim == 1 else J
+
+    def _cached_fk_jacobian(self, q):
+        key = q.tobytes()
+        hit = self._jac_cache.get(key)
+        if hit is not None:
+            self.cache_hits += 1
+            self._jac_cache.move_to_end(key)
+            return hit
+        self.cache_misses += 1
+        T, J = self._fk_jacobian(q[None])
+        hit = self._jac_cache[key] = (T[0], J[0])
+        if len(self._jac_cache) > self._jac_cache_size:
+            self._jac_cache.popitem(last=False)
+        return hit
+
+    # --- Inverse kinematics ---
+    def _residual(self, T, target):
+        """(..., 6) residual: position error in mm, orientation error in weighted rad."""
+        err = np.empty(T.shape[:-2] + (6,))
+        err[..., :3] = T[..., :3, 3] - target[..., :3, 3]
+        err[..., 3:] = ORIENTATION_WEIGHT * _rotation_error(T[..., :3, :3], target[..., :3, :3])
+        return err
+
+    def _newton(self, q, targets, iterations):
+        """Batched damped least-squares steps. Returns (q, residuals, done mask, steps taken)."""
+        weights = np.array([1.0, 1.0, 1.0, ORIENTATION_WEIGHT, ORIENTATION_WEIGHT, ORIENTATION_WEIGHT])
+        lam2 = self.damping ** 2 * np.eye(6)
+        steps = 0
+        while True:
+            T, J = self._fk_jacobian(q)
+            err = self._residual(T, targets)
+            done = self._converged(err)
+            if done.all() or steps == iterations:
+                return q, err, done, steps
+            Jw = J * weights[:, None]
+            JJt = Jw @ np.swapaxes(Jw, -1, -2) + lam2
+            dq = np.swapaxes(Jw, -1, -2) @ np.linalg.solve(JJt, err[..., None])
+            q = np.where(done[:, None], q, np.clip(q - dq[..., 0], self.lower, self.upper))
+            steps += 1
+
+    @staticmethod
+    def _converged(err):
+        return ((np.linalg.norm(err[..., :3], axis=-1) <= POSITION_TOLERANCE)
+                & (np.linalg.norm(err[..., 3:], axis=-1) <= ORIENTATION_TOLERANCE * ORIENTATION_WEIGHT))
+
+    def _least_squares(self, target, seed):
+        def fun(q):
+            return self._residual(self._cached_fk_jacobian(q)[0], target)
+
+        def jac(q):
+            J = self._cached_fk_jacobian(q)[1].copy()
+            J[3:] *= ORIENTATION_WEIGHT
+            return J
+
+        # least_squares wants the start strictly inside the bounds
+        span = (self.upper - self.lower) * 1e-9
+        x0 = np.clip(seed, self.lower + span, self.upper - span)
+        sol = least_squares(fun, x0, jac=jac, bounds=(self.lower, self.upper), method="trf",
+                            xtol=1e-12, ftol=1e-12, gtol=1e-12, max_nfev=200)
+        return sol.x, sol.fun, sol.nfev
+
+    def _result(self, q, err, steps, method):
+        pos = float(np.linalg.norm(err[:3]))
+        rot = float(np.linalg.norm(err[3:]) / ORIENTATION_WEIGHT)
+        success = pos <= POSITION_TOLERANCE and rot <= ORIENTATION_TOLERANCE
+        return IKResult(q, success, pos, rot, steps, method)
+
+    def ik(self, target, seed=None, newton_iterations=8):
+        """
+        Solves one flange pose (4x4). The seed defaults to the previous
+        solution; pass the current joint state so the nearest configuration
+        is chosen. Returns an IKResult; check .success.
+        """
+        target = np.asarray(target, dtype=float)
+        seed = self._seed(seed)
+        q, err, done, steps = self._newton(seed[None], target[None], newton_iterations)
+        if done[0]:
+            result = self._result(q[0], err[0], steps, "newton")
+        else:
+            q, err, nfev = self._least_squares(target, q[0])
+            result = self._result(q, err, steps + nfev, "least_squares")
+        if result.success:
+            self.last_solution = result.joints
+        return result
+
+    def ik_batch(self, targets, seed=None, newton_iterations=12):
+        """
+        Solves N poses (N, 4, 4) at once. seed is one joint vector for all
+        targets or one per target. Targets the batched Newton steps leave
+        unsolved are refined one at a time with least_squares. Returns
+        (joints (N, 6), success (N,)).
+        """
+        targets = np.asarray(targets, dtype=float)
+        seeds = np.asarray(self._seed(seed), dtype=float)
+        seeds = np.broadcast_to(seeds, (len(targets), 6)).copy()
+        q, err, done, _ = self._newton(seeds, targets, newton_iterations)
+        for i in np.flatnonzero(~done):
+            q[i], err[i], _ = self._least_squares(targets[i], q[i])
+        success = self._converged(err)
+        if success.any():
+            self.last_solution = q[np.flatnonzero(success)[-1]].copy()
+        return q, success
+
+    def _seed(self, seed):
+        if seed is not None:
+            return np.array(seed, dtype=float)
+        if self.last_solution is not None:
+            return self.last_solution.copy()
+        return np.clip(np.zeros(6), self.lower, self.upper)
+
+    # --- Glue to the 8-joint runForward command ---
+    def solve_joints(self, target, current):
+        """
+        IK for `target` seeded from `current` (a dict of all 8 joint angles, as
+        RobotSnapshot.joint_dict() returns). Returns a new 8-joint dict with
+        J7/J8 unchanged, or raises ValueError if the pose is not reachable.
+        """
+        seed = [current[name] for name in ARM_JOINTS]
+        result = self.ik(target, seed=seed)
+        if not result.success:
+            raise ValueError(f"Pose not reachable (off by {result.position_error:.3f} mm, "
+                             f"{np.degrees(result.orientation_error):.3f} deg)")
+        joints = dict(current)
+        joints.update(zip(ARM_JOINTS, result.joints.tolist()))
+        return joints
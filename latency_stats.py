@@ -0,0 +1,57 @@
+"""
+Rolling latency and update-rate statistics.
+
+Used to measure how long a robotmon chunk takes from arriving on the SSH
+channel to being shown in the GUI, and how often that happens.
+"""
+import collections
+import time
+
+
+class LatencyTracker:
+    """Keeps the most recent latency samples and the times they were recorded."""
+
+    def __init__(self, size=1000):
+        self._latencies = collections.deque(maxlen=size)
+        self._stamps = collections.deque(maxlen=size)
+
+    def record(self, latency, now=None):
+        """Adds one sample. `latency` and `now` are in seconds (perf_counter clock)."""
+        self._latencies.append(latency)
+        self._stamps.append(time.perf_counter() if now is None else now)
+
+    def __len__(self):
+        return len(self._latencies)
+
+    def percentile(self, p):
+        """Returns the p-th percentile (0-100) of the kept samples, or None."""
+        if not self._latencies:
+            return None
+        ordered = sorted(self._latencies)
+        idx = min(len(ordered) - 1, max(0, round(p / 100 * (len(ordered) - 1))))
+        return ordered[idx]
+
+    def rate(self):
+        """Samples per second over the kept window, or None."""
+        if len(self._stamps) < 2:
+            return None
+        span = self._stamps[-1] - self._stamps[0]
+        return (len(self._stamps) - 1) / span if span > 0 else None
+
+    def summary(self):
+        if not self._latencies:
+            return {"count": 0}
+        return {
+            "count": len(self._latencies),
+            "rate_hz": self.rate(),
+            "p50_ms": self.percentile(50) * 1e3,
+            "p95_ms": self.percentile(95) * 1e3,
+            "max_ms": max(self._latencies) * 1e3,
+        }
+
+    def format(self):
+        s = self.summary()
+        if not s["count"]:
+            return "no samples"
+        rate = f"{s['rate_hz']:.1f} Hz" if s["rate_hz"] else "-- Hz"
+        return f"{rate}   latency p50 {s['p50_ms']:.1f} ms  p95 {s['p95_ms']:.1f} ms  max {s['max_ms']:.1f} ms"
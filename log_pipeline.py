@@ -0,0 +1,122 @@
+"""
+Thread-safe, rate-limited logging for the GUI.
+
+Any thread may call LogPipeline.log(); messages go into a bounded ring and
+are written to the Tk text widget in one batch per flush interval on the main
+loop. Identical consecutive messages are collapsed into a "repeated N times"
+line, debug messages are rate limited, and the widget only keeps the newest
+lines. Optionally every message is also written to a rotating log file.
+"""
+import collections
+import logging
+import logging.handlers
+import threading
+import time
+
+
+class LogPipeline:
+    """Bounded, batched log buffer drained into a ScrolledText widget."""
+
+    def __init__(self, capacity=1000, max_lines=500, flush_interval_ms=100, debug_rate=20.0,
+                 file_path=None, file_max_bytes=1_000_000, file_backups=3):
+        """
+        Args:
+            capacity: Messages held between flushes; the oldest are dropped beyond that.
+            max_lines: Lines the widget keeps.
+            debug_rate: Debug messages per second let through (bursts up to the same number).
+            file_path: Rotating log file, or None for no file.
+        """
+        self.max_lines = max_lines
+        self.flush_interval_ms = flush_interval_ms
+        self.debug_rate = debug_rate
+        self._lock = threading.Lock()
+        self._ring = collections.deque(maxlen=capacity)
+        self._dropped = 0
+        self._last = None
+        self._repeats = 0
+        self._debug_tokens = debug_rate
+        self._debug_stamp = time.monotonic()
+        self._debug_suppressed = 0
+        self._widget = None
+        self._root = None
+        self._file = None
+        if file_path:
+            handler = logging.handlers.RotatingFileHandler(
+                file_path, maxBytes=file_max_bytes, backupCount=file_backups, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            self._file = logging.getLogger(f"{__name__}.{id(self)}")
+            self._file.propagate = False
+            self._file.setLevel(logging.INFO)
+            self._file.addHandler(handler)
+
+    def log(self, msg, debug=False):
+        """Queues a message. Safe to call from any thread."""
+        now = time.time()
+        with self._lock:
+            if debug and not self._take_debug_token_locked():
+                self._debug_suppressed += 1
+                return
+            if msg == self._last:
+                self._repeats += 1
+                return
+            self._flush_repeats_locked(now)
+            self._last = msg
+            self._append_locked(now, msg)
+
+    def _take_debug_token_locked(self):
+        now = time.monotonic()
+        self._debug_tokens = min(self.debug_rate, self._debug_tokens + (now - self._debug_stamp) * self.debug_rate)
+        self._debug_stamp = now
+        if self._debug_tokens >= 1.0:
+            self._debug_tokens -= 1.0
+            return True
+        return False
+
+    def _append_locked(self, now, msg):
+        if len(self._ring) == self._ring.maxlen:
+            self._dropped += 1
+        timestamp = time.strftime("%H:%M:%S", time.localtime(now))
+        self._ring.append(f"[{timestamp}] {msg}\n")
+        if self._file is not None:
+            self._file.info(msg)
+
+    def _flush_repeats_locked(self, now):
+        if self._repeats:
+            self._append_locked(now, f"(last message repeated {self._repeats} times)")
+            self._repeats = 0
+
+    def drain(self):
+        """Returns the pending lines, with notes about anything collapsed or dropped."""
+        now = time.time()
+        with self._lock:
+            self._flush_repeats_locked(now)
+            if self._debug_suppressed:
+                self._append_locked(now, f"({self._debug_suppressed} debug messages suppressed)")
+                self._debug_suppressed = 0
+            lines = list(self._ring)
+            self._ring.clear()
+            dropped, self._dropped = self._dropped, 0
+        if dropped:
+            lines.insert(0, f"[{time.strftime('%H:%M:%S')}] ({dropped} log messages dropped)\n")
+        return lines
+
+    # --- Tk side ---
+    def attach(self, widget, root):
+        """Starts flushing into `widget` (a disabled ScrolledText) from root's main loop."""
+        self._widget = widget
+        self._root = root
+        root.after(self.flush_interval_ms, self._pump)
+
+    def _pump(self):
+        import tkinter as tk  # only the GUI needs it; headless users just call drain()
+        lines = self.drain()
+        if lines:
+            widget = self._widget
+            widget.config(state=tk.NORMAL)
+            widget.insert(tk.END, "".join(lines))
+            line_count = int(widget.index("end-1c").split(".")[0])
+            if line_count > self.max_lines:
+                widget.delete("1.0", f"{line_count - self.max_lines + 1}.0")
+            widget.see(tk.END)
+            widget.config(state=tk.DISABLED)
+        self._root.after(self.flush_interval_ms, self._pump)
@@ -0,0 +1,325 @@
+"""
+Persistent client for the mcserver command port.
+
+mcserver is a line based REPL: it prints an "mcserver>" prompt on connect and
+again after every command it has handled.  Replies are framed on that prompt
+instead of sleeping and hoping the answer has arrived, and a single TCP
+connection is kept open (and reopened on failure) instead of paying a
+handshake per command.
+
+Everything except stop() goes through a FIFO worker.  stop() is written
+straight onto the socket from the calling thread, so it is never stuck behind
+a slow query, and it cancels motion commands that are still waiting in the
+queue.
+"""
+import collections
+import re
+import select
+import socket
+import threading
+import time
+from concurrent.futures import Future
+
+PROMPT = b"mcserver>"
+LINE_END = "\r\n"
+
+# How often the idle worker throws away replies to fire-and-forget commands
+IDLE_DRAIN_INTERVAL = 0.1
+
+STATUS_COMMANDS = ("mode", "speed", "coord", "servo")
+
+_Job = collections.namedtuple("_Job", "command future expects_reply timeout cancel_on_stop")
+
+
+class McServerClient:
+    """Long-lived, self-healing connection to mcserver."""
+
+    def __init__(self, host, port, connect_timeout=1.0, reply_timeout=0.5,
+                 reconnect_delay=0.2, max_reconnect_delay=5.0):
+        self.host = host
+        self.port = port
+        self.connect_timeout = connect_timeout
+        self.reply_timeout = reply_timeout
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+
+        # _lock guards the socket, the connection generation and the framing
+        # state.  Only the worker thread ever reads from the socket.
+        self._lock = threading.Lock()
+        self._sock = None
+        self._gen = 0
+        self._rx = bytearray()
+        self._sent = 0      # commands written on the current connection
+        self._frames = 0    # prompts consumed on the current connection
+        self._backoff = reconnect_delay
+        self._retry_at = 0.0
+
+        self._cond = threading.Condition()
+        self._jobs = collections.deque()
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name="mcserver-client", daemon=True)
+        self._worker.start()
+
+    # --- Public API ---
+    def send(self, command, cancel_on_stop=False):
+        """Queues a command whose reply is not needed. Returns a Future."""
+        return self._submit(command, False, None, cancel_on_stop)
+
+    def move(self, command, reply=False):
+        """
+        Queues a motion command; a later stop() cancels it if still queued.
+        With reply, the Future resolves to mcserver's reply once it has handled
+        the command, not when it was written. Motion is never retried.
+        """
+        if reply:
+            return self._submit(command, True, None, True)
+        return self.send(command, cancel_on_stop=True)
+
+    def submit_query(self, command, timeout=None):
+        """Queues a command and returns a Future for its prompt-framed reply."""
+        return self._submit(command, True, timeout, False)
+
+    def submit_queries(self, commands, timeout=None):
+        """
+        Pipelines several queries: they are written in a single send and the
+        replies are read back in order, costing one round trip instead of one
+        per command. Returns a Future for the list of replies.
+        """
+        return self._submit(tuple(commands), True, timeout, False)
+
+    def query(self, command, timeout=None):
+        """Sends a command and blocks until its reply arrives."""
+        return self.submit_query(command, timeout).result()
+
+    def stop(self):
+        """Sends stop immediately, ahead of anything still queued."""
+        with self._cond:
+            keep = collections.deque()
+            for job in self._jobs:
+                if not (job.cancel_on_stop and job.future.cancel()):
+                    keep.append(job)
+            self._jobs = keep
+        # A stop must always get a connection attempt, back-off or not.
+        self._write_line("stop", force=True)
+
+    @property
+    def connected(self):
+        return self._sock is not None
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            jobs, self._jobs = self._jobs, collections.deque()
+            self._cond.notify_all()
+        for job in jobs:
+            job.future.cancel()
+        with self._lock:
+            self._drop_locked()
+        self._worker.join(timeout=1.0)
+
+    # --- Connection handling ---
+    def _connect_locked(self, force=False):
+        now = time.monotonic()
+        if not force and now < self._retry_at:
+            raise ConnectionError(
+                f"mcserver {self.host}:{self.port} unreachable, retrying in {self._retry_at - now:.1f}s")
+        try:
+            sock = socket.create_connection((self.host, self.port), timeout=self.connect_timeout)
+        except OSError as e:
+            self._retry_at = time.monotonic() + self._backoff
+            self._backoff = min(self._backoff * 2, self.max_reconnect_delay)
+            raise ConnectionError(f"Could not connect to mcserver {self.host}:{self.port}: {e}") from e
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._sock = sock
+        self._gen += 1
+        self._rx.clear()
+        self._sent = 0
+        self._frames = 0
+        self._backoff = self.reconnect_delay
+        self._retry_at = 0.0
+
+    def _drop_locked(self):
+        if self._sock is None:
+            return
+        try:
+            # shutdown() wakes up a recv() blocked in the worker thread
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._sock.close()
+        self._sock = None
+
+    def _drop(self, gen):
+        with self._lock:
+            if gen == self._gen:
+                self._drop_locked()
+
+    def _write_line(self, command, force=False):
+        """Writes one command, reconnecting once on failure. Returns (seq, gen)."""
+        return self._write_lines((command,), force)
+
+    def _write_lines(self, commands, force=False):
+        """Writes commands in one send. Returns (seq of the first command, gen)."""
+        data = "".join(command + LINE_END for command in commands).encode()
+        with self._lock:
+            for attempt in (0, 1):
+                if self._sock is None:
+                    self._connect_locked(force=force or attempt > 0)
+                try:
+                    self._sock.sendall(data)
+                except OSError as e:
+                    self._drop_locked()
+                    if attempt:
+                        raise ConnectionError(f"Could not send {' / '.join(commands)!r}: {e}") from e
+                    continue
+                first = self._sent + 1
+                self._sent += len(commands)
+                return first, self._gen
+
+    # --- Reply framing (worker thread only) ---
+    def _pop_frame_locked(self):
+        idx = self._rx.find(PROMPT)
+        if idx < 0:
+            return None
+        frame = bytes(self._rx[:idx])
+        del self._rx[:idx + len(PROMPT)]
+        self._frames += 1
+        return frame
+
+    def _read_reply(self, seq, gen, deadline):
+        # The greeting ends with prompt #1, so the reply to command n is the
+        # text between prompt #n and prompt #n+1.
+        while True:
+            with self._lock:
+                if gen != self._gen or self._sock is None:
+                    raise ConnectionError("mcserver connection reset while waiting for reply")
+                while True:
+                    frame = self._pop_frame_locked()
+                    if frame is None:
+                        break
+                    if self._frames == seq + 1:
+                        return (PROMPT + frame).decode(errors="ignore")
+                sock = self._sock
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                # The reply stream is out of step with our count; start clean.
+                self._drop(gen)
+                raise TimeoutError("Timed out waiting for mcserver prompt")
+            try:
+                sock.settimeout(remaining)
+                chunk = sock.recv(4096)
+            except socket.timeout:
+                continue
+            except OSError as e:
+                self._drop(gen)
+                raise ConnectionError(f"mcserver connection lost: {e}") from e
+            if not chunk:
+                self._drop(gen)
+                raise ConnectionError("mcserver closed the connection")
+            with self._lock:
+                if gen == self._gen:
+                    self._rx += chunk
+
+    def _drain_replies(self):
+        """Discards replies to fire-and-forget commands without blocking."""
+        with self._lock:
+            sock, gen = self._sock, self._gen
+        if sock is None:
+            return
+        try:
+            readable, _, _ = select.select([sock], [], [], 0)
+            if not readable:
+                return
+            chunk = sock.recv(4096)
+        except (OSError, ValueError):
+            self._drop(gen)
+            return
+        if not chunk:
+            self._drop(gen)
+            return
+        with self._lock:
+            if gen != self._gen:
+                return
+            self._rx += chunk
+            while self._frames <= self._sent and self._pop_frame_locked() is not None:
+                pass
+
+    # --- Worker ---
+    def _submit(self, command, expects_reply, timeout, cancel_on_stop):
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("McServerClient is closed")
+            self._jobs.append(_Job(command, future, expects_reply, timeout, cancel_on_stop))
+            self._cond.notify()
+        return future
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._jobs and not self._closed:
+                    self._cond.wait(IDLE_DRAIN_INTERVAL)
+                if self._closed:
+                    return
+                job = self._jobs.popleft() if self._jobs else None
+            if job is None:
+                self._drain_replies()
+                continue
+            if not job.future.set_running_or_notify_cancel():
+                continue
+            try:
+                if job.expects_reply and isinstance(job.command, tuple):
+                    result = self._round_trip_many(job.command, job.timeout)
+                elif job.expects_reply:
+                    result = self._round_trip(job.command, job.timeout, retry=not job.cancel_on_stop)
+                else:
+                    self._write_line(job.command)
+                    result = None
+            except Exception as e:
+                job.future.set_exception(e)
+            else:
+                job.future.set_result(result)
+
+    def _round_trip(self, command, timeout, retry=True):
+        timeout = self.reply_timeout if timeout is None else timeout
+        for attempt in (0, 1):
+            seq, gen = self._write_line(command)
+            try:
+                return self._read_reply(seq, gen, time.monotonic() + timeout)
+            except ConnectionError:
+                # Queries have no side effects, so one retry on a fresh
+                # connection is safe.
+                if attempt or not retry:
+                    raise
+
+    def _round_trip_many(self, commands, timeout):
+        timeout = self.reply_timeout if timeout is None else timeout
+        for attempt in (0, 1):
+            first, gen = self._write_lines(commands)
+            deadline = time.monotonic() + timeout
+            try:
+                return [self._read_reply(first + i, gen, deadline) for i in range(len(commands))]
+            except ConnectionError:
+                if attempt:
+                    raise
+
+
+def parse_status_reply(command, response):
+    """Extracts the value of a mode/speed/coord/servo query from its reply."""
+    response = response.strip()
+    if command == "speed":
+        match = re.search(r"mcserver>\s*(\d+)", response)
+        return match.group(1) if match else "ERROR: No speed found"
+    elif command == "servo":
+        match = re.search(r"servo\s*(on|off)", response, re.IGNORECASE)
+        return match.group(1).upper() if match else "ERROR: Servo status unknown"
+    elif command == "coord":
+        match = re.search(
+            r"mcserver>current mode:\s*(joint|cart|cyl|tool|user|cylinder)",
+            response, re.IGNORECASE
+        )
+        return match.group(1).upper() if match else "ERROR: Coord mode unknown"
+    elif command == "mode":
+        match = re.search(r"mcserver>current mode:\s*(\w+)", response, re.IGNORECASE)
+        return match.group(1).upper() if match else "ERROR: Mode unknown"
+    return response
@@ -0,0 +1,279 @@
+"""
+Motion-complete and stall detection on the live joint stream.
+
+The detector keeps the last few joint samples in a fixed-size ring and
+estimates per-joint velocity from it. robotmon only redraws what changed,
+so a robot at rest sends nothing; a joint that has not changed for
+`idle_gap` seconds is therefore taken as stopped at its last sample.
+
+Events (MotionEvent.kind):
+    in_position        every joint within tolerance of the expected target
+    settled            in position (or stopped after cancel()) and still for settle_time
+    stalled            target not reached and still for stall_time
+    unexpected_motion  a joint moved away from rest while no move was expected
+
+While RobotState says the robotmon link is not live, no events are raised
+and still-time starts over: silence on a dead connection is not the arm
+settling or stalling.
+
+Each event carries the arrival time of the sample that triggered it; for
+the time-based events (settled, stalled) that is the moment the condition
+was met. latency = detection time - that time, and is tracked per kind.
+
+    detector = MotionDetector(link.state).start()
+    detector.expect(target)            # right after sending runForward
+    event = detector.wait_for(("settled", "stalled"), timeout=30)
+"""
+import collections
+import threading
+import time
+
+import numpy as np
+
+from latency_stats import LatencyTracker
+from robot_state import JOINT_NAMES, JOINTS_MASK
+
+IN_POSITION = "in_position"
+SETTLED = "settled"
+STALLED = "stalled"
+UNEXPECTED_MOTION = "unexpected_motion"
+EVENT_KINDS = (IN_POSITION, SETTLED, STALLED, UNEXPECTED_MOTION)
+
+# Detector states
+IDLE, MOVING, ARRIVED, STALLING, STOPPING, DRIFTING = "idle", "moving", "arrived", "stalled", "stopping", "drifting"
+
+MotionEvent = collections.namedtuple("MotionEvent", "kind time sample_time latency joints speed distance seq")
+MotionEvent.__doc__ = """
+One detector event. time/sample_time are perf_counter seconds; joints the 8
+angles at detection; speed the largest joint speed in deg/s; distance the
+largest joint error to the target in degrees (None without a target).
+"""
+
+
+class MotionDetector:
+    """Per-joint velocity estimation and motion events for one RobotState."""
+
+    def __init__(self, robot_state, tolerance=0.5, still_velocity=0.2, settle_time=0.2,
+                 stall_time=1.0, motion_tolerance=0.5, idle_gap=0.15, window=8):
+        """
+        Args:
+            tolerance: Degrees per joint that count as in position.
+            still_velocity: Joint speed (deg/s) below which the arm counts as still.
+            settle_time: Seconds still and in position before "settled".
+            stall_time: Seconds still short of the target before "stalled".
+            motion_tolerance: Degrees a joint may move away from rest before
+                "unexpected_motion", when no move is expected.
+            idle_gap: Seconds without a joint change after which the arm counts as stopped.
+            window: Samples in the velocity ring buffer.
+        """
+        self.state = robot_state
+        self.tolerance = tolerance
+        self.still_velocity = still_velocity
+        self.settle_time = settle_time
+        self.stall_time = stall_time
+        self.motion_tolerance = motion_tolerance
+        self.idle_gap = idle_gap
+        self.latency = {kind: LatencyTracker() for kind in EVENT_KINDS}
+
+        self._times = np.zeros(window)
+        self._joints = np.zeros((window, len(JOINT_NAMES)))
+        self._count = 0
+        self._head = -1
+        self._velocity = np.zeros(len(JOINT_NAMES))
+
+        self._cond = threading.Condition()
+        self._mode = IDLE
+        self._target = None
+        self._target_tolerance = tolerance
+        self._rest = None
+        self._still_since = None
+        self._changed_at = 0.0   # still-time never counts from before the last expect()/cancel()
+        self._events = collections.deque(maxlen=64)
+        self._event_count = 0
+        self._listeners = []
+        self._thread = None
+        self._stopped = False
+        self._seq = 0
+        self._stale = True
+
+    # --- Control ---
+    def start(self):
+        """Starts the detector thread. Returns self."""
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="motion-detector", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._stopped = True
+        if self._thread is not None:
+            self._thread.join()
+
+    def expect(self, target, tolerance=None):
+        """Call when a move to `target` (8 joint values) is sent."""
+        with self._cond:
+            self._target = np.array([float(v) for v in target])
+            self._target_tolerance = self.tolerance if tolerance is None else tolerance
+            self._mode = MOVING
+            self._still_since = None
+            self._changed_at = time.perf_counter()
+            self._cond.notify_all()
+
+    def cancel(self):
+        """Call on stop: no target any more; "settled" follows once the arm is still."""
+        with self._cond:
+            self._target = None
+            self._mode = STOPPING
+            self._still_since = None
+            self._changed_at = time.perf_counter()
+            self._cond.notify_all()
+
+    @property
+    def mode(self):
+        return self._mode
+
+    def velocity(self):
+        """Latest per-joint velocity estimate in deg/s (JOINT_NAMES order)."""
+        with self._cond:
+            return self._velocity.copy()
+
+    # --- Events ---
+    def add_listener(self, callback):
+        """Calls callback(MotionEvent) on the detector thread for every event."""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        self._listeners.remove(callback)
+
+    def wait_for(self, kinds, timeout=None):
+        """
+        Blocks until the next event of one of `kinds` (a kind or a tuple)
+        after this call. Returns it, or None on timeout.
+        """
+        if isinstance(kinds, str):
+            kinds = (kinds,)
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        with self._cond:
+            first = self._event_count
+            while True:
+                for index, event in self._events:
+                    if index >= first and event.kind in kinds:
+                        return event
+                remaining = None if deadline is None else deadline - time.perf_counter()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+
+    # --- Detector thread ---
+    def _run(self):
+        while not self._stopped:
+            result = self.state.wait(self._seq, timeout=self._tick())
+            now = time.perf_counter()
+            with self._cond:
+                sample_time = None
+                if result is not None:
+                    snap, changed = result
+                    self._seq = snap.seq
+                    self._stale = snap.stale
+                    if changed & JOINTS_MASK and snap.joints is not None:
+                        sample_time = snap.joint_arrival or now
+                        self._add_sample(sample_time, snap.joints)
+                events = self._evaluate(now, sample_time, self._seq)
+                for event in events:
+                    self._events.append((self._event_count, event))
+                    self._event_count += 1
+                    self.latency[event.kind].record(event.latency, now)
+                if events:
+                    self._cond.notify_all()
+            for event in events:
+                for callback in list(self._listeners):
+                    callback(event)
+
+    def _tick(self):
+        """How long to wait for the next sample: until the next settle/stall/idle deadline."""
+        with self._cond:
+            if not self._count or self._mode == IDLE:
+                return 0.5
+            deadlines = []
+            if self._still_since is None:
+                deadlines.append(self._times[self._head] + self.idle_gap)
+            else:
+                hold = self.stall_time if self._mode == MOVING else self.settle_time
+                deadlines.append(self._still_since + hold)
+            wait = min(deadlines) - time.perf_counter()
+        return min(0.5, max(0.001, wait))
+
+    def _add_sample(self, t, joints):
+        self._head = (self._head + 1) % len(self._times)
+        self._times[self._head] = t
+        self._joints[self._head] = joints
+        self._count = min(self._count + 1, len(self._times))
+        oldest = (self._head - self._count + 1) % len(self._times)
+        dt = t - self._times[oldest]
+        if self._count > 1 and dt > 0:
+            np.subtract(self._joints[self._head], self._joints[oldest], out=self._velocity)
+            self._velocity /= dt
+        else:
+            self._velocity[:] = 0.0
+
+    def _evaluate(self, now, sample_time, seq):
+        """Runs the state machine; returns new events. sample_time is None on a timer tick."""
+        if not self._count:
+            return []
+        if self._stale:
+            self._still_since = None
+            self._changed_at = now   # nothing seen while stale counts as still
+            return []
+        joints = self._joints[self._head]
+        last = self._times[self._head]
+        speed = float(np.abs(self._velocity).max())
+        if now - last >= self.idle_gap:
+            speed = 0.0   # no redraw for a while: stopped at the last sample
+            if self._still_since is None:
+                self._still_since = max(last, self._changed_at)
+        elif speed < self.still_velocity:
+            if self._still_since is None:
+                self._still_since = max(sample_time or last, self._changed_at)
+        else:
+            self._still_since = None
+        still_for = None if self._still_since is None else now - self._still_since
+
+        distance = None if self._target is None else float(np.abs(joints - self._target).max())
+        events = []
+
+        def emit(kind, t):
+            events.append(MotionEvent(kind, now, t, now - t, tuple(joints.tolist()), speed, distance, seq))
+
+        mode = self._mode
+        if mode in (MOVING, STALLING):
+            if distance <= self._target_tolerance:
+                self._mode = ARRIVED
+                emit(IN_POSITION, sample_time or last)
+            elif mode == MOVING and still_for is not None and still_for >= self.stall_time:
+                self._mode = STALLING
+                emit(STALLED, self._still_since + self.stall_time)
+            elif mode == STALLING and still_for is None:
+                self._mode = MOVING
+        if self._mode == ARRIVED:
+            if distance > self._target_tolerance:
+                self._mode = MOVING   # overshoot or knocked out again
+            elif still_for is not None and still_for >= self.settle_time:
+                self._settle(joints)
+                emit(SETTLED, self._still_since + self.settle_time)
+        elif mode == STOPPING and still_for is not None and still_for >= self.settle_time:
+            self._settle(joints)
+            emit(SETTLED, self._still_since + self.settle_time)
+        elif mode == IDLE:
+            if self._rest is None:
+                self._rest = joints.copy()
+            elif float(np.abs(joints - self._rest).max()) > self.motion_tolerance:
+                self._mode = DRIFTING
+                emit(UNEXPECTED_MOTION, sample_time or last)
+        elif mode == DRIFTING and still_for is not None and still_for >= self.settle_time:
+            self._settle(joints)
+        return events
+
+    def _settle(self, joints):
+        self._mode = IDLE
+        self._rest = joints.copy()
+        self._target = None
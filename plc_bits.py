@@ -0,0 +1,141 @@
+"""
+PLC bit fields as 64-bit integers.
+
+Bit i is the i-th bit robotmon shows (left to right), so "X-------" is 0x1.
+Edges between two snapshots are found for all 64 bits at once with integer
+masks, and PlcWatcher turns them into events that code can subscribe to or
+block on, e.g. to wait for a part-present input before moving.
+"""
+import collections
+import threading
+import time
+
+PLC_BITS = 64
+ALL_BITS = (1 << PLC_BITS) - 1
+PLC_FIELDS = ("plc_in", "plc_out")
+
+# Display text for every byte value, bit 0 first
+_BYTE_TEXT = ["".join("1" if b >> i & 1 else "0" for i in range(8)) for b in range(256)]
+PLACEHOLDER = " ".join(["--------"] * (PLC_BITS // 8))
+
+
+def bits_to_int(bit_string):
+    """'0'/'1' string (first character = bit 0) -> int, or None unless it has PLC_BITS bits."""
+    if bit_string is None or len(bit_string) != PLC_BITS:
+        return None
+    return int(bit_string[::-1], 2)
+
+
+def int_to_bits(value):
+    """int -> '0'/'1' string with bit 0 first."""
+    return format(value, f"0{PLC_BITS}b")[::-1]
+
+
+def format_bits(value):
+    """Formats a PLC word as eight space-separated groups of eight bits."""
+    if value is None:
+        return PLACEHOLDER
+    return " ".join([_BYTE_TEXT[(value >> shift) & 0xFF] for shift in range(0, PLC_BITS, 8)])
+
+
+def edges(old, new):
+    """Returns (rising, falling) masks between two PLC words."""
+    if old is None or new is None:
+        return 0, 0
+    changed = old ^ new
+    return changed & new, changed & old
+
+
+def iter_bits(mask):
+    """Yields the index of every set bit in `mask`, lowest first."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def bit_is_set(value, bit):
+    return value is not None and bool(value >> bit & 1)
+
+
+PlcEdge = collections.namedtuple("PlcEdge", "field rising falling value time seq")
+PlcEdge.__doc__ = "Rising/falling masks of one PLC word change; time is perf_counter at detection."
+
+_Subscription = collections.namedtuple("_Subscription", "callback field mask rising falling")
+
+
+class PlcWatcher:
+    """
+    Edge detection and subscriptions on the PLC words in a RobotState.
+    Callbacks run on the thread that updated the state (the SSH reader), so
+    they should be quick.
+    """
+
+    def __init__(self, robot_state):
+        self._cond = threading.Condition()
+        self._values = dict.fromkeys(PLC_FIELDS)
+        self._subs = {}
+        self._next_token = 0
+        snap, _ = robot_state.snapshot()
+        self._values.update(plc_in=snap.plc_in, plc_out=snap.plc_out)
+        self._live = not snap.stale
+        robot_state.add_listener(self._on_state_change)
+
+    def subscribe(self, callback, field="plc_in", mask=ALL_BITS, rising=True, falling=True):
+        """
+        Calls callback(PlcEdge) when a bit in `mask` of `field` rises or falls.
+        The edge masks passed on are already limited to `mask`. Returns a token
+        for unsubscribe().
+        """
+        with self._cond:
+            self._next_token += 1
+            self._subs[self._next_token] = _Subscription(callback, field, mask, rising, falling)
+            return self._next_token
+
+    def unsubscribe(self, token):
+        with self._cond:
+            self._subs.pop(token, None)
+
+    def value(self, field="plc_in"):
+        return self._values[field]
+
+    def wait_for(self, bit, state=True, field="plc_in", timeout=None):
+        """
+        Blocks until `bit` of `field` equals `state`. Returns True when it does,
+        False on timeout. Returns at once if the bit already has that state.
+        A word not read yet, or read over a link that is no longer live, has
+        no state: neither wait is satisfied until live data shows the bit.
+        """
+        def satisfied():
+            value = self._values[field]
+            return self._live and value is not None and bool(value >> bit & 1) == state
+
+        with self._cond:
+            return self._cond.wait_for(satisfied, timeout)
+
+    def wait_for_input(self, bit, state=True, timeout=None):
+        return self.wait_for(bit, state, "plc_in", timeout)
+
+    def _on_state_change(self, snap, mask):
+        now = time.perf_counter()
+        events = []
+        with self._cond:
+            self._live = not snap.stale
+            for field in PLC_FIELDS:
+                new = getattr(snap, field)
+                if new == self._values[field]:
+                    continue
+                rising, falling = edges(self._values[field], new)
+                self._values[field] = new
+                if rising or falling:
+                    events.append(PlcEdge(field, rising, falling, new, now, snap.seq))
+            subs = list(self._subs.values())
+            self._cond.notify_all()
+        for edge in events:
+            for sub in subs:
+                if sub.field != edge.field:
+                    continue
+                rising = edge.rising & sub.mask if sub.rising else 0
+                falling = edge.falling & sub.mask if sub.falling else 0
+                if rising or falling:
+                    sub.callback(edge._replace(rising=rising, falling=falling))
@@ -0,0 +1,432 @@
+"""
+Live joint and PLC-bit plots for the GUI.
+
+SampleHistory keeps every joint/PLC change in preallocated NumPy ring
+buffers and is filled by a RobotState listener, so recording costs one row
+assignment on the reader thread and nothing is dropped by the GUI's
+coalescing. An hour at 100 Hz takes about 21.4 MB: 56 bytes per row (8 time,
+32 joints, 16 PLC) and 112 per block of BLOCK rows.
+
+PlotPanel draws the visible window on a Tk Canvas at most max_fps times a
+second. The window is cut out of the ring with a binary search, and each
+trace is reduced to the minimum and maximum of every pixel column, so short
+spikes and PLC pulses narrower than a pixel still show. The ring also keeps
+the min/max of every BLOCK rows; windows long enough to have BLOCK rows per
+column are reduced from those, so a redraw never touches more than about
+BLOCK rows per pixel column whether it shows ten seconds or the whole hour.
+A block is only used when its first and last row fall in the same column;
+robotmon sends changes only, so a block can span an idle gap, and such a
+block is drawn from its rows instead.
+Line items are created once and only get new coordinates. If a redraw
+takes longer than its share of the Tk loop, the next one is pushed back,
+so plotting never starves update_gui.
+
+    history = SampleHistory()
+    history.attach(robot.state)
+    PlotPanel(toplevel, history, plc_bits=[("in", 0), ("out", 3)]).pack(fill="both", expand=True)
+"""
+import collections
+import threading
+import time
+import tkinter as tk
+
+import numpy as np
+
+from robot_state import JOINT_NAMES, JOINTS_MASK, PLC_MASK
+
+# Samples kept: one hour at 100 changes per second
+DEFAULT_CAPACITY = 360000
+# Rows per min/max block; windows with at least this many rows per pixel column are drawn from blocks
+BLOCK = 32
+TRACE_COLORS = ("#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd", "#8c564b", "#e377c2", "#7f7f7f")
+PLC_COLORS = ("#17becf", "#bcbd22")   # in, out
+
+Columns = collections.namedtuple("Columns", "cols joint_min joint_max bit_min bit_max last_joints last_plc rows")
+Columns.__doc__ = """
+A window decimated to pixel columns. cols (B,) are column indices;
+joint_min/joint_max (B, 8) and bit_min/bit_max (B, bits) the extremes in
+each; last_joints/last_plc the newest row; rows the samples covered.
+"""
+
+
+def column_index(t, t0, t1, width):
+    """Pixel column of each time of a `width` pixel wide plot of [t0, t1], clipped to the plot."""
+    cols = ((t - t0) * (width / (t1 - t0))).astype(np.int64)
+    np.clip(cols, 0, width - 1, out=cols)
+    return cols
+
+
+def column_starts(t, t0, t1, width):
+    """Pixel column of each time in [t0, t1] (ascending t) and where each new column starts."""
+    cols = column_index(t, t0, t1, width)
+    starts = np.flatnonzero(np.concatenate(([True], cols[1:] != cols[:-1])))
+    return cols[starts], starts
+
+
+def minmax_decimate(t, y, t0, t1, width, y_max=None):
+    """
+    Reduces samples to their minimum and maximum per pixel column of a
+    `width` pixel wide plot of [t0, t1]. t is (N,) ascending, y (N, C); pass
+    y_max when y holds per-sample minima of pre-reduced data. Returns
+    (column index (B,), min (B, C), max (B, C)); NaNs are ignored unless a
+    whole column is NaN.
+    """
+    cols, starts = column_starts(t, t0, t1, width)
+    with np.errstate(invalid="ignore"):
+        return cols, np.fmin.reduceat(y, starts, axis=0), np.fmax.reduceat(y if y_max is None else y_max, starts, axis=0)
+
+
+def reduce_columns(t, joint_min, joint_max, word_and, word_or, t0, t1, width):
+    """
+    Per-column extremes of time-ordered entries (rows or pre-reduced blocks):
+    (column index (B,), joint min, joint max (B, 8), PLC AND, OR (B, 2)).
+    """
+    cols, starts = column_starts(t, t0, t1, width)
+    # Joint by joint (transposed copies): several times faster than reducing down axis 0
+    with np.errstate(invalid="ignore"):
+        joint_min = np.fmin.reduceat(joint_min.T.copy(), starts, axis=1).T
+        joint_max = np.fmax.reduceat(joint_max.T.copy(), starts, axis=1).T
+    return (cols, joint_min, joint_max, np.bitwise_and.reduceat(word_and, starts, axis=0),
+            np.bitwise_or.reduceat(word_or, starts, axis=0))
+
+
+class SampleHistory:
+    """
+    Fixed-size ring of (arrival time, 8 joints, PLC in, PLC out) rows, one per
+    RobotState change, plus the min/max of every BLOCK rows (AND/OR for the
+    PLC words) so long windows are decimated from blocks instead of rows.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = -(-capacity // BLOCK) * BLOCK
+        blocks = self.capacity // BLOCK
+        self._t = np.zeros(self.capacity)
+        self._joints = np.full((self.capacity, len(JOINT_NAMES)), np.nan, dtype=np.float32)
+        self._plc = np.zeros((self.capacity, 2), dtype=np.uint64)
+        self._block_first = np.zeros(blocks)   # time of each block's first and last row
+        self._block_last = np.zeros(blocks)
+        self._block_min = np.full((blocks, len(JOINT_NAMES)), np.nan, dtype=np.float32)
+        self._block_max = np.full((blocks, len(JOINT_NAMES)), np.nan, dtype=np.float32)
+        self._block_and = np.zeros((blocks, 2), dtype=np.uint64)
+        self._block_or = np.zeros((blocks, 2), dtype=np.uint64)
+        self._lock = threading.Lock()
+        self.count = 0          # rows ever appended; the ring holds the last `capacity`
+        self._state = None
+        self._listener = None
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    # --- Recording ---
+    def append(self, t, joints, plc_in, plc_out):
+        """Adds one row. joints may be None (NaN), PLC words None (0)."""
+        with self._lock:
+            i = self.count % self.capacity
+            self._t[i] = t
+            if joints is None:
+                self._joints[i] = np.nan
+            else:
+                self._joints[i] = joints
+            self._plc[i, 0] = plc_in or 0
+            self._plc[i, 1] = plc_out or 0
+            self.count += 1
+            if i % BLOCK == BLOCK - 1:
+                k = i // BLOCK
+                rows = slice(i + 1 - BLOCK, i + 1)
+                self._block_first[k] = self._t[i + 1 - BLOCK]
+                self._block_last[k] = t
+                self._block_min[k] = np.fmin.reduce(self._joints[rows])
+                self._block_max[k] = np.fmax.reduce(self._joints[rows])
+                self._block_and[k] = np.bitwise_and.reduce(self._plc[rows])
+                self._block_or[k] = np.bitwise_or.reduce(self._plc[rows])
+
+    def append_snapshot(self, snap, changed):
+        if not changed & (JOINTS_MASK | PLC_MASK):
+            return
+        t = snap.joint_arrival if changed & JOINTS_MASK and snap.joint_arrival else snap.updated
+        self.append(t, snap.joints, snap.plc_in, snap.plc_out)
+
+    def attach(self, robot_state):
+        """Records every joint/PLC change of `robot_state` until detach()."""
+        self.detach()
+        self._listener = self.append_snapshot
+        self._state = robot_state
+        robot_state.add_listener(self._listener)
+
+    def detach(self):
+        if self._listener is not None:
+            self._state.remove_listener(self._listener)
+            self._listener = None
+            self._state = None
+
+    # --- Reading; rows are addressed oldest first (0 .. len-1) ---
+    def _start(self):
+        return 0 if self.count <= self.capacity else self.count % self.capacity
+
+    def _slices(self, r0, r1):
+        """Physical slices holding rows r0 .. r1-1."""
+        a = (self._start() + r0) % self.capacity
+        b = a + r1 - r0
+        if b <= self.capacity:
+            return [slice(a, b)]
+        return [slice(a, self.capacity), slice(0, b - self.capacity)]
+
+    def _rows(self, array, r0, r1):
+        parts = [array[s] for s in self._slices(r0, r1)] if r1 > r0 else [array[:0]]
+        return np.concatenate(parts) if len(parts) > 1 else parts[0].copy()
+
+    def _search(self, value, side):
+        """Row index where `value` would go in the time column (numpy.searchsorted semantics)."""
+        start = self._start()
+        if start == 0:
+            return int(np.searchsorted(self._t[:len(self)], value, side))
+        older = self._t[start:]
+        first_newer = self._t[0]
+        if value < first_newer or (side == "left" and value == first_newer):
+            return int(np.searchsorted(older, value, side))
+        return len(older) + int(np.searchsorted(self._t[:start], value, side))
+
+    def _window_rows(self, t0, t1):
+        """Rows in [t0, t1] plus the one before t0, so traces start at the left edge."""
+        return max(0, self._search(t0, "left") - 1), self._search(t1, "right")
+
+    def span(self):
+        """(oldest, newest) sample time, or None while empty."""
+        with self._lock:
+            if not self.count:
+                return None
+            return float(self._t[self._start()]), float(self._t[(self.count - 1) % self.capacity])
+
+    def window(self, t0, t1):
+        """Copies of (times, joints, plc) for the samples in [t0, t1] plus the last one before t0."""
+        with self._lock:
+            r0, r1 = self._window_rows(t0, t1)
+            return self._rows(self._t, r0, r1), self._rows(self._joints, r0, r1), self._rows(self._plc, r0, r1)
+
+    def _ring_blocks(self, array, first, count):
+        """Copy of `count` consecutive entries of a per-block array from block `first`, wrapping."""
+        end = first + count
+        if end <= len(array):
+            return array[first:end].copy()
+        return np.concatenate((array[first:], array[:end - len(array)]))
+
+    def columns(self, t0, t1, width, bits=(), hold=True):
+        """
+        Decimates [t0, t1] to `width` pixel columns. bits is [(word 0=in 1=out, bit), ...].
+        With hold, the newest row is extended to t1 (robotmon only sends changes).
+        Returns Columns, or None when the window holds no samples.
+        """
+        with self._lock:
+            r0, r1 = self._window_rows(t0, t1)
+            if r1 <= r0:
+                return None
+            # Whole blocks inside the window, when there are enough rows per column for them
+            off = -self._start() % BLOCK
+            j0 = -(-(r0 - off) // BLOCK)
+            j1 = (r1 - off) // BLOCK
+            if r1 - r0 < width * BLOCK or j1 <= j0:
+                j0 = j1 = 0
+                b0 = b1 = r1
+            else:
+                b0, b1 = off + j0 * BLOCK, off + j1 * BLOCK
+            # Copies only; the reductions run after the lock is released
+            parts = [[self._rows(a, r0, b0) for a in (self._t, self._joints, self._joints, self._plc, self._plc)],
+                     [self._rows(a, b1, r1) for a in (self._t, self._joints, self._joints, self._plc, self._plc)]]
+            if j1 > j0:
+                blocks = len(self._block_min)
+                first = ((self._start() + off) // BLOCK + j0) % blocks
+                block_part = [self._ring_blocks(a, first, j1 - j0) for a in (
+                    self._block_first, self._block_min, self._block_max, self._block_and, self._block_or)]
+                # A block stands for its rows only if they all land in one column; the rest
+                # (spanning a column edge or an idle gap) are drawn from their rows
+                split = np.flatnonzero(column_index(block_part[0], t0, t1, width)
+                                       != column_index(self._ring_blocks(self._block_last, first, j1 - j0),
+                                                       t0, t1, width))
+                if len(split):
+                    physical = (first + split) % blocks
+                    split_t, split_joints, split_plc = (
+                        a.reshape((blocks, BLOCK) + a.shape[1:])[physical].reshape((-1,) + a.shape[1:])
+                        for a in (self._t, self._joints, self._plc))
+                    parts.append([split_t, split_joints, split_joints, split_plc, split_plc])
+                    # Left in place as neutral entries at the block's first row, which is drawn anyway
+                    block_part[1][split] = np.nan
+                    block_part[2][split] = np.nan
+                    block_part[3][split] = ~np.uint64(0)
+                    block_part[4][split] = 0
+                parts.append(block_part)
+            last = (r1 - 1 + self._start()) % self.capacity
+            last_joints, last_plc = self._joints[last].copy(), self._plc[last].copy()
+
+        if hold:
+            parts.append([np.array([t1]), last_joints[None], last_joints[None], last_plc[None], last_plc[None]])
+        reduced = [reduce_columns(*part, t0, t1, width) for part in parts if len(part[0])]
+        if len(reduced) == 1:
+            cols, joint_min, joint_max, word_and, word_or = reduced[0]
+        else:
+            # Parts overlap in columns (split blocks lie between whole ones): merge per column
+            merged = [np.concatenate(arrays) for arrays in zip(*reduced)]
+            order = np.argsort(merged[0], kind="stable")
+            cols = merged[0][order]
+            starts = np.flatnonzero(np.concatenate(([True], cols[1:] != cols[:-1])))
+            cols = cols[starts]
+            with np.errstate(invalid="ignore"):
+                joint_min = np.fmin.reduceat(merged[1][order], starts, axis=0)
+                joint_max = np.fmax.reduceat(merged[2][order], starts, axis=0)
+            word_and = np.bitwise_and.reduceat(merged[3][order], starts, axis=0)
+            word_or = np.bitwise_or.reduceat(merged[4][order], starts, axis=0)
+        bit_min = np.empty((len(cols), len(bits)))
+        bit_max = np.empty((len(cols), len(bits)))
+        for k, (word, bit) in enumerate(bits):
+            bit_min[:, k] = (word_and[:, word] >> np.uint64(bit)) & np.uint64(1)
+            bit_max[:, k] = (word_or[:, word] >> np.uint64(bit)) & np.uint64(1)
+        return Columns(cols, joint_min, joint_max, bit_min, bit_max, last_joints, last_plc, r1 - r0)
+
+
+class PlotPanel(tk.Frame):
+    """Canvas with one strip per joint and one for the selected PLC bits, redrawn at a capped rate."""
+
+    def __init__(self, parent, history, window=30.0, max_fps=10.0, plc_bits=(), busy_fraction=0.25,
+                 timings=None, width=900, height=560, **kwargs):
+        """
+        Args:
+            history: SampleHistory to draw from.
+            window: Seconds shown; the mouse wheel halves/doubles it.
+            max_fps: Redraw at most this often.
+            plc_bits: [("in" | "out", bit), ...] drawn as 0/1 lanes in the last strip.
+            busy_fraction: Share of the Tk loop a redraw may take; slower redraws delay the next one.
+            timings: Optional instrumentation.StageTimings; each redraw is recorded as "plot".
+        """
+        super().__init__(parent, **kwargs)
+        self.history = history
+        self.window = window
+        self.min_interval = 1.0 / max_fps
+        self.plc_bits = [(0 if word == "in" else 1, int(bit), f"{word.upper()}{bit}") for word, bit in plc_bits]
+        self.busy_fraction = busy_fraction
+        self.timings = timings
+        self.paused = False
+        self.canvas = tk.Canvas(self, width=width, height=height, bg="white", highlightthickness=0)
+        self.canvas.pack(fill="both", expand=True)
+        self.canvas.bind("<Configure>", self._layout)
+        self.canvas.bind("<MouseWheel>", lambda e: self.zoom(0.5 if e.delta > 0 else 2.0))
+        self.canvas.bind("<Button-4>", lambda e: self.zoom(0.5))
+        self.canvas.bind("<Button-5>", lambda e: self.zoom(2.0))
+        self.canvas.bind("<Button-1>", lambda e: self.toggle_pause())
+        self._strips = []       # (top, bottom) per strip
+        self._lines = []        # canvas line per joint
+        self._labels = []       # canvas text per strip
+        self._plc_lines = []
+        self._footer = None
+        self._after = None
+        self._drawn_count = -1
+        self._drawn_right = None
+        self._layout()
+        self._tick()
+
+    # --- Controls ---
+    def zoom(self, factor):
+        span = self.history.span()
+        longest = max(1.0, span[1] - span[0]) if span else self.window
+        self.window = min(max(1.0, self.window * factor), longest)
+        self._drawn_count = -1
+
+    def toggle_pause(self):
+        self.paused = not self.paused
+        self._drawn_count = -1
+        if self.paused:
+            self.canvas.itemconfigure(self._footer, text="paused, click to resume")
+
+    def destroy(self):
+        if self._after is not None:
+            self.after_cancel(self._after)
+            self._after = None
+        super().destroy()
+
+    # --- Drawing ---
+    def _layout(self, event=None):
+        c = self.canvas
+        c.delete("all")
+        width = max(100, c.winfo_width() if event is not None else int(c.cget("width")))
+        height = max(100, c.winfo_height() if event is not None else int(c.cget("height")))
+        self._left, self._right = 60, width - 10
+        n = len(JOINT_NAMES) + (1 if self.plc_bits else 0)
+        strip = (height - 20) / n
+        self._strips = [(i * strip + 2, (i + 1) * strip - 2) for i in range(n)]
+        self._lines, self._labels, self._plc_lines = [], [], []
+        for i, (top, bottom) in enumerate(self._strips):
+            c.create_line(self._left, bottom, self._right, bottom, fill="#dddddd")
+            name = JOINT_NAMES[i] if i < len(JOINT_NAMES) else "PLC"
+            self._labels.append(c.create_text(4, (top + bottom) / 2, anchor="w", font=("Courier", 8), text=name))
+            if i < len(JOINT_NAMES):
+                self._lines.append(c.create_line(0, 0, 0, 0, fill=TRACE_COLORS[i]))
+        for word, bit, name in self.plc_bits:
+            self._plc_lines.append(c.create_line(0, 0, 0, 0, fill=PLC_COLORS[word]))
+        self._footer = c.create_text(self._left, height - 4, anchor="sw", font=("Helvetica", 8), fill="grey")
+        self._drawn_count = -1
+
+    def _tick(self):
+        started = time.perf_counter()
+        drew = False
+        if not self.paused:
+            drew = self.redraw(started)
+        cost = time.perf_counter() - started
+        if drew and self.timings is not None:
+            self.timings.record("plot", cost)
+        delay = max(self.min_interval, cost / self.busy_fraction)
+        self._after = self.after(max(1, int(delay * 1000)), self._tick)
+
+    def redraw(self, now=None):
+        """Redraws the window ending at `now` (perf_counter). Returns False if nothing needed drawing."""
+        span = self.history.span()
+        if span is None:
+            return False
+        # A robot at rest sends nothing; scroll anyway so the time axis stays honest,
+        # but skip the work when neither the data nor the visible pixels changed.
+        right = now if now is not None else time.perf_counter()
+        width = max(2, int(self._right - self._left))
+        if (self.history.count == self._drawn_count and self._drawn_right is not None
+                and (right - self._drawn_right) * width < self.window):
+            return False
+        left = right - self.window
+        data = self.history.columns(left, right, width, [(word, bit) for word, bit, _ in self.plc_bits])
+        self._drawn_count = self.history.count
+        self._drawn_right = right
+        c = self.canvas
+        if data is None:
+            for line in self._lines + self._plc_lines:
+                c.coords(line, 0, 0, 0, 0)
+            return True
+
+        cols = data.cols
+        x = np.repeat(self._left + cols, 2).astype(float)
+        for i, line in enumerate(self._lines):
+            top, bottom = self._strips[i]
+            ymin, ymax = data.joint_min[:, i], data.joint_max[:, i]
+            finite = np.isfinite(ymin)
+            if not finite.any():
+                c.coords(line, 0, 0, 0, 0)
+                continue
+            vmin, vmax = float(ymin[finite].min()), float(ymax[finite].max())
+            pad = max(1e-3, (vmax - vmin) * 0.05)
+            k = (bottom - top) / (vmax - vmin + 2 * pad)
+            y = np.empty(2 * len(cols))
+            y[0::2] = bottom - (ymin - vmin + pad) * k
+            y[1::2] = bottom - (ymax - vmin + pad) * k
+            keep = np.repeat(finite, 2)
+            c.coords(line, *np.column_stack((x[keep], y[keep])).ravel().tolist())
+            c.itemconfigure(self._labels[i], text=f"{JOINT_NAMES[i]:<3}{data.last_joints[i]:9.3f}\n"
+                                                  f"   {vmin:9.3f}\n   {vmax:9.3f}")
+
+        if self.plc_bits:
+            top, bottom = self._strips[-1]
+            lane = (bottom - top) / len(self.plc_bits)
+            for j, line in enumerate(self._plc_lines):
+                base = top + (j + 1) * lane - 1
+                y = np.empty(2 * len(cols))
+                y[0::2] = base - data.bit_min[:, j] * (lane - 3)
+                y[1::2] = base - data.bit_max[:, j] * (lane - 3)
+                c.coords(line, *np.column_stack((x, y)).ravel().tolist())
+            c.itemconfigure(self._labels[-1], text="\n".join(
+                f"{name} {int(data.last_plc[word]) >> bit & 1}" for word, bit, name in self.plc_bits))
+
+        c.itemconfigure(self._footer, text=f"last {self.window:g} s, {data.rows} samples in {len(cols)} columns")
+        return True
@@ -0,0 +1,277 @@
+"""
+Waypoint programs: a list of joint or Cartesian targets sent one after the
+other as runForward commands.
+
+Arrival is taken from the live joint stream (RobotState), not from timers:
+a segment is done when every joint is within `tolerance` degrees of its
+target, and the next runForward goes out right then. With `lead` > 0 the
+next target is sent as soon as the remaining distance drops below `lead`
+degrees, so the controller already has it before the arm stops. Cartesian
+waypoints are solved up front, each IK seeded by the previous target, so
+no solving happens between segments.
+
+Program files are JSON:
+
+    {
+        "tolerance": 0.5, "lead": 0.0, "segment_timeout": 30, "speed": 50,
+        "waypoints": [
+            {"name": "above_pick", "joints": [0, 10, 45, 0, 35, 0, 0, 0]},
+            {"name": "pick", "pose": [450, 0, 250, 180, 0, 0], "tolerance": 0.2, "dwell": 0.3},
+            {"name": "part_present", "wait_input": 5, "state": true, "timeout": 10},
+            {"name": "place", "joints": {"S": 90, "L": 10, "U": 45, "R": 0, "B": 35, "T": 0}}
+        ]
+    }
+
+joints are 8 values or a dict by joint name (missing joints keep the
+previous target), pose is X Y Z in mm and extrinsic X-Y-Z angles in
+degrees (see kinematics.pose_matrix), and wait_input blocks on a PLC input
+bit via PlcWatcher.
+"""
+import collections
+import json
+import threading
+import time
+
+from robot_state import JOINT_NAMES
+
+DEFAULT_TOLERANCE = 0.5       # degrees, per joint
+DEFAULT_SEGMENT_TIMEOUT = 30.0
+
+Waypoint = collections.namedtuple("Waypoint", "name joints pose tolerance dwell wait_input state timeout")
+Waypoint.__new__.__defaults__ = (None,) * len(Waypoint._fields)
+
+SegmentTiming = collections.namedtuple("SegmentTiming", "index name start ack duration idle")
+SegmentTiming.__doc__ = """
+Timing of one executed waypoint, in seconds. start is relative to the program
+start, ack the mcserver reply time for the runForward, duration the time from
+sending until arrival (or the lead point), idle the gap between the previous
+segment finishing and this one being sent.
+"""
+
+
+def load_program(path):
+    """Reads a program file. Returns (waypoints, settings dict)."""
+    with open(path, "r") as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        data = {"waypoints": data}
+    waypoints = []
+    for i, raw in enumerate(data.get("waypoints", [])):
+        name = raw.get("name", f"#{i + 1}")
+        kinds = [key for key in ("joints", "pose", "wait_input") if key in raw]
+        if len(kinds) != 1:
+            raise ValueError(f"{path}: waypoint {name} needs exactly one of joints, pose or wait_input")
+        pose = raw.get("pose")
+        if pose is not None and len(pose) != 6:
+            raise ValueError(f"{path}: waypoint {name}: pose needs X Y Z RX RY RZ")
+        joints = raw.get("joints")
+        if isinstance(joints, list) and len(joints) != len(JOINT_NAMES):
+            raise ValueError(f"{path}: waypoint {name}: joints needs {len(JOINT_NAMES)} values")
+        waypoints.append(Waypoint(
+            name=name, joints=joints, pose=pose, tolerance=raw.get("tolerance"), dwell=raw.get("dwell", 0.0),
+            wait_input=raw.get("wait_input"), state=raw.get("state", True), timeout=raw.get("timeout"),
+        ))
+    if not waypoints:
+        raise ValueError(f"{path}: program has no waypoints")
+    settings = {key: data[key] for key in ("tolerance", "lead", "segment_timeout", "speed") if key in data}
+    return waypoints, settings
+
+
+def joint_distance(joints, target):
+    """Largest per-joint difference in degrees."""
+    return max(abs(a - b) for a, b in zip(joints, target))
+
+
+def format_report(timings):
+    """Per-segment timing table plus totals."""
+    lines = [f"{'#':>3} {'waypoint':<16} {'start':>8} {'ack ms':>7} {'move s':>7} {'idle ms':>8}"]
+    for t in timings:
+        ack = "-" if t.ack is None else f"{t.ack * 1e3:.1f}"
+        idle = "-" if t.idle is None else f"{t.idle * 1e3:.1f}"
+        lines.append(f"{t.index:>3} {t.name:<16} {t.start:>8.3f} {ack:>7} {t.duration:>7.3f} {idle:>8}")
+    if timings:
+        total = timings[-1].start + timings[-1].duration - timings[0].start
+        idle = sum(t.idle for t in timings if t.idle is not None)
+        lines.append(f"total {total:.3f} s, idle between segments {idle * 1e3:.1f} ms")
+    return "\n".join(lines)
+
+
+class ProgramRunner:
+    """Runs a waypoint program on a RobotLink, timing every segment."""
+
+    def __init__(self, link, waypoints, tolerance=DEFAULT_TOLERANCE, lead=0.0,
+                 segment_timeout=DEFAULT_SEGMENT_TIMEOUT, speed=None):
+        """
+        Args:
+            link: robot_core.RobotLink with its robotmon stream running.
+            tolerance: Arrival window in degrees for waypoints that don't set their own.
+            lead: Send the next target once the arm is this many degrees from the
+                current one (0 = wait for arrival). Never used across a dwell or wait_input.
+            speed: Optional speed command sent before the first move.
+        """
+        self.link = link
+        self.waypoints = list(waypoints)
+        self.tolerance = tolerance
+        self.lead = lead
+        self.segment_timeout = segment_timeout
+        self.speed = speed
+        self.timings = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_file(cls, link, path, **overrides):
+        waypoints, settings = load_program(path)
+        settings.update({k: v for k, v in overrides.items() if v is not None})
+        return cls(link, waypoints, **settings)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def stop(self):
+        """Aborts the program and stops the robot."""
+        self._stop.set()
+        self.link.stop()
+
+    def start(self, loops=1, on_done=None):
+        """Runs the program on a background thread; on_done(error or None) when it ends."""
+        def target():
+            try:
+                self.run(loops)
+            except Exception as e:
+                self.link.log(f"Program aborted: {e}")
+                if on_done:
+                    on_done(e)
+                return
+            if on_done:
+                on_done(None)
+        self._thread = threading.Thread(target=target, name="program-runner", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    # --- Preparation ---
+    def resolve(self, current):
+        """
+        Turns every motion waypoint into 8 joint values. Cartesian ones are
+        solved with IK seeded from the previous target. Returns a list with
+        None for wait_input steps.
+        """
+        previous = dict(zip(JOINT_NAMES, current))
+        resolved = []
+        for wp in self.waypoints:
+            if wp.wait_input is not None:
+                resolved.append(None)
+                continue
+            if wp.pose is not None:
+                from kinematics import pose_matrix
+                target = self.link.kinematics.solve_joints(pose_matrix(wp.pose[:3], wp.pose[3:]), previous)
+            elif isinstance(wp.joints, dict):
+                target = dict(previous)
+                target.update({name: float(v) for name, v in wp.joints.items()})
+            else:
+                target = dict(zip(JOINT_NAMES, (float(v) for v in wp.joints)))
+            resolved.append([target[name] for name in JOINT_NAMES])
+            previous = target
+        return resolved
+
+    def check_envelope(self, current, targets, loops=1):
+        """
+        Checks every segment of the resolved program against the link's safety
+        envelope before anything moves, including the jump from the last
+        target back to the first when looping. Raises ValueError.
+        """
+        moves = [(wp.name, target) for wp, target in zip(self.waypoints, targets) if target is not None]
+        if loops > 1 and moves:
+            moves.append(moves[0])
+        start = current
+        for name, target in moves:
+            try:
+                self.link.check_move(target, start)
+            except ValueError as e:
+                raise ValueError(f"{name}: {e}") from e
+            start = target
+
+    # --- Execution ---
+    def run(self, loops=1):
+        """Runs the program `loops` times on this thread. Returns the segment timings."""
+        self._stop.clear()
+        snap = self.link.state.wait_live(timeout=self.segment_timeout)
+        if snap is None:
+            raise RuntimeError("No live joint state from robotmon; is the stream running?")
+        targets = self.resolve(snap.joints)
+        self.check_envelope(snap.joints, targets, loops)
+        if self.speed is not None:
+            self.link.set_speed(self.speed).result(timeout=self.segment_timeout)
+
+        self.timings = []
+        t0 = time.perf_counter()
+        finished = None   # when the previous segment arrived or hit its lead point
+        for loop in range(loops):
+            for i, (wp, target) in enumerate(zip(self.waypoints, targets)):
+                if self._stop.is_set():
+                    raise RuntimeError("stopped")
+                if target is None:
+                    self._wait_input(wp)
+                    finished = time.perf_counter()
+                    continue
+                lead = self._lead_for(i, targets)
+                sent = time.perf_counter()
+                future = self.link.move(target)
+                acked = []
+                future.add_done_callback(lambda f, acked=acked: acked.append(time.perf_counter()))
+                arrived = self._wait_arrival(wp, target, future, lead, sent)
+                self.timings.append(SegmentTiming(
+                    index=len(self.timings) + 1, name=wp.name, start=sent - t0,
+                    ack=acked[0] - sent if acked else None,
+                    duration=arrived - sent, idle=None if finished is None else sent - finished,
+                ))
+                finished = arrived
+                self.link.log(f"Program: {wp.name} reached in {arrived - sent:.3f} s"
+                              + (f" (loop {loop + 1})" if loops > 1 else ""))
+                if wp.dwell:
+                    if self._stop.wait(wp.dwell):
+                        raise RuntimeError("stopped")
+                    finished = time.perf_counter()  # a dwell is wanted, not idle time
+        return self.timings
+
+    def _lead_for(self, i, targets):
+        """The lead only applies when the next step is another move without a dwell in between."""
+        wp = self.waypoints[i]
+        if not self.lead or wp.dwell or i + 1 >= len(targets) or targets[i + 1] is None:
+            return 0.0
+        return self.lead
+
+    def _wait_arrival(self, wp, target, future, lead, sent):
+        """Blocks until the joints are within tolerance (or the lead) of `target`. Returns the time."""
+        state = self.link.state
+        window = max(wp.tolerance if wp.tolerance is not None else self.tolerance, lead)
+        deadline = time.perf_counter() + self.segment_timeout
+        seq = 0
+        while True:
+            if future.done() and (future.cancelled() or future.exception() is not None):
+                raise RuntimeError(f"{wp.name}: runForward failed: "
+                                   f"{'cancelled' if future.cancelled() else future.exception()}")
+            result = state.wait(seq, timeout=0.1)
+            now = time.perf_counter()
+            if self._stop.is_set():
+                raise RuntimeError("stopped")
+            if result is not None:
+                snap = result[0]
+                seq = snap.seq
+                # Only the joint sample's arrival time counts, so a late wakeup doesn't inflate timings.
+                # Positions left over from a lost robotmon connection never count as arrived.
+                if not snap.stale and snap.joints is not None and joint_distance(snap.joints, target) <= window:
+                    return max(sent, snap.joint_arrival or now)
+            if now > deadline:
+                raise TimeoutError(f"{wp.name}: not reached within {self.segment_timeout:g} s")
+
+    def _wait_input(self, wp):
+        self.link.log(f"Program: waiting for PLC input {wp.wait_input} = {'on' if wp.state else 'off'}")
+        deadline = None if wp.timeout is None else time.perf_counter() + wp.timeout
+        while not self.link.plc.wait_for_input(wp.wait_input, bool(wp.state), timeout=0.1):
+            if self._stop.is_set():
+                raise RuntimeError("stopped")
+            if deadline is not None and time.perf_counter() > deadline:
+                raise TimeoutError(f"{wp.name}: PLC input {wp.wait_input} not {'on' if wp.state else 'off'}"
+                                   f" within {wp.timeout:g} s")
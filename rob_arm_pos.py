@@ -1,20 +1,17 @@
 import os
 import platform
-import threading
-import paramiko
 import time
-import pyte
-import re
-import socket
 import tkinter as tk
-from tkinter import scrolledtext, Entry, Label, Button, Frame, StringVar
-import numpy as np
-from scipy.optimize import least_squares
-import scipy.spatial.transform
-import queue
-
-# Terminal dimensions
-ROWS, COLS = 24, 84
+from tkinter import scrolledtext, filedialog, Entry, Label, Button, Frame, StringVar
+from mcserver_client import parse_status_reply
+from latency_stats import LatencyTracker
+from log_pipeline import LogPipeline
+from robot_state import JOINTS_MASK, LINK_MASK, PLC_IN_MASK, PLC_OUT_MASK, STATUS_MASK
+from plc_bits import format_bits
+from robot_core import RobotLink, format_move_command
+from program_runner import ProgramRunner, format_report
+from plot_panel import PlotPanel, SampleHistory
+from jog import CARTESIAN_AXES, CARTESIAN_FRAME, JOINT_FRAME, Jogger
 
 # SSH Configuration
 SSH_HOST = "192.168.1.200"
@@ -26,7 +23,44 @@ COMMAND = "cd /rbctrl && ./robotmon"
 TCP_IP = "192.168.1.200"
 TCP_PORT = 8055
 
+# Seconds between automatic MODE/SPEED/COORD/SERVO refreshes when polling is on
+STATUS_POLL_INTERVAL = 1.0
+
+# How long the SSH reader blocks waiting for robotmon output before checking the channel
+SSH_SELECT_TIMEOUT = 1.0
+
+# Replay a recorded robotmon capture instead of connecting to the robot (None = live)
+REPLAY_FILE = None
+# Record the raw robotmon stream to this capture file while running (None = off)
+CAPTURE_FILE = None
+
 DEBUG = True
+# Also write log messages to this rotating file (None = GUI only)
+LOG_FILE = None
+# Most lines kept in the log window
+LOG_MAX_LINES = 500
+# Record every state change to this telemetry store directory (None = off)
+TELEMETRY_DIR = None
+# Serve state and accept commands from local processes on this port (None = off)
+STATE_SERVER_PORT = None
+# Log recv/feed/parse/enqueue/render timings every this many seconds (None = not measured)
+STAGE_TIMINGS_INTERVAL = None
+# Plot window: joint/PLC changes kept for it, seconds shown, redraws per second at most
+PLOT_HISTORY_SAMPLES = 360000
+PLOT_WINDOW = 30.0
+PLOT_MAX_FPS = 10
+# PLC bits plotted under the joints, as ("in" | "out", bit)
+PLOT_PLC_BITS = [("in", 0), ("in", 1), ("out", 0), ("out", 1)]
+# Jog keys while Jog is ticked: (plus, minus) per axis, S..J8 in the joint frame,
+# the first six pairs X..RZ in the Cartesian frame
+JOG_KEYS = [("q", "a"), ("w", "s"), ("e", "d"), ("r", "f"), ("t", "g"), ("y", "h"), ("u", "j"), ("i", "k")]
+# Control ticks per second and full speeds (deg/s for joints and rotations, mm/s linear)
+JOG_RATE = 20
+JOG_JOINT_SPEED = 10.0
+JOG_LINEAR_SPEED = 50.0
+JOG_ANGULAR_SPEED = 10.0
+# Dead-man: a jog stops when no key press (auto-repeat included) arrives for this long
+JOG_HOLD_TIMEOUT = 1.0
 
 def clear_screen():
     if platform.system() == "Windows":
@@ -34,130 +68,35 @@ def clear_screen():
     else:
         os.system("clear")
 
-screen = pyte.Screen(COLS, ROWS)
-stream = pyte.Stream(screen)
-joint_angle_queue = queue.Queue()
-plc_state_queue = queue.Queue()
-
-def ssh_stream_function():
-    ssh = paramiko.SSHClient()
-    ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-    try:
-        username, password = get_robot_credentials()
-        ssh.connect(SSH_HOST, username=username, password=password)
-    except ValueError as e:
-        log_message(f"SSH Error: {e}")
-        return
-    except paramiko.AuthenticationException:
-        log_message("SSH Authentication failed.")
-        return
-    except paramiko.SSHException as e:
-        log_message(f"SSH connection error: {e}")
-        return
-    except Exception as e:
-        log_message(f"General SSH error: {e}")
-        return
-
-    channel = ssh.invoke_shell()
-
-    time.sleep(1)
-    channel.send(COMMAND + "\n")
-    time.sleep(2)
-
-    try:
-        while True:
-            if channel.recv_ready():
-                raw_data = channel.recv(4096)
-                decoded_data = raw_data.decode(errors="ignore")
-                stream.feed(decoded_data)
-                angles = extract_joint_angles_alternative()
-                if angles:
-                    joint_angle_queue.put(angles)
-                
-                plc_states = extract_plc_states(screen.display) # Extract PLC states
-                if plc_states:
-                    plc_state_queue.put(plc_states) # Put into new queue
-                    if DEBUG: log_message(f"SSH: Put PLC states in queue: {plc_states}")
-                else:
-                    if DEBUG: log_message("SSH: No PLC states extracted in this cycle.")
-
-    
-            time.sleep(0.1)
-    except KeyboardInterrupt:
-        print("SSH stream stopped by user.")
-    finally:
-        ssh.close()
-
-def extract_joint_angles_alternative():
-    full_text = "\n".join(screen.display)
-    lines = full_text.splitlines()
-    if len(lines) < 5:
-        return None
-    joint_text = lines[3] + " " + lines[4]
-    pattern = re.compile(
-        r"S:\s*([-\d\.]+)\s*L:\s*([-\d\.]+)\s*U:\s*([-\d\.]+)\s*R:\s*([-\d\.]+)\s*B:\s*([-\d\.]+)\s*T:\s*([-\d\.]+\s*[-\d\.]+)\s*J7:\s*([-\d\.]+)\s*J8:\s*([-\d\.]+)",
-        re.DOTALL
-    )
-    match = pattern.search(joint_text)
-    if match:
-        try:
-            t_val = ''.join(match.group(6).split())
-            return {
-                "S": float(match.group(1)), "L": float(match.group(2)),
-                "U": float(match.group(3)), "R": float(match.group(4)),
-                "B": float(match.group(5)), "T": float(t_val),
-                "J7": float(match.group(7)), "J8": float(match.group(8))
-            }
-        except Exception as e:
-            log_message("Error parsing joint angles: " + str(e))
-    return None
+# Any thread may log; the text widget is only touched from the Tk main loop
+log_pipeline = LogPipeline(max_lines=LOG_MAX_LINES, file_path=LOG_FILE)
+
+stage_timings = None
+if STAGE_TIMINGS_INTERVAL:
+    from instrumentation import StageTimings
+    stage_timings = StageTimings()
+
+# Everything that talks to the robot lives in robot_core and works without Tk
+robot = RobotLink(
+    TCP_IP, TCP_PORT, ssh_host=SSH_HOST, credentials_file=CREDENTIALS_FILE,
+    robotmon_command=COMMAND, replay_file=REPLAY_FILE, capture_file=CAPTURE_FILE,
+    select_timeout=SSH_SELECT_TIMEOUT, timings=stage_timings, log=log_pipeline.log, debug=DEBUG,
+)
+# Newest robot state; update_gui only redraws what changed since it last looked
+robot_state = robot.state
+# PLC edge events and wait_for_input() for cell interlocks
+plc_watcher = robot.plc
+# Every joint/PLC change, recorded from the start so the plot window has history when opened
+plot_history = SampleHistory(PLOT_HISTORY_SAMPLES)
+plot_history.attach(robot_state)
+# One persistent mcserver connection shared by every button
+mcserver = robot.mcserver
+status_refresher = robot.status
 
 root = tk.Tk()
 root.title("Joint Positions & Robot Control")
 original_bg_color = root.cget("background")
 
-def extract_plc_states(screen_display_lines):
-    """
-    Extracts PLC IN and PLC OUT bit states from the raw screen display lines.
-    Args:
-        screen_display_lines: A list of strings, representing lines from pyte.Screen.display.
-    Returns:
-        A dictionary with 'plc_in' and 'plc_out' keys, each containing the
-        concatenated bit string (e.g., "X-------" -> "10000000").
-    """
-    full_text = "\n".join(screen_display_lines)
-    
-    plc_in_pattern = re.compile(r"?PLC IN?.*?0x0000:\s*([X\- ]+)", re.DOTALL)
-    plc_out_pattern = re.compile(r"?PLC OUT?.*?0x0000:\s*([X\- ]+)", re.DOTALL)
-
-    plc_in_match = plc_in_pattern.search(full_text)
-    plc_out_match = plc_out_pattern.search(full_text)
-    
-    plc_states = {}
-    
-    if DEBUG: log_message(f"PLC Regex: Searching for PLC IN pattern: '{plc_in_pattern.pattern}'")
-    if DEBUG: log_message(f"PLC Regex: Searching for PLC OUT pattern: '{plc_out_pattern.pattern}'")
-    # log_message(f"Full text for PLC search:\n{full_text}") # Too verbose, uncomment if needed
-
-    if plc_in_match:
-        raw_bits = plc_in_match.group(1)
-        cleaned_bits = raw_bits.replace(' ', '').replace('X', '1').replace('-', '0')
-        plc_states['plc_in'] = cleaned_bits
-        if DEBUG: log_message(f"PLC Regex: Matched PLC IN. Raw: '{raw_bits}', Cleaned: '{cleaned_bits}'")
-    else:
-        plc_states['plc_in'] = None
-        if DEBUG: log_message("PLC Regex: No match found for PLC IN.")
-
-    if plc_out_match:
-        raw_bits = plc_out_match.group(1)
-        cleaned_bits = raw_bits.replace(' ', '').replace('X', '1').replace('-', '0')
-        plc_states['plc_out'] = cleaned_bits
-        if DEBUG: log_message(f"PLC Regex: Matched PLC OUT. Raw: '{raw_bits}', Cleaned: '{cleaned_bits}'")
-    else:
-        plc_states['plc_out'] = None
-        if DEBUG: log_message("PLC Regex: No match found for PLC OUT.")
-    return plc_states
-
 def set_background_red():
     root.config(bg="light coral")
 
@@ -191,36 +130,33 @@ servo_status_value = StringVar(value="")  # Use StringVar
 status_display = tk.Label(data_frame, textvariable=servo_status_value, font=("Helvetica", 12, "bold"))
 status_display.pack(side=tk.LEFT, padx=0)
 
+link_label = tk.Label(data_frame, text="LINK:", font=("Helvetica", 12))
+link_label.pack(side=tk.LEFT, padx=10)
+link_value = StringVar(value="")
+link_display = tk.Label(data_frame, textvariable=link_value, font=("Helvetica", 12, "bold"))
+link_display.pack(side=tk.LEFT, padx=0)
+
 joint_label = tk.Label(root, font=("Helvetica", 14))
 joint_label.pack(pady=10)
 
-# --- PLC Display (Two Lines) ---
-PLC_BITS = 64
-
-# Function to format 64 bits into a string with spaces every 8 bits
-def add_spaces_to_bits(bit_string):
-    if not bit_string or len(bit_string) != PLC_BITS:
-        # Return a placeholder string with correct spacing if data is missing
-        placeholder_segment = "--------" # 8 dashes for 8 bits
-        return " ".join([placeholder_segment] * (PLC_BITS // 8))
-    
-    spaced_bits = ""
-    for i in range(0, PLC_BITS, 8):
-        spaced_bits += bit_string[i:i+8] + " "
-    return spaced_bits.strip() # Remove trailing space
+# Byte arrival -> joint label latency, refreshed once a second
+joint_latency = LatencyTracker()
+latency_label = tk.Label(root, text="", font=("Helvetica", 9), fg="grey")
+latency_label.pack()
 
+# --- PLC Display (Two Lines) ---
 # Frame for PLC display
 plc_display_frame = tk.Frame(root, bd=2, relief="groove")
 plc_display_frame.pack(pady=5, padx=10, fill="x")
 
 # PLC IN
 tk.Label(plc_display_frame, text="PLC IN:", font=("Helvetica", 12, "bold")).pack(anchor='w', padx=5, pady=(5,0))
-plc_in_display_label = tk.Label(plc_display_frame, text=add_spaces_to_bits(""), font=("Courier", 14), fg="black")
+plc_in_display_label = tk.Label(plc_display_frame, text=format_bits(None), font=("Courier", 14), fg="black")
 plc_in_display_label.pack(anchor='w', padx=5)
 
 # PLC OUT
 tk.Label(plc_display_frame, text="PLC OUT:", font=("Helvetica", 12, "bold")).pack(anchor='w', padx=5, pady=(5,0))
-plc_out_display_label = tk.Label(plc_display_frame, text=add_spaces_to_bits(""), font=("Courier", 14), fg="black")
+plc_out_display_label = tk.Label(plc_display_frame, text=format_bits(None), font=("Courier", 14), fg="black")
 plc_out_display_label.pack(anchor='w', padx=5)
 # --- End PLC Display (Two Lines) ---
 
@@ -256,137 +192,67 @@ button_frame = tk.Frame(root)
 button_frame.pack(pady=10)
 
 def send_move_command():
+    # Every box must hold a number; a blank is not silently sent as 0
     values = []
     for joint in joint_names:
         val = entries[joint].get().strip()
-        if not val:
-            val = "0"
-        values.append(val)
-    command_str = "runForward " + " ".join(values) + "\r\n"  # Add CRLF
+        try:
+            values.append(float(val))
+        except ValueError:
+            log_message(f"Move rejected: {joint} is {val!r}, not a number")
+            set_background_red()
+            return
     try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.connect((TCP_IP, TCP_PORT))
-        sock.sendall(command_str.encode())
-        sock.close()
+        # Checked against the safety envelope before it is queued; also informs robot.motion
+        future = robot.move(values)
+    except ValueError as e:
+        log_message(f"Move rejected: {e}")
+        set_background_red()
+        return
+    watch_command(future, format_move_command(values))
+
+def watch_command(future, command_str):
+    """Reports the outcome of a queued mcserver command without blocking Tk."""
+    if not future.done():
+        root.after(5, watch_command, future, command_str)
+        return
+    if future.cancelled():
+        log_message("Command cancelled by stop: " + command_str)
+        return
+    error = future.exception()
+    if error is not None:
+        log_message("Error sending command: " + str(error))
+        set_background_red()
+    else:
         log_message("Sent command: " + command_str)
         reset_background_color()
-    except Exception as e:
-        log_message("Error sending command: " + str(e))
-        set_background_red()
 
 def send_stop_command():
-    command_str = "stop\r\n"  # Add CRLF
+    # Before stop goes out, or the jogger's next tick would override it
+    stop_jog()
+    if program_runner is not None and program_runner.running:
+        program_runner.stop()
     try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.connect((TCP_IP, TCP_PORT))
-        sock.sendall(command_str.encode())
-        sock.close()
-        log_message("Sent command: " + command_str)
+        mcserver.stop()
+        robot.motion.cancel()
+        log_message("Sent command: stop")
         reset_background_color()
     except Exception as e:  # Corrected line
         log_message("Error sending command: " + str(e))
         set_background_red()
 
 def send_and_receive_tcp(command, timeout=0.5):
-    """Sends a TCP command and returns the relevant response."""
+    """Sends a command over the persistent mcserver connection and returns the relevant response."""
     try:
-        command_with_crlf = command + "\r\n"
         if DEBUG:
-            print(f"TCP: Sending command: {command_with_crlf!r}")
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.connect((TCP_IP, TCP_PORT))
-        sock.sendall(command_with_crlf.encode())
-        if DEBUG:
-            print(f"TCP: Command encoded: {command_with_crlf.encode()!r}")
-        time.sleep(0.25)
-        response = b""
-        start_time = time.time()
-        while True:
-            try:
-                sock.settimeout(timeout)
-                chunk = sock.recv(1024)
-                if not chunk:
-                    break
-                response += chunk
-                if b">" in chunk:
-                    break
-                if time.time() - start_time > timeout:
-                    if DEBUG:
-                        print("TCP: Timeout reached, stopping recv")
-                    break
-            except socket.timeout:
-                if DEBUG:
-                    print("TCP: recv timed out, trying again")
-                if time.time() - start_time > timeout:
-                    if DEBUG:
-                        print("TCP: Timeout reached, stopping recv")
-                    break
-                continue
-        sock.close()
-        response = response.decode(errors='ignore')
+            print(f"TCP: Sending command: {command!r}")
+        response = mcserver.query(command, timeout)
         if DEBUG:
             print(f"TCP: Received full response: {response!r}")
-        response = response.strip()
+        result = parse_status_reply(command, response)
         if DEBUG:
-            print(f"TCP: Response stripped: {response!r}")
-
-        if command == "speed":
-            match = re.search(r"mcserver>\s*(\d+)", response)
-            if match:
-                result = match.group(1)
-                if DEBUG:
-                    print(f"TCP: Speed extracted: {result!r}")
-                return result
-            else:
-                result = "ERROR: No speed found"
-                if DEBUG:
-                    print("TCP: No speed found")
-                return result
-        elif command == "servo":
-            match = re.search(r"servo\s*(on|off)", response, re.IGNORECASE)
-            if match:
-                result = match.group(1).upper()
-                if DEBUG:
-                    print(f"TCP: Servo status extracted: {result!r}")
-                return result
-            else:
-                result = "ERROR: Servo status unknown"
-                if DEBUG:
-                    print("TCP: Servo status unknown")
-                return result
-        elif command == "coord":
-            pattern = re.compile(
-                r"mcserver>current mode:\s*(joint|cart|cyl|tool|user|cylinder)",
-                re.IGNORECASE
-            )
-            match = pattern.search(response)
-            if match:
-                result = match.group(1).upper()
-                if DEBUG:
-                    print(f"TCP: Coord mode extracted: {result!r}")
-                return result
-            else:
-                result = "ERROR: Coord mode unknown"
-                if DEBUG:
-                    print("TCP: Coord mode unknown")
-                return result
-        elif command == "mode":
-            pattern = re.compile(r"mcserver>current mode:\s*(\w+)", re.IGNORECASE)
-            match = pattern.search(response)
-            if match:
-                result = match.group(1).upper()
-                if DEBUG:
-                    print(f"TCP: Mode extracted: {result!r}")
-                return result
-            else:
-                result = "ERROR: Mode unknown"
-                if DEBUG:
-                    print("TCP: Mode unknown")
-                return result
-        else:
-            if DEBUG:
-                print(f"TCP: Returning raw response for {command!r}")
-            return response
+            print(f"TCP: Extracted {command!r} result: {result!r}")
+        return result
     except Exception as e:
         log_message(f"Error sending/receiving {command}: {e}")
         if DEBUG:
@@ -397,7 +263,7 @@ def send_and_receive_tcp(command, timeout=0.5):
         reset_background_color()
 
 def sync_joint_values():
-    angles = extract_joint_angles_alternative()
+    angles = robot_state.snapshot()[0].joint_dict()
     if angles:
         for joint in joint_names:
             entries[joint].delete(0, tk.END)
@@ -406,15 +272,162 @@ def sync_joint_values():
     else:
         log_message("No joint data to sync.")
 
-    # --- Send commands and update display ---
-    mode = send_and_receive_tcp("mode")
-    mode_value.set(mode)
-    speed = send_and_receive_tcp("speed")
-    speed_value.set(speed)
-    coord = send_and_receive_tcp("coord")
-    coord_value.set(coord)
-    servo_status = send_and_receive_tcp("servo")
-    servo_status_value.set(servo_status)
+    # --- Query status in the background; update_gui shows the result ---
+    if not status_refresher.refresh():
+        log_message("Status refresh already in progress.")
+
+program_runner = None
+
+def run_program():
+    """Loads a waypoint program and runs it in the background; Stop aborts it."""
+    global program_runner
+    if program_runner is not None and program_runner.running:
+        log_message("A program is already running.")
+        return
+    path = filedialog.askopenfilename(title="Waypoint program", filetypes=[("Programs", "*.json"), ("All files", "*")])
+    if not path:
+        return
+    try:
+        program_runner = ProgramRunner.from_file(robot, path)
+    except (OSError, ValueError) as e:
+        log_message(f"Cannot load program: {e}")
+        return
+
+    def on_done(error):
+        for line in format_report(program_runner.timings).splitlines():
+            log_message(line)
+        if error is None:
+            log_message(f"Program {os.path.basename(path)} finished.")
+
+    log_message(f"Running program {os.path.basename(path)}")
+    program_runner.start(on_done=on_done)
+
+plot_window = None
+
+def toggle_plot_window():
+    """Opens the live plot window, or closes it if it is open."""
+    global plot_window
+    if plot_window is not None:
+        plot_window.destroy()
+        plot_window = None
+        return
+    plot_window = tk.Toplevel(root)
+    plot_window.title("Joint & PLC plots (wheel: zoom, click: pause)")
+    PlotPanel(plot_window, plot_history, window=PLOT_WINDOW, max_fps=PLOT_MAX_FPS,
+              plc_bits=PLOT_PLC_BITS, timings=stage_timings).pack(fill="both", expand=True)
+    plot_window.protocol("WM_DELETE_WINDOW", toggle_plot_window)
+    plot_window.bind("<FocusOut>", release_jog)
+
+jogger = None
+jog_keys_down = {}    # key -> pending release check (X11 auto-repeat sends release/press pairs)
+jog_keys_stopped = set()   # keys held through a Stop; ignored until really released
+
+def jog_key_axis(key):
+    """(axis, direction) for a jog key in the current frame, or None."""
+    axes = joint_names if jog_frame_var.get() == JOINT_FRAME else CARTESIAN_AXES
+    for axis, (plus, minus) in zip(axes, JOG_KEYS):
+        if key == plus:
+            return axis, 1.0
+        if key == minus:
+            return axis, -1.0
+    return None
+
+def on_jog_key_press(event):
+    if isinstance(event.widget, (tk.Entry, tk.Text)):
+        return   # typing into a joint box or the log, not jogging
+    key = event.keysym.lower()
+    if key in jog_keys_down:
+        pending = jog_keys_down[key]
+        if pending is not None:   # auto-repeat: the release was not real
+            root.after_cancel(pending)
+            jog_keys_down[key] = None
+        if key not in jog_keys_stopped:
+            jogger.refresh()
+        return
+    found = jog_key_axis(key)
+    if found is None:
+        return
+    jog_keys_down[key] = None
+    axis, direction = found
+    try:
+        jogger.press(axis, direction * jog_scale_var.get() / 100.0, jog_frame_var.get())
+    except ValueError as e:
+        log_message(f"Jog: {e}")
+
+def on_jog_key_release(event):
+    key = event.keysym.lower()
+    if key in jog_keys_down and jog_keys_down[key] is None:
+        # A real release has no press right behind it; wait briefly to tell
+        jog_keys_down[key] = root.after(30, finish_jog_key_release, key)
+
+def finish_jog_key_release(key):
+    jog_keys_down.pop(key, None)
+    if key in jog_keys_stopped:
+        jog_keys_stopped.discard(key)
+        return
+    found = jog_key_axis(key)
+    if found is not None:
+        jogger.release(found[0])
+
+def stop_jog():
+    """Stops any jog; keys still held stay ignored until released and pressed again."""
+    jog_keys_stopped.update(jog_keys_down)
+    if jogger is not None:
+        jogger.release_all()
+
+def release_jog(event=None):
+    """Stops any jog and forgets held keys (their release may never arrive, e.g. after focus loss)."""
+    for pending in jog_keys_down.values():
+        if pending is not None:
+            root.after_cancel(pending)
+    jog_keys_down.clear()
+    jog_keys_stopped.clear()
+    if jogger is not None:
+        jogger.release_all()
+
+def toggle_jog():
+    """Binds the jog keys while Jog is ticked; unticking stops any jog in progress."""
+    global jogger
+    if jog_var.get():
+        if jogger is None:
+            jogger = Jogger(robot, rate=JOG_RATE, joint_speed=JOG_JOINT_SPEED, linear_speed=JOG_LINEAR_SPEED,
+                            angular_speed=JOG_ANGULAR_SPEED, hold_timeout=JOG_HOLD_TIMEOUT).start()
+        root.focus_set()
+        root.bind("<KeyPress>", on_jog_key_press)
+        root.bind("<KeyRelease>", on_jog_key_release)
+        # The release of a key held while focus moves elsewhere never arrives here
+        root.bind("<FocusOut>", release_jog)   # the plot window binds it too
+        keys = " ".join(plus + minus for plus, minus in JOG_KEYS)
+        log_message(f"Jog on ({jog_frame_var.get()} frame): hold {keys} for +/- per axis.")
+    else:
+        root.unbind("<KeyPress>")
+        root.unbind("<KeyRelease>")
+        root.unbind("<FocusOut>")
+        release_jog()
+        log_message("Jog off.")
+
+def change_jog_frame():
+    """Frame changes stop the current jog; keys held now mean the new frame's axes."""
+    release_jog()
+
+def toggle_status_polling():
+    if poll_status_var.get():
+        status_refresher.start_polling(STATUS_POLL_INTERVAL)
+        log_message(f"Polling status every {STATUS_POLL_INTERVAL:g} s.")
+    else:
+        status_refresher.stop_polling()
+        log_message("Status polling stopped.")
+
+def show_status(snap):
+    status = (snap.mode, snap.speed, snap.coord, snap.servo)
+    mode_value.set(snap.mode)
+    speed_value.set(snap.speed)
+    coord_value.set(snap.coord)
+    servo_status_value.set(snap.servo)
+    if any(value.startswith("ERROR") for value in status):
+        set_background_red()
+    else:
+        reset_background_color()
 
 # --- New: Send Speed Command ---
 def send_speed_command():
@@ -427,27 +440,10 @@ def send_speed_command():
         if DEBUG:
             print(f"send_speed_command: Speed value (int): {speed_value}")
         if 0 <= speed_value <= 10000:
-            command_str = f"speed {speed_to_send}\r\n"
+            command_str = f"speed {speed_to_send}"
             if DEBUG:
                 print(f"send_speed_command: Command string: {command_str!r}")
-            try:
-                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                if DEBUG:
-                    print(f"send_speed_command: Connecting to {TCP_IP}:{TCP_PORT}")
-                sock.connect((TCP_IP, TCP_PORT))
-                sock.sendall(command_str.encode())
-                if DEBUG:
-                    print(f"send_speed_command: Sending data: {command_str.encode()!r}")
-                sock.close()
-                if DEBUG:
-                    print("send_speed_command: Socket closed")
-                log_message(f"Sent speed command: {command_str.strip()}")
-                reset_background_color()
-            except Exception as e:
-                log_message(f"Error sending speed command: {e}")
-                if DEBUG:
-                    print(f"send_speed_command: Error sending: {e!r}")
-                set_background_red()
+            watch_command(mcserver.send(command_str), command_str)
         else:
             log_message("Speed value out of range (0-10000)")
             if DEBUG:
@@ -464,6 +460,23 @@ stop_button = tk.Button(button_frame, text="Stop", command=send_stop_command, fo
 stop_button.pack(side=tk.LEFT, padx=5)
 sync_button = tk.Button(button_frame, text="Sync", command=sync_joint_values, font=("Helvetica", 14))
 sync_button.pack(side=tk.LEFT, padx=5)
+program_button = tk.Button(button_frame, text="Program...", command=run_program, font=("Helvetica", 14))
+program_button.pack(side=tk.LEFT, padx=5)
+plot_button = tk.Button(button_frame, text="Plot", command=toggle_plot_window, font=("Helvetica", 14))
+plot_button.pack(side=tk.LEFT, padx=5)
+jog_var = tk.BooleanVar(value=False)
+jog_button = tk.Checkbutton(button_frame, text="Jog", variable=jog_var, command=toggle_jog, font=("Helvetica", 12))
+jog_button.pack(side=tk.LEFT, padx=5)
+jog_frame_var = StringVar(value=JOINT_FRAME)
+tk.OptionMenu(button_frame, jog_frame_var, JOINT_FRAME, CARTESIAN_FRAME,
+              command=lambda _: change_jog_frame()).pack(side=tk.LEFT, padx=5)
+# Percent of full jog speed
+jog_scale_var = tk.IntVar(value=50)
+tk.Scale(button_frame, variable=jog_scale_var, from_=5, to=100, resolution=5, orient=tk.HORIZONTAL,
+         length=80, showvalue=True).pack(side=tk.LEFT, padx=5)
+poll_status_var = tk.BooleanVar(value=False)
+poll_button = tk.Checkbutton(button_frame, text="Poll", variable=poll_status_var, command=toggle_status_polling, font=("Helvetica", 12))
+poll_button.pack(side=tk.LEFT, padx=5)
 
 # --- New Speed Control ---
 speed_entry = Entry(button_frame, width=10, font=("Helvetica", 12), state=tk.DISABLED)  # Initially disabled
@@ -474,72 +487,94 @@ set_speed_button.pack(side=tk.LEFT, padx=5)
 log_text = scrolledtext.ScrolledText(root, width=90, height=8, font=("Helvetica", 10))
 log_text.pack(pady=10)
 log_text.config(state=tk.DISABLED)
+log_pipeline.attach(log_text, root)
+
+def log_message(msg, debug=False):
+    log_pipeline.log(msg, debug)
+
+def log_motion_event(event):
+    if event.distance is None:
+        log_message(f"Motion: {event.kind.replace('_', ' ')}")
+    else:
+        log_message(f"Motion: {event.kind.replace('_', ' ')} ({event.distance:.3f} deg from target)")
 
-def log_message(msg):
-    log_text.config(state=tk.NORMAL)
-    timestamp = time.strftime("%H:%M:%S")
-    log_text.insert(tk.END, f"[{timestamp}] {msg}\n")
-    log_text.see(tk.END)
-    log_text.config(state=tk.DISABLED)
+robot.motion.add_listener(log_motion_event)
 
 initial_population_done = False
 default_joint_values = {"S": 0.0, "L": 0.0, "U": 0.0, "R": 0.0, "B": 0.0, "T": 0.0, "J7": 0.0, "J8": 0.0}
 
+def show_plc_bits(label, value):
+    if value is not None:
+        label.config(text=format_bits(value), fg="green" if value else "red")
+    else:
+        label.config(text=format_bits(None), fg="grey")
+
+gui_seq = 0
+
 def update_gui():
-    global initial_population_done
-    try:
-        while not joint_angle_queue.empty():
-            angles = joint_angle_queue.get_nowait()
-            if angles:
-                txt = "   ".join([f"{j}: {angles.get(j, default_joint_values[j]):.6f}" for j in joint_names])
-                joint_label.config(text=txt)
-                if not initial_population_done:
-                    for joint in joint_names:
-                        entries[joint].delete(0, tk.END)
-                        entries[joint].insert(0, f"{angles.get(joint, default_joint_values[joint]):.6f}")
-                    initial_population_done = True
-        while not plc_state_queue.empty():
-            plc_states = plc_state_queue.get_nowait()
-            # Update PLC IN
-            if plc_states['plc_in'] is not None:
-                formatted_plc_in = add_spaces_to_bits(plc_states['plc_in'])
-                plc_in_display_label.config(text=formatted_plc_in, fg="green" if '1' in plc_states['plc_in'] else "red")
-            else:
-                plc_in_display_label.config(text=add_spaces_to_bits(""), fg="grey")
-
-            # Update PLC OUT
-            if plc_states['plc_out'] is not None:
-                formatted_plc_out = add_spaces_to_bits(plc_states['plc_out'])
-                plc_out_display_label.config(text=formatted_plc_out, fg="green" if '1' in plc_states['plc_out'] else "red")
-            else:
-                plc_out_display_label.config(text=add_spaces_to_bits(""), fg="grey")
-    except queue.Empty:
-        pass
+    global initial_population_done, gui_seq
+    # Only the newest state matters; stale intermediate values are never drawn
+    snap, changed = robot_state.snapshot(gui_seq)
+    gui_seq = snap.seq
+    started = time.perf_counter()
+    if changed & JOINTS_MASK and snap.joints is not None:
+        angles = snap.joint_dict()
+        txt = "   ".join([f"{j}: {angles[j]:.6f}" for j in joint_names])
+        joint_label.config(text=txt)
+        joint_latency.record(time.perf_counter() - snap.joint_arrival)
+        if not initial_population_done:
+            for joint in joint_names:
+                entries[joint].delete(0, tk.END)
+                entries[joint].insert(0, f"{angles[joint]:.6f}")
+            initial_population_done = True
+    if changed & PLC_IN_MASK:
+        show_plc_bits(plc_in_display_label, snap.plc_in)
+    if changed & PLC_OUT_MASK:
+        show_plc_bits(plc_out_display_label, snap.plc_out)
+    if changed & STATUS_MASK:
+        show_status(snap)
+    if changed & LINK_MASK:
+        # Joints from a lost or reconnecting session are greyed out until robotmon is live again
+        link_value.set(snap.link or "")
+        link_display.config(fg="red" if snap.stale else "green")
+        joint_label.config(fg="grey" if snap.stale else "black")
+    if stage_timings is not None and changed:
+        stage_timings.record("render", time.perf_counter() - started)
     root.after(10, update_gui)
 
-def get_robot_credentials():
-    """Reads robot credentials from a text file."""
-    script_dir = os.path.dirname(os.path.abspath(__file__))  # Get script's directory
-    credentials_path = os.path.join(script_dir, CREDENTIALS_FILE)  # Construct full path
-    try:
-        with open(credentials_path, "r") as f:
-            lines = f.readlines()
-            if len(lines) >= 2:
-                username = lines[0].strip()
-                password = lines[1].strip()
-                return username, password
-            else:
-                raise ValueError("Credentials file is incomplete.")
-    except FileNotFoundError:
-        raise ValueError(f"Credentials file '{credentials_path}' not found.")
-    except Exception as e:
-        raise ValueError(f"Error reading credentials file: {e}")
+def update_latency_label():
+    latency_label.config(text="Joint updates: " + joint_latency.format())
+    root.after(1000, update_latency_label)
+
+def log_stage_timings():
+    log_message("Stage timings:\n" + stage_timings.format())
+    root.after(int(STAGE_TIMINGS_INTERVAL * 1000), log_stage_timings)
 
 for joint in joint_names:
     entries[joint].delete(0, tk.END)
     entries[joint].insert(0, f"{default_joint_values[joint]:.6f}")
 
-ssh_thread = threading.Thread(target=ssh_stream_function, daemon=True)
-ssh_thread.start()
-root.after(10, update_gui)
-root.mainloop()
\ No newline at end of file
+if __name__ == "__main__":
+    telemetry = None
+    if TELEMETRY_DIR:
+        from telemetry import TelemetryStore
+        telemetry = TelemetryStore(TELEMETRY_DIR)
+        telemetry.attach(robot_state)
+        log_message(f"Recording telemetry to {TELEMETRY_DIR} ({len(telemetry)} rows so far)")
+    state_server = None
+    if STATE_SERVER_PORT:
+        from state_server import StateServer
+        state_server = StateServer(robot, port=STATE_SERVER_PORT).start()
+    robot.start_stream()
+    root.after(10, update_gui)
+    root.after(1000, update_latency_label)
+    if stage_timings is not None:
+        root.after(int(STAGE_TIMINGS_INTERVAL * 1000), log_stage_timings)
+    root.mainloop()
+    if jogger is not None:
+        jogger.close()
+    if state_server is not None:
+        state_server.close()
+    robot.close()
+    if telemetry is not None:
+        telemetry.close()
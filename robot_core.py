@@ -0,0 +1,382 @@
+"""
+Headless core for one EI65 controller.
+
+RobotLink ties together the pieces the GUI uses - the robotmon reader, the
+mcserver client, the status refresher and the shared RobotState - without
+importing tkinter, numpy or scipy, so services, scripts and tests can use it
+directly. paramiko is only imported when a live SSH session is opened.
+
+The robotmon stream is run by a StreamSupervisor, which reconnects lost
+sessions; RobotState.link tells whether the joints are live. Every move is
+checked against the safety envelope (safety_envelope) before it is queued.
+
+    link = RobotLink()
+    link.start_stream()
+    snap, changed = link.state.wait(0, timeout=5)
+    link.move([0, 0, 0, 0, 0, 0, 0, 0]).result()
+"""
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+from latency_stats import LatencyTracker
+from mcserver_client import STATUS_COMMANDS, McServerClient, parse_status_reply
+from plc_bits import PlcWatcher
+from robot_state import JOINT_NAMES, LINK_LIVE, RobotState
+from robotmon_capture import CaptureWriter, ReplayChannel
+from robotmon_session import ROBOTMON_COMMAND, RobotmonReader, connect_robotmon
+from status_refresh import StatusRefresher
+from stream_supervisor import LINK_CONNECTING, LINK_DOWN, StreamSupervisor
+
+DEFAULT_HOST = "192.168.1.200"
+MCSERVER_PORT = 8055
+DEFAULT_CREDENTIALS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "robot_credentials")
+DEFAULT_ENVELOPE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ei65_envelope.json")
+SPEED_RANGE = (0, 10000)
+
+
+def get_robot_credentials(credentials_file=DEFAULT_CREDENTIALS_FILE):
+    """Reads robot credentials (username line, password line) from a text file."""
+    script_dir = os.path.dirname(os.path.abspath(__file__))  # Get script's directory
+    credentials_path = os.path.join(script_dir, credentials_file)  # Relative paths are next to the scripts
+    try:
+        with open(credentials_path, "r") as f:
+            lines = f.readlines()
+            if len(lines) >= 2:
+                username = lines[0].strip()
+                password = lines[1].strip()
+                return username, password
+            else:
+                raise ValueError("Credentials file is incomplete.")
+    except FileNotFoundError:
+        raise ValueError(f"Credentials file '{credentials_path}' not found.")
+    except Exception as e:
+        raise ValueError(f"Error reading credentials file: {e}")
+
+
+def format_move_command(values):
+    """Builds a runForward command from 8 joint values (numbers or strings)."""
+    if len(values) != len(JOINT_NAMES):
+        raise ValueError(f"runForward needs {len(JOINT_NAMES)} joint values, got {len(values)}")
+    return "runForward " + " ".join(v if isinstance(v, str) else f"{v:.6f}" for v in values)
+
+
+class RobotLink:
+    """One controller: robotmon stream in, mcserver commands out, shared state."""
+
+    def __init__(self, host=DEFAULT_HOST, port=MCSERVER_PORT, ssh_host=None,
+                 credentials_file=DEFAULT_CREDENTIALS_FILE, robotmon_command=ROBOTMON_COMMAND,
+                 replay_file=None, replay_speed=1.0, capture_file=None,
+                 select_timeout=1.0, reconnect=True, envelope_file=DEFAULT_ENVELOPE_FILE,
+                 timings=None, log=print, debug=False):
+        """
+        Args:
+            host: mcserver host; also the SSH host unless ssh_host is given.
+            replay_file: Play this robotmon capture instead of opening SSH.
+            capture_file: Record the raw robotmon stream here.
+            reconnect: Reconnect lost robotmon sessions (see stream_supervisor).
+            envelope_file: Joint limits and keep-out boxes every move is checked
+                against; None disables the check.
+            timings: Optional instrumentation.StageTimings for the robotmon stages.
+            log: Called with (message) or (message, debug=True) from any thread.
+        """
+        self.host = host
+        self.port = port
+        self.ssh_host = ssh_host or host
+        self.credentials_file = credentials_file
+        self.robotmon_command = robotmon_command
+        self.replay_file = replay_file
+        self.replay_speed = replay_speed
+        self.capture_file = capture_file
+        self.debug = debug
+        self.envelope_file = envelope_file
+        self.timings = timings
+        self._log = log
+
+        self.state = RobotState()
+        self.plc = PlcWatcher(self.state)
+        self.reader = RobotmonReader(
+            on_joints=self._store_joints,
+            on_plc=self._store_plc_states,
+            select_timeout=select_timeout,
+            timings=timings,
+        )
+        self._mcserver = None
+        self._status = None
+        self._kinematics = None
+        self._envelope = None
+        self._motion = None
+        self._lock = threading.Lock()
+        self._stream_thread = None
+        self.supervisor = StreamSupervisor(self, reconnect=reconnect)
+        # "idle", "connecting", "waiting for robotmon", "streaming", "ended: ..." or "failed: ..."
+        self.stream_status = "idle"
+        # Connect -> first complete joint sample, and lost session -> first sample on the next one
+        self.ready = False
+        self.ready_latency = LatencyTracker(100)
+        self.resync_latency = LatencyTracker(100)
+        self._opened_at = None
+        self._lost_at = None
+
+    def log(self, msg, debug=False):
+        if debug:
+            self._log(msg, debug=True)
+        else:
+            self._log(msg)
+
+    # --- Lazily created command side ---
+    @property
+    def mcserver(self):
+        """The McServerClient, connected on first use."""
+        with self._lock:
+            return self._mcserver_locked()
+
+    @property
+    def status(self):
+        """StatusRefresher that writes MODE/SPEED/COORD/SERVO into self.state."""
+        with self._lock:
+            if self._status is None:
+                self._status = StatusRefresher(self._mcserver_locked(), self.state.update_status,
+                                                pipelined=True)
+            return self._status
+
+    @property
+    def kinematics(self):
+        """EI65Kinematics from the default DH file; numpy/scipy load on first use."""
+        with self._lock:
+            if self._kinematics is None:
+                from kinematics import EI65Kinematics
+                self._kinematics = EI65Kinematics()
+            return self._kinematics
+
+    @property
+    def envelope(self):
+        """SafetyEnvelope from envelope_file, or None when disabled; loads kinematics on first use."""
+        if self.envelope_file is None:
+            return None
+        kinematics = self.kinematics
+        with self._lock:
+            if self._envelope is None:
+                from safety_envelope import SafetyEnvelope
+                self._envelope = SafetyEnvelope(kinematics, self.envelope_file)
+            return self._envelope
+
+    @property
+    def motion(self):
+        """MotionDetector on self.state, started on first use; move() and stop() keep it informed."""
+        with self._lock:
+            if self._motion is None:
+                from motion_detector import MotionDetector
+                self._motion = MotionDetector(self.state).start()
+            return self._motion
+
+    def _mcserver_locked(self):
+        if self._mcserver is None:
+            self._mcserver = McServerClient(self.host, self.port)
+        return self._mcserver
+
+    # --- robotmon stream ---
+    def _store_joints(self, arrival, angles):
+        self.state.update_joints(angles, arrival)
+        if self.ready:
+            return
+        # First complete sample on this connection: robotmon is up and the values are current
+        self.ready = True
+        now = time.perf_counter()
+        self.ready_latency.record(now - self._opened_at, now)
+        message = f"SSH: robotmon ready {now - self._opened_at:.2f} s after connecting"
+        if self._lost_at is not None:
+            self.resync_latency.record(now - self._lost_at, now)
+            message += f", {now - self._lost_at:.2f} s after the previous session was lost"
+            self._lost_at = None
+        self.stream_status = "streaming"
+        self.state.update_link(LINK_LIVE)
+        self.log(message + ".")
+
+    def _store_plc_states(self, arrival, plc_states):
+        self.state.update_plc(plc_states)
+        if self.debug:
+            self.log(f"SSH: Stored PLC states: {plc_states}", debug=True)
+
+    def open_channel(self):
+        """Returns (closeable, channel) for the replay file or a live robotmon session."""
+        if self.replay_file:
+            channel = ReplayChannel(self.replay_file, speed=self.replay_speed)
+            self.log(f"Replaying robotmon capture {self.replay_file}")
+            return channel, channel
+        username, password = get_robot_credentials(self.credentials_file)
+        return connect_robotmon(self.ssh_host, username, password, self.robotmon_command)
+
+    def open_stream(self, begin=True):
+        """
+        Opens the robotmon channel and, with begin, calls begin_stream().
+        Returns (closeable, channel), or None after logging why it failed.
+        """
+        self.stream_status = "connecting"
+        self.ready = False
+        self.state.update_link(LINK_CONNECTING)
+        self._opened_at = time.perf_counter()
+        try:
+            ssh, channel = self.open_channel()
+        except ValueError as e:
+            self.log(f"SSH Error: {e}")
+            self.stream_status = f"failed: {e}"
+            self.state.update_link(LINK_DOWN)
+            return None
+        except Exception as e:
+            import paramiko
+            if isinstance(e, paramiko.AuthenticationException):
+                self.log("SSH Authentication failed.")
+            elif isinstance(e, paramiko.SSHException):
+                self.log(f"SSH connection error: {e}")
+            else:
+                self.log(f"General SSH error: {e}")
+            self.stream_status = f"failed: {e or type(e).__name__}"
+            self.state.update_link(LINK_DOWN)
+            return None
+
+        if begin:
+            self.begin_stream()
+        return ssh, channel
+
+    def begin_stream(self):
+        """
+        Readies the reader for a newly opened channel: blank screen and parser,
+        new capture. Runs on the thread that feeds the reader, once the previous
+        channel has been closed, so it never races a feed() of the old one.
+        """
+        # A new session starts from a blank screen; nothing is trusted until it is parsed again
+        self.ready = False
+        self.state.update_link(LINK_CONNECTING)
+        self.reader.reset()
+        if self.capture_file:
+            self.reader.capture = CaptureWriter(self.capture_file)
+            self.log(f"Recording robotmon stream to {self.capture_file}")
+        self.stream_status = "waiting for robotmon"
+
+    def close_stream(self, closeable, reason):
+        """Closes what open_stream() returned and finishes the capture."""
+        self.log(f"SSH: {reason}.")
+        self.stream_status = f"ended: {reason}"
+        self.state.update_link(LINK_DOWN)
+        if self.ready:
+            self._lost_at = time.perf_counter()
+            self.ready = False
+        closeable.close()
+        if self.reader.capture is not None:
+            self.reader.capture.close()
+            self.reader.capture = None
+
+    def run_stream(self):
+        """
+        Reads robotmon, reconnecting lost sessions, until stop_stream() (or the
+        end of a replay, or any loss with reconnect=False). Blocks; connection
+        errors are logged, not raised.
+        """
+        self.supervisor.run()
+
+    def start_stream(self):
+        """Runs run_stream() on a daemon thread. Returns the thread."""
+        self._stream_thread = threading.Thread(target=self.run_stream, name="robotmon-stream", daemon=True)
+        self._stream_thread.start()
+        return self._stream_thread
+
+    @property
+    def streaming(self):
+        return self._stream_thread is not None and self._stream_thread.is_alive()
+
+    def stop_stream(self):
+        self.supervisor.stop()
+        self.reader.stop()
+
+    # --- Commands ---
+    def check_move(self, values, current=None):
+        """
+        Raises safety_envelope.EnvelopeViolation (a ValueError) if the move to
+        `values` leaves the envelope. The path is checked from `current`, by
+        default the live joints. Without live joints the move is refused when
+        there are keep-out boxes, since the path to the target is unknown.
+        """
+        envelope = self.envelope
+        if envelope is None:
+            return
+        if current is None:
+            snap = self.state.snapshot()[0]
+            if not snap.stale and snap.joints is not None:
+                current = snap.joints
+            elif envelope.box_names:
+                from safety_envelope import EnvelopeViolation
+                raise EnvelopeViolation(f"No live joints to check the path from (robotmon link: {snap.link})")
+        envelope.check(values, current)
+
+    def move(self, values, reply=False):
+        """
+        Checks the envelope and queues runForward with 8 joint values. Returns a
+        Future, done once written or, with reply, once mcserver has answered.
+        """
+        command = format_move_command(values)
+        self.check_move(values)
+        future = self.mcserver.move(command, reply=reply)
+        if self._motion is not None:
+            self._motion.expect([float(v) for v in values])
+        return future
+
+    def move_pose(self, target):
+        """
+        Solves IK for a 4x4 flange pose, seeded from the latest joint state,
+        and queues the runForward. Returns (Future, 8 joint values).
+        """
+        snap = self.state.snapshot()[0]
+        if snap.joints is None or snap.stale:
+            raise ValueError(f"No live joint state to seed IK from (robotmon link: {snap.link})")
+        current = snap.joint_dict()
+        joints = self.kinematics.solve_joints(target, current)
+        values = [joints[name] for name in JOINT_NAMES]
+        return self.move(values), values
+
+    def stop(self):
+        """Sends stop ahead of anything queued."""
+        self.mcserver.stop()
+        if self._motion is not None:
+            self._motion.cancel()
+
+    def set_speed(self, speed):
+        """Queues a speed change. Returns a Future."""
+        speed = int(speed)
+        if not SPEED_RANGE[0] <= speed <= SPEED_RANGE[1]:
+            raise ValueError(f"Speed value out of range ({SPEED_RANGE[0]}-{SPEED_RANGE[1]})")
+        return self.mcserver.send(f"speed {speed}")
+
+    def query_status(self, timeout=0.5):
+        """Queries MODE/SPEED/COORD/SERVO (pipelined), stores them in self.state and returns them."""
+        return self.submit_status(timeout).result()
+
+    def submit_status(self, timeout=0.5):
+        """
+        Like query_status without blocking: returns a Future of the status
+        dict, completed on the mcserver worker once state has been updated.
+        """
+        result = Future()
+
+        def finish(future):
+            try:
+                status = {c: parse_status_reply(c, r) for c, r in zip(STATUS_COMMANDS, future.result())}
+            except Exception:
+                status = dict.fromkeys(STATUS_COMMANDS, "ERROR")
+            self.state.update_status(status)
+            result.set_result(status)
+
+        self.mcserver.submit_queries(STATUS_COMMANDS, timeout).add_done_callback(finish)
+        return result
+        return status
+
+    def close(self):
+        self.stop_stream()
+        with self._lock:
+            if self._motion is not None:
+                self._motion.close()
+            if self._status is not None:
+                self._status.stop_polling()
+            if self._mcserver is not None:
+                self._mcserver.close()
@@ -0,0 +1,251 @@
+"""
+Latest-value store for the robot state.
+
+Producers (the robotmon reader, the status refresher) overwrite fields in
+place; nothing is queued, so a slow consumer never builds up a backlog and
+memory stays constant. Every change bumps a sequence number, and each field
+remembers the sequence it last changed at, so a consumer that remembers the
+last sequence it saw gets the newest snapshot plus a bitmask of the fields
+that changed since then.
+
+PLC words are stored as 64-bit integers (bit i = i-th bit robotmon shows);
+see plc_bits for formatting and edge detection.
+
+`link` says whether the robotmon values are current: "live" once a full
+joint sample has been parsed on the current connection, otherwise
+"connecting", "stale" (the watchdog suspects the connection) or "down".
+Anything that acts on positions should check RobotSnapshot.stale first.
+robotmon only redraws what changes, so `updated` says nothing about whether
+the connection still delivers; data_arrival is the time of the newest
+robotmon bytes, changed or not, and data_age() how old they are.
+"""
+import collections
+import threading
+import time
+
+from robotmon_parser import JOINT_NAMES
+STATUS_FIELDS = ("mode", "speed", "coord", "servo")
+FIELD_NAMES = JOINT_NAMES + ("plc_in", "plc_out") + STATUS_FIELDS + ("link",)
+FIELD_BITS = {name: 1 << i for i, name in enumerate(FIELD_NAMES)}
+
+JOINTS_MASK = (1 << len(JOINT_NAMES)) - 1
+PLC_IN_MASK = FIELD_BITS["plc_in"]
+PLC_OUT_MASK = FIELD_BITS["plc_out"]
+PLC_MASK = PLC_IN_MASK | PLC_OUT_MASK
+STATUS_MASK = sum(FIELD_BITS[name] for name in STATUS_FIELDS)
+LINK_MASK = FIELD_BITS["link"]
+LINK_LIVE = "live"
+ALL_FIELDS_MASK = (1 << len(FIELD_NAMES)) - 1
+
+
+class RobotSnapshot(collections.namedtuple(
+        "RobotSnapshot",
+        "seq joints joint_arrival plc_in plc_out mode speed coord servo updated link data_arrival")):
+    """
+    Immutable view of the robot state.
+    joints is a tuple of 8 angles in JOINT_NAMES order (None until the first
+    parse), joint_arrival the perf_counter time the bytes behind them arrived,
+    plc_in/plc_out 64-bit ints (None while unknown), updated the
+    perf_counter time of the latest change to any field, link the
+    robotmon connection state (None before the first connect) and
+    data_arrival the perf_counter time robotmon bytes last arrived.
+    """
+    __slots__ = ()
+
+    def data_age(self, now=None):
+        """Seconds since robotmon bytes last arrived, or None before the first."""
+        if self.data_arrival is None:
+            return None
+        return (time.perf_counter() if now is None else now) - self.data_arrival
+
+    @property
+    def stale(self):
+        """True unless joints and PLC words come from a live robotmon connection."""
+        return self.link != LINK_LIVE
+
+    def joint_dict(self):
+        if self.joints is None:
+            return None
+        return dict(zip(JOINT_NAMES, self.joints))
+
+    def as_dict(self, changed=None):
+        """JSON-friendly form; PLC words become 16-digit hex strings."""
+        out = {
+            "seq": self.seq,
+            "joints": self.joint_dict(),
+            "plc_in": None if self.plc_in is None else f"0x{self.plc_in:016x}",
+            "plc_out": None if self.plc_out is None else f"0x{self.plc_out:016x}",
+            "mode": self.mode,
+            "speed": self.speed,
+            "coord": self.coord,
+            "servo": self.servo,
+            "link": self.link,
+        }
+        if changed is not None:
+            out["changed"] = [name for name in FIELD_NAMES if changed & FIELD_BITS[name]]
+        return out
+
+
+class RobotState:
+    """Thread-safe, fixed-size, latest-value robot state."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._field_seq = [0] * len(FIELD_NAMES)
+        self._joints = None
+        self._joint_arrival = None
+        self._values = dict.fromkeys(FIELD_NAMES[len(JOINT_NAMES):])
+        self._updated = None
+        self._data_arrival = None
+        self._listeners = []
+        # Listeners get changes in seq order even with several producer threads:
+        # each change waits (outside _cond) until the one before it was delivered
+        self._notify_cond = threading.Condition()
+        self._delivered = 0          # every seq up to this one has been delivered
+        self._delivered_early = set()   # seqs delivered nested, ahead of their turn
+        self._delivering = threading.local()
+
+    @property
+    def seq(self):
+        return self._seq
+
+    # --- Producers ---
+    def update_joints(self, angles, arrival=None):
+        """Stores a dict of joint angles. Returns the changed-field mask."""
+        joints = tuple(angles[name] for name in JOINT_NAMES)
+        with self._cond:
+            old = self._joints
+            mask = 0
+            for i, value in enumerate(joints):
+                if old is None or old[i] != value:
+                    mask |= 1 << i
+            if not mask:
+                return 0
+            self._joints = joints
+            self._joint_arrival = time.perf_counter() if arrival is None else arrival
+            snap = self._commit_locked(mask)
+        self._notify(snap, mask)
+        return mask
+
+    def update_fields(self, **fields):
+        """Stores PLC or status fields by name, e.g. mode="TEACH". Returns the changed mask."""
+        with self._cond:
+            mask = 0
+            for name, value in fields.items():
+                if name not in self._values:
+                    raise KeyError(f"Unknown robot state field: {name}")
+                if self._values[name] != value:
+                    self._values[name] = value
+                    mask |= FIELD_BITS[name]
+            if not mask:
+                return 0
+            snap = self._commit_locked(mask)
+        self._notify(snap, mask)
+        return mask
+
+    def update_plc(self, plc_states):
+        """Stores {'plc_in': int or None, 'plc_out': int or None}."""
+        return self.update_fields(**plc_states)
+
+    def update_status(self, status):
+        return self.update_fields(**status)
+
+    def update_link(self, link):
+        """Stores the robotmon connection state ("connecting", "live", "stale", "down")."""
+        return self.update_fields(link=link)
+
+    def note_data(self, arrival=None):
+        """
+        Records that robotmon bytes arrived, whether or not they changed
+        anything. Not a change: no sequence bump, no listeners.
+        """
+        with self._cond:
+            self._data_arrival = time.perf_counter() if arrival is None else arrival
+
+    def _commit_locked(self, mask):
+        self._seq += 1
+        self._updated = time.perf_counter()
+        bit = 0
+        while mask:
+            if mask & 1:
+                self._field_seq[bit] = self._seq
+            mask >>= 1
+            bit += 1
+        self._cond.notify_all()
+        return self._snapshot_locked()
+
+    def add_listener(self, callback):
+        """
+        Calls callback(snapshot, changed mask) after every change, on the
+        producer's thread and in seq order: a producer waits until earlier
+        changes have been delivered. A change made by a listener itself is
+        delivered at once, nested. Keep it short and do not block on other
+        producers; use snapshot()/wait() for heavy work.
+        """
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        self._listeners.remove(callback)
+
+    def _notify(self, snap, mask):
+        local = self._delivering
+        if getattr(local, "busy", False):
+            # A listener changed the state: waiting for the turn would deadlock on this
+            # thread, so this change goes out at once, nested in the one being delivered
+            try:
+                for callback in list(self._listeners):
+                    callback(snap, mask)
+            finally:
+                with self._notify_cond:
+                    self._delivered_early.add(snap.seq)
+            return
+        with self._notify_cond:
+            self._notify_cond.wait_for(lambda: self._delivered >= snap.seq - 1)
+        local.busy = True
+        try:
+            for callback in list(self._listeners):
+                callback(snap, mask)
+        finally:
+            local.busy = False
+            with self._notify_cond:
+                self._delivered = snap.seq
+                while self._delivered + 1 in self._delivered_early:
+                    self._delivered += 1
+                    self._delivered_early.discard(self._delivered)
+                self._notify_cond.notify_all()
+
+    # --- Consumers ---
+    def snapshot(self, since_seq=0):
+        """
+        Returns (snapshot, changed mask). The mask has a FIELD_BITS bit set for
+        every field that changed after `since_seq`; 0 means nothing is new.
+        """
+        with self._cond:
+            mask = 0
+            if self._seq > since_seq:
+                for i, field_seq in enumerate(self._field_seq):
+                    if field_seq > since_seq:
+                        mask |= 1 << i
+            return self._snapshot_locked(), mask
+
+    def _snapshot_locked(self):
+        v = self._values
+        return RobotSnapshot(self._seq, self._joints, self._joint_arrival, v["plc_in"], v["plc_out"],
+                             v["mode"], v["speed"], v["coord"], v["servo"], self._updated, v["link"],
+                             self._data_arrival)
+
+    def wait(self, since_seq, timeout=None):
+        """Blocks until something changes after `since_seq`. Returns snapshot() or None on timeout."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq > since_seq, timeout):
+                return None
+        return self.snapshot(since_seq)
+
+    def wait_live(self, timeout=None):
+        """Blocks until there are joints from a live connection. Returns the snapshot or None on timeout."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._values["link"] == LINK_LIVE and self._joints is not None,
+                                       timeout):
+                return None
+            return self._snapshot_locked()
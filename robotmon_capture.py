@@ -0,0 +1,190 @@
+"""
+Recording and replay of raw robotmon byte streams.
+
+A capture file is an 8 byte magic followed by one record per SSH chunk:
+
+    uint64 nanoseconds since the first chunk (monotonic clock)
+    uint32 length
+    bytes  data
+
+ReplayChannel plays a capture (or any iterable of chunks) back through a
+local socket pair, so the ingestion loop can select() on it exactly as it does
+on a paramiko channel, either in real time or as fast as possible.
+
+    python robotmon_capture.py info CAPTURE
+    python robotmon_capture.py synth CAPTURE [--frames N] [--seed N] [--rate HZ]
+"""
+import argparse
+import select
+import socket
+import struct
+import threading
+import time
+
+from robotmon_sim import RobotmonSimulator
+
+MAGIC = b"RMCAP\x00\x01\x00"
+_RECORD = struct.Struct("<QI")
+
+
+class CaptureWriter:
+    """Appends timestamped chunks to a capture file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._f = open(path, "wb")
+        self._f.write(MAGIC)
+        self._t0 = None
+        self.chunks = 0
+        self.bytes = 0
+
+    def write(self, data, t_ns=None):
+        """Records one chunk. `t_ns` defaults to time.monotonic_ns()."""
+        t_ns = time.monotonic_ns() if t_ns is None else t_ns
+        if self._t0 is None:
+            self._t0 = t_ns
+        self._f.write(_RECORD.pack(t_ns - self._t0, len(data)))
+        self._f.write(data)
+        self.chunks += 1
+        self.bytes += len(data)
+
+    def flush(self):
+        self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_capture(path):
+    """Yields (seconds since the first chunk, data) for every record in a capture."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a robotmon capture")
+        while True:
+            header = f.read(_RECORD.size)
+            if len(header) < _RECORD.size:
+                return
+            t_ns, length = _RECORD.unpack(header)
+            data = f.read(length)
+            if len(data) < length:
+                return  # truncated by a crash while recording
+            yield t_ns / 1e9, data
+
+
+def load_chunks(path):
+    """All chunks of a capture, without timestamps."""
+    return [data for _, data in read_capture(path)]
+
+
+class ReplayChannel:
+    """
+    Stand-in for the paramiko channel that plays back recorded chunks.
+    Args:
+        source: Capture file path, or an iterable of (seconds, data) records.
+        speed: 1.0 replays in real time, 2.0 twice as fast, None as fast as possible.
+    """
+
+    def __init__(self, source, speed=1.0, start=True):
+        self._records = read_capture(source) if isinstance(source, str) else source
+        self.speed = speed
+        self._rx, self._tx = socket.socketpair()
+        self._done = threading.Event()
+        self.closed = False
+        self.sent = []
+        self._thread = threading.Thread(target=self._feed, name="robotmon-replay", daemon=True)
+        if start:
+            self.start()
+
+    def start(self):
+        self._thread.start()
+
+    def _feed(self):
+        wall0 = time.monotonic()
+        try:
+            for t, data in self._records:
+                if self.closed:
+                    break
+                if self.speed:
+                    delay = wall0 + t / self.speed - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                self._tx.sendall(data)
+        except OSError:
+            pass
+        finally:
+            self._done.set()
+            try:
+                self._tx.shutdown(socket.SHUT_WR)
+            except OSError:
+                pass
+
+    # --- The paramiko.Channel subset used by the reader ---
+    def fileno(self):
+        return self._rx.fileno()
+
+    def recv_ready(self):
+        readable, _, _ = select.select([self._rx], [], [], 0)
+        return bool(readable)
+
+    def recv(self, nbytes):
+        return self._rx.recv(nbytes)
+
+    def send(self, data):
+        # robotmon input (the start command) is recorded and otherwise ignored
+        self.sent.append(data)
+        return len(data)
+
+    def exit_status_ready(self):
+        return self._done.is_set() and not self.recv_ready()
+
+    def close(self):
+        self.closed = True
+        for sock in (self._tx, self._rx):
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+
+def synthesize_capture(path, frames=2000, seed=0, rate_hz=20.0):
+    """Writes a capture of the synthetic robotmon stream, spaced at `rate_hz`."""
+    sim = RobotmonSimulator(seed=seed, rate_hz=rate_hz)
+    step_ns = int(1e9 / rate_hz)
+    with CaptureWriter(path) as writer:
+        for i, chunk in enumerate(sim.chunks(frames)):
+            writer.write(chunk, t_ns=i * step_ns)
+    return writer
+
+
+def main():
+    ap = argparse.ArgumentParser(description="robotmon capture files")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    info = sub.add_parser("info", help="summarise a capture")
+    info.add_argument("capture")
+    synth = sub.add_parser("synth", help="write a synthetic capture")
+    synth.add_argument("capture")
+    synth.add_argument("--frames", type=int, default=2000)
+    synth.add_argument("--seed", type=int, default=0)
+    synth.add_argument("--rate", type=float, default=20.0)
+    args = ap.parse_args()
+
+    if args.cmd == "synth":
+        writer = synthesize_capture(args.capture, args.frames, args.seed, args.rate)
+        print(f"Wrote {writer.chunks} chunks, {writer.bytes} bytes to {args.capture}")
+    else:
+        records = list(read_capture(args.capture))
+        size = sum(len(d) for _, d in records)
+        duration = records[-1][0] if records else 0.0
+        print(f"{len(records)} chunks, {size} bytes, {duration:.2f} s")
+        if duration > 0:
+            print(f"{len(records) / duration:.1f} chunks/s, {size / duration:.0f} B/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""
+Parsing of the robotmon screen.
+
+robotmon draws a fixed-layout screen once and afterwards only rewrites the
+characters that changed.  The regex functions below parse a complete screen
+(the original approach, still used to find the fields and as a fallback);
+RobotmonParser remembers where every field sits on the first successful parse
+and afterwards only looks at the rows pyte marks dirty, re-parses only the
+fields whose text changed and reports only values that changed.  The
+parser reports PLC words as 64-bit integers (see plc_bits).
+
+It works on a pyte.Screen or on robotmon_screen.RobotmonScreen. With the
+latter it registers where every field sits, and afterwards only the fields
+the screen reports as written are looked at.
+"""
+import bisect
+import re
+
+from plc_bits import PLC_FIELDS, bits_to_int
+
+JOINT_NAMES = ("S", "L", "U", "R", "B", "T", "J7", "J8")
+# Screen rows holding the joint values. The T value can wrap from the first
+# row onto the second.
+JOINT_ROWS = (3, 4)
+
+JOINT_PATTERN = re.compile(
+    r"S:\s*([-\d\.]+)\s*L:\s*([-\d\.]+)\s*U:\s*([-\d\.]+)\s*R:\s*([-\d\.]+)\s*B:\s*([-\d\.]+)\s*T:\s*([-\d\.]+\s*[-\d\.]+)\s*J7:\s*([-\d\.]+)\s*J8:\s*([-\d\.]+)",
+    re.DOTALL
+)
+PLC_PATTERNS = {
+    "plc_in": re.compile(r"\x0f?PLC IN\x0f?.*?0x0000:\s*([X\- ]+)", re.DOTALL),
+    "plc_out": re.compile(r"\x0f?PLC OUT\x0f?.*?0x0000:\s*([X\- ]+)", re.DOTALL),
+}
+PLC_HEADERS = {"plc_in": "PLC IN", "plc_out": "PLC OUT"}
+PLC_ANCHOR = "0x0000:"
+PLC_BIT_CHARS = "X- "
+
+
+def clean_bits(raw_bits):
+    """Turns a robotmon bit field ("X--- ----") into a bit string ("10000000")."""
+    return raw_bits.replace(' ', '').replace('X', '1').replace('-', '0')
+
+
+def parse_joint_angles(display):
+    """
+    Regex parse of the joint rows.
+    Args:
+        display: Screen lines, as returned by pyte.Screen.display.
+    Returns:
+        A dictionary of joint name -> angle, or None if the rows do not match.
+    Raises:
+        ValueError: If a matched value is not a number.
+    """
+    if len(display) <= JOINT_ROWS[1]:
+        return None
+    match = JOINT_PATTERN.search(display[JOINT_ROWS[0]] + " " + display[JOINT_ROWS[1]])
+    if not match:
+        return None
+    values = list(match.groups())
+    values[5] = ''.join(values[5].split())
+    return {name: float(value) for name, value in zip(JOINT_NAMES, values)}
+
+
+def parse_plc_states(display):
+    """
+    Regex parse of the PLC IN and PLC OUT bit fields.
+    Returns:
+        A dictionary with 'plc_in' and 'plc_out' keys, each holding the cleaned
+        bit string or None if the field was not found.
+    """
+    full_text = "\n".join(display)
+    plc_states = {}
+    for field, pattern in PLC_PATTERNS.items():
+        match = pattern.search(full_text)
+        plc_states[field] = clean_bits(match.group(1)) if match else None
+    return plc_states
+
+
+def row_text(screen, row):
+    """Text of one screen row, without building the whole display."""
+    text_of = getattr(screen, "row_text", None)
+    if text_of is not None:
+        return text_of(row)
+    line = screen.buffer[row]
+    return "".join([line[x].data for x in range(screen.columns)])
+
+
+class RobotmonParser:
+    """Incremental parser driven by pyte's dirty-line set."""
+
+    def __init__(self):
+        self.values = {}
+        self._joint_layout = None   # [(name, start, end)] offsets into the joined joint rows
+        self._joint_text = {}       # last text seen in each joint field
+        self._plc_layout = {}       # field -> ((row, col, header), (row, col, anchor), (row, col) of bits)
+        self.relocations = 0
+
+    # --- Public API ---
+    def update(self, screen):
+        """
+        Parses what changed since the last call and clears screen.dirty.
+        Returns:
+            A dictionary holding only the fields whose value changed: joint names
+            map to floats, 'plc_in'/'plc_out' to 64-bit ints (or None).
+        """
+        dirty = set(screen.dirty)
+        screen.dirty.clear()
+        take_touched = getattr(screen, "take_touched", None)
+        touched = None if take_touched is None else take_touched()
+        changes = {}
+        relocations = self.relocations
+        if touched is not None and self._located():
+            # The screen knows which fields were written; nothing else can have changed
+            if not touched.isdisjoint(JOINT_NAMES):
+                self._update_joints(screen, changes, touched)
+            if not touched.isdisjoint(PLC_FIELDS):
+                self._update_plc(screen, changes, touched)
+        else:
+            self._update_rows(screen, dirty, changes)
+        if self.relocations != relocations and self._located() and hasattr(screen, "watch_fields"):
+            screen.watch_fields(self._field_cells(screen))
+        return changes
+
+    def _located(self):
+        return self._joint_layout is not None and len(self._plc_layout) == len(PLC_FIELDS)
+
+    def _update_rows(self, screen, dirty, changes):
+        if self._joint_layout is None or not dirty.isdisjoint(JOINT_ROWS):
+            self._update_joints(screen, changes)
+        plc_rows = set()
+        for header, anchor, bits in self._plc_layout.values():
+            plc_rows.update((header[0], anchor[0], bits[0]))
+        if len(self._plc_layout) < len(PLC_FIELDS):
+            # Not found yet: look again whenever something outside the joint rows changes
+            if not dirty.issubset(JOINT_ROWS):
+                self._locate_plc(screen, changes)
+        elif not dirty.isdisjoint(plc_rows):
+            self._update_plc(screen, changes)
+
+    def joints(self):
+        """All eight joint angles, or None until every one has been parsed."""
+        if all(name in self.values for name in JOINT_NAMES):
+            return {name: self.values[name] for name in JOINT_NAMES}
+        return None
+
+    def plc_states(self):
+        return {field: self.values.get(field) for field in PLC_FIELDS}
+
+    def reset(self):
+        """Forgets the learned layout and values, e.g. after the screen was reset."""
+        self.values.clear()
+        self._joint_layout = None
+        self._joint_text.clear()
+        self._plc_layout.clear()
+
+    # --- Joints ---
+    def _joined_joint_rows(self, screen):
+        if screen.lines <= JOINT_ROWS[1]:
+            return ""
+        return row_text(screen, JOINT_ROWS[0]) + " " + row_text(screen, JOINT_ROWS[1])
+
+    def _locate_joints(self, joined):
+        """Finds every joint field with the regex and records its offsets."""
+        match = JOINT_PATTERN.search(joined)
+        if not match:
+            self._joint_layout = None
+            return False
+        layout = []
+        for i, name in enumerate(JOINT_NAMES):
+            start = joined.rfind(name + ":", 0, match.start(i + 1)) + len(name) + 1
+            # A field runs up to the next label so a value may grow or shrink
+            if i + 1 < len(JOINT_NAMES):
+                end = joined.rfind(JOINT_NAMES[i + 1] + ":", 0, match.start(i + 2))
+            else:
+                end = len(joined)
+            layout.append((name, start, end))
+        self._joint_layout = layout
+        self._joint_text.clear()
+        self.relocations += 1
+        return True
+
+    def _joint_labels_intact(self, joined, names=None):
+        for name, start, _ in self._joint_layout:
+            if names is not None and name not in names:
+                continue
+            label_start = start - len(name) - 1
+            if not joined.startswith(name + ":", label_start):
+                return False
+        return True
+
+    def _update_joints(self, screen, changes, names=None):
+        """Re-reads the joint fields; only those in `names` when given."""
+        joined = self._joined_joint_rows(screen)
+        if self._joint_layout is None or not self._joint_labels_intact(joined, names):
+            if not self._locate_joints(joined):
+                return
+            names = None
+        for name, start, end in self._joint_layout:
+            if names is not None and name not in names:
+                continue
+            text = joined[start:end]
+            if self._joint_text.get(name) == text:
+                continue
+            self._joint_text[name] = text
+            try:
+                value = float(''.join(text.split()))
+            except ValueError:
+                # Half-drawn value; keep the last good one
+                continue
+            if self.values.get(name) != value:
+                self.values[name] = value
+                changes[name] = value
+
+    # --- PLC bits ---
+    def _locate_plc(self, screen, changes):
+        """Finds the PLC fields with the regexes and records where they sit."""
+        display = screen.display
+        full_text = "\n".join(display)
+        row_starts = [0]
+        for line in display[:-1]:
+            row_starts.append(row_starts[-1] + len(line) + 1)
+
+        def to_row_col(pos):
+            row = bisect.bisect_right(row_starts, pos) - 1
+            return row, pos - row_starts[row]
+
+        for field, pattern in PLC_PATTERNS.items():
+            match = pattern.search(full_text)
+            if not match:
+                self._plc_layout.pop(field, None)
+                self._set(field, None, changes)
+                continue
+            header = PLC_HEADERS[field]
+            header_pos = full_text.index(header, match.start(0))
+            anchor_pos = full_text.rfind(PLC_ANCHOR, 0, match.start(1))
+            self._plc_layout[field] = (
+                to_row_col(header_pos) + (header,),
+                to_row_col(anchor_pos) + (PLC_ANCHOR,),
+                to_row_col(match.start(1)),
+            )
+            self._set(field, bits_to_int(clean_bits(match.group(1))), changes)
+        self.relocations += 1
+
+    def _update_plc(self, screen, changes, fields=None):
+        """Re-reads the PLC fields; only those in `fields` when given."""
+        lines = {}
+
+        def line(row):
+            if row not in lines:
+                lines[row] = row_text(screen, row)
+            return lines[row]
+
+        for field, (header, anchor, (bits_row, bits_col)) in self._plc_layout.items():
+            if fields is not None and field not in fields:
+                continue
+            for row, col, text in (header, anchor):
+                if not line(row).startswith(text, col):
+                    self._plc_layout.clear()
+                    self._locate_plc(screen, changes)
+                    return
+            raw = line(bits_row)[bits_col:]
+            # Same extent as the regex: X, - and blanks up to anything else
+            length = len(raw)
+            for i, ch in enumerate(raw):
+                if ch not in PLC_BIT_CHARS:
+                    length = i
+                    break
+            self._set(field, bits_to_int(clean_bits(raw[:length])), changes)
+
+    # --- Field cells for RobotmonScreen.watch_fields ---
+    def _field_cells(self, screen):
+        """{field: [(row, start col, end col)]} covering each field's label and value."""
+        cols = screen.columns
+        cells = {}
+        for name, start, end in self._joint_layout or ():
+            # Offsets into row 3 + " " + row 4, from the label to the next label
+            label_start = start - len(name) - 1
+            spans = []
+            if label_start < cols:
+                spans.append((JOINT_ROWS[0], label_start, min(end, cols)))
+            if end > cols + 1:
+                spans.append((JOINT_ROWS[1], max(label_start - cols - 1, 0), end - cols - 1))
+            cells[name] = spans
+        for field, (header, anchor, (bits_row, bits_col)) in self._plc_layout.items():
+            cells[field] = [
+                (header[0], header[1], header[1] + len(header[2])),
+                (anchor[0], anchor[1], anchor[1] + len(anchor[2])),
+                # The bits run up to the first other character, so any write after them counts
+                (bits_row, bits_col, cols),
+            ]
+        return cells
+
+    def _set(self, field, value, changes):
+        if self.values.get(field, ...) != value:
+            self.values[field] = value
+            changes[field] = value
@@ -0,0 +1,311 @@
+"""
+Purpose-built VT100 screen for robotmon output.
+
+robotmon only ever positions the cursor, writes ASCII and clears, so instead
+of pyte's per-character state machine the stream is split into text runs
+and escape sequences with one regex, and each run is copied into a
+fixed-size bytearray row with a slice assignment. Rows that were written are
+reported in `dirty` exactly as pyte reports them, so RobotmonParser works on
+either screen.
+
+The parser can also register the cells each joint and PLC field occupies
+(watch_fields); every write then records the fields it landed on, and
+take_touched() tells the parser which fields to look at without it having
+to re-read whole rows.
+
+Anything outside the supported subset (insert/delete, scroll margins, origin
+or insert mode, non-ASCII bytes, ...) switches the screen over to pyte for
+good: the current contents and cursor are copied into a pyte.Screen and
+everything from the unknown sequence on is fed to it. `fallback_reason`
+then says why.
+"""
+import re
+
+import pyte
+
+# Terminal dimensions
+ROWS, COLS = 24, 84
+
+# One token per match. robotmon's redraws are almost all "go to row;col, write
+# text", so that pair is a single token with its own fast path.
+_TOKEN = re.compile(
+    rb"\x1b\[([0-9]{0,4});([0-9]{0,4})H([\x20-\x7e]*)"      # 1, 2: CUP row, column; 3: text after it
+    rb"|([\x20-\x7e]+)"                                     # 4: text
+    rb"|\x1b\[([?]?[0-9;]*)([\x40-\x7e])"                   # 5: CSI parameters, 6: final byte
+    rb"|\x1b([()%#][\x20-\x7e]|[\x30-\x5a\x5c\x5e-\x7e])"  # 7: other escapes (not CSI/OSC)
+    rb"|([\x07-\x0f])"                                      # 8: BEL BS HT LF VT FF CR SO SI
+)
+# What a sequence cut off at the end of a chunk can look like
+_INCOMPLETE = re.compile(rb"\x1b(\[[?]?[0-9;]*|[()%#])?")
+
+# CSI finals pyte acts on that this screen does not implement
+_CSI_UNSUPPORTED = frozenset(b"@LMPgr")
+# Modes that change how text lands on the screen: DECCOLM, DECOM, DECAWM / IRM, LNM
+_MODES_UNSUPPORTED = {True: frozenset((3, 6, 7)), False: frozenset((4, 20))}
+# ESC finals pyte acts on that this screen does not implement (RIS, RI, HTS, DECALN)
+_ESCAPES_UNSUPPORTED = frozenset((b"c", b"M", b"H", b"#8"))
+
+
+class RobotmonScreen:
+    """24x84 character screen fed with raw robotmon bytes; a stand-in for pyte.Screen + Stream."""
+
+    def __init__(self, columns=COLS, lines=ROWS):
+        self.columns = columns
+        self.lines = lines
+        self.x = 0
+        self.y = 0
+        self.fallback = None         # pyte.Screen once an unsupported sequence was seen
+        self.fallback_reason = None
+        self._rows = [bytearray(b" " * columns) for _ in range(lines)]
+        self._dirty = set(range(lines))   # like a freshly reset pyte.Screen
+        self._saved = []
+        self._tabstops = list(range(8, columns, 8))
+        self._pending = b""
+        self._stream = None
+        self._owners = None          # per row, per column: the field key written there, or None
+        self._touched = set()
+
+    # --- Screen interface used by RobotmonParser ---
+    @property
+    def dirty(self):
+        """Rows written since the parser last cleared this set."""
+        return self._dirty if self.fallback is None else self.fallback.dirty
+
+    @property
+    def display(self):
+        if self.fallback is not None:
+            return self.fallback.display
+        return [row.decode("ascii") for row in self._rows]
+
+    def row_text(self, row):
+        if self.fallback is not None:
+            line = self.fallback.buffer[row]
+            return "".join([line[x].data for x in range(self.columns)])
+        return self._rows[row].decode("ascii")
+
+    def watch_fields(self, fields):
+        """
+        Registers which cells belong to which field: {key: [(row, start col, end col), ...]}.
+        Replaces any earlier registration.
+        """
+        owners = [[None] * self.columns for _ in range(self.lines)]
+        for key, spans in fields.items():
+            for row, start, end in spans:
+                owners[row][start:end] = [key] * (end - start)
+        self._owners = owners
+        self._touched = set()
+
+    def take_touched(self):
+        """
+        Keys of the registered fields written since the last call, or None when
+        no fields are registered (or pyte has taken over) and only `dirty` is known.
+        """
+        if self._owners is None or self.fallback is not None:
+            return None
+        touched = self._touched
+        self._touched = set()
+        touched.discard(None)
+        return touched
+
+    # --- Feeding ---
+    def feed(self, data):
+        """Applies a chunk of raw robotmon output (bytes)."""
+        if self._stream is not None:
+            self._stream.feed(data.decode(errors="ignore"))
+            return
+        if self._pending:
+            data = self._pending + data
+            self._pending = b""
+        match = _TOKEN.match
+        rows, dirty, lines, cols = self._rows, self._dirty, self.lines, self.columns
+        pos, end = 0, len(data)
+        while pos < end:
+            m = match(data, pos)
+            if m is None:
+                if _INCOMPLETE.fullmatch(data, pos):
+                    self._pending = data[pos:]
+                else:
+                    self._fall_back(data[pos:], f"unsupported byte 0x{data[pos]:02x}")
+                return
+            kind = m.lastindex
+            if kind == 3:
+                row, col, text = m.groups()[:3]
+                y = min(int(row or 0) or 1, lines) - 1
+                x = min(int(col or 0) or 1, cols) - 1
+                n = len(text)
+                if x + n <= cols:
+                    if n:
+                        rows[y][x:x + n] = text
+                        dirty.add(y)
+                        if self._owners is not None:
+                            self._touched.update(self._owners[y][x:x + n])
+                    self.x, self.y = x + n, y
+                else:
+                    self.x, self.y = x, y
+                    self._draw(text)
+            elif kind == 4:
+                self._draw(m.group(4))
+            elif kind == 6:
+                if not self._csi(m.group(5), m.group(6)[0]):
+                    self._fall_back(data[pos:], f"unsupported sequence {m.group(0)!r}")
+                    return
+            elif kind == 7:
+                if not self._escape(m.group(7)):
+                    self._fall_back(data[pos:], f"unsupported sequence {m.group(0)!r}")
+                    return
+            else:
+                self._control(data[pos])
+            pos = m.end()
+
+    def _fall_back(self, rest, reason):
+        """Copies the screen into pyte and lets it handle `rest` and everything after."""
+        screen = pyte.Screen(self.columns, self.lines)
+        for y, row in enumerate(self._rows):
+            line = screen.buffer[y]
+            for x, ch in enumerate(row.decode("ascii")):
+                if ch != " ":
+                    line[x] = screen.default_char._replace(data=ch)
+        screen.cursor.x, screen.cursor.y = self.x, self.y
+        screen.dirty.clear()
+        screen.dirty.update(self._dirty)
+        self.fallback = screen
+        self.fallback_reason = reason
+        self._stream = pyte.Stream(screen)
+        self._stream.feed(rest.decode(errors="ignore"))
+
+    # --- Operations; each mirrors the pyte.Screen method it replaces ---
+    def _touch(self, y, start, end):
+        if self._owners is not None:
+            self._touched.update(self._owners[y][start:end])
+
+    def _draw(self, text):
+        cols = self.columns
+        x, i, n = self.x, 0, len(text)
+        while True:
+            if x == cols:
+                # Deferred autowrap (DECAWM): only when another character follows
+                self._dirty.add(self.y)
+                x = 0
+                self._index()
+            take = min(n - i, cols - x)
+            self._rows[self.y][x:x + take] = text[i:i + take]
+            if self._owners is not None:
+                self._touched.update(self._owners[self.y][x:x + take])
+            x += take
+            i += take
+            if i >= n:
+                break
+        self.x = x
+        self._dirty.add(self.y)
+
+    def _index(self):
+        if self.y == self.lines - 1:
+            del self._rows[0]
+            self._rows.append(bytearray(b" " * self.columns))
+            self._dirty.update(range(self.lines))
+            if self._owners is not None:
+                for owners in self._owners:
+                    self._touched.update(owners)
+        else:
+            self.y += 1
+
+    def _erase(self, y, start, end):
+        self._rows[y][start:end] = b" " * (end - start)
+        self._dirty.add(y)
+        self._touch(y, start, end)
+
+    def _erase_line(self, how):
+        if how == 0:
+            self._erase(self.y, min(self.x, self.columns), self.columns)
+        elif how == 1:
+            self._erase(self.y, 0, min(self.x + 1, self.columns))
+        elif how == 2:
+            self._erase(self.y, 0, self.columns)
+
+    def _bound(self):
+        self.x = min(max(0, self.x), self.columns - 1)
+        self.y = min(max(0, self.y), self.lines - 1)
+
+    def _control(self, code):
+        if code == 0x0d:                       # CR
+            self.x = 0
+        elif code in (0x0a, 0x0b, 0x0c):       # LF VT FF
+            self._index()
+        elif code == 0x08:                     # BS
+            if self.x == self.columns:
+                self.x -= 1
+            self.x -= 1
+            self._bound()
+        elif code == 0x09:                     # HT
+            self.x = next((stop for stop in self._tabstops if self.x < stop), self.columns - 1)
+        # BEL, SO and SI (ignored in UTF-8 mode) change nothing on screen
+
+    def _csi(self, body, final):
+        """Returns False for sequences this screen does not implement."""
+        private = body.startswith(b"?")
+        params = [min(int(p or 0), 9999) for p in body.lstrip(b"?").split(b";")]
+        first = params[0] or 1
+        if final == 0x48 or final == 0x66:     # CUP / HVP
+            self.y = first - 1
+            self.x = ((params[1] if len(params) > 1 else 0) or 1) - 1
+            self._bound()
+        elif final == 0x4b:                    # EL
+            self._erase_line(params[0])
+        elif final == 0x4a:                    # ED
+            how = params[0]
+            if how == 0:
+                rows = range(self.y + 1, self.lines)
+            elif how == 1:
+                rows = range(self.y)
+            else:
+                rows = range(self.lines)
+            for y in rows:
+                self._erase(y, 0, self.columns)
+            if how in (0, 1):
+                self._erase_line(how)
+        elif final == 0x41:                    # CUU
+            self.y = max(self.y - first, 0)
+        elif final == 0x42 or final == 0x65:   # CUD / VPR
+            self.y = min(self.y + first, self.lines - 1)
+        elif final == 0x43 or final == 0x61:   # CUF / HPR
+            self.x += first
+            self._bound()
+        elif final == 0x44:                    # CUB
+            if self.x == self.columns:
+                self.x -= 1
+            self.x -= first
+            self._bound()
+        elif final == 0x45 or final == 0x46:   # CNL / CPL
+            self.y = min(self.y + first, self.lines - 1) if final == 0x45 else max(self.y - first, 0)
+            self.x = 0
+        elif final == 0x47:                    # CHA
+            self.x = first - 1
+            self._bound()
+        elif final == 0x64:                    # VPA
+            self.y = min(first, self.lines) - 1
+        elif final == 0x58:                    # ECH
+            if self.x < self.columns:
+                self._erase(self.y, self.x, min(self.x + first, self.columns))
+        elif final == 0x68 or final == 0x6c:   # SM / RM
+            return _MODES_UNSUPPORTED[private].isdisjoint(params)
+        elif final in _CSI_UNSUPPORTED:
+            return False
+        # Anything else (SGR, DA, DSR, unknown finals) leaves the screen alone, as in pyte
+        return True
+
+    def _escape(self, seq):
+        """Returns False for sequences this screen does not implement."""
+        if seq in _ESCAPES_UNSUPPORTED:
+            return False
+        if seq == b"7":                        # DECSC
+            self._saved.append((self.x, self.y))
+        elif seq == b"8":                      # DECRC
+            if self._saved:
+                self.x, self.y = self._saved.pop()
+                self._bound()
+            else:
+                self.x = self.y = 0
+        elif seq == b"D" or seq == b"E":       # IND / NEL (pyte maps NEL to linefeed)
+            self._index()
+        # Charset selection and the rest are no-ops in pyte's UTF-8 mode
+        return True
@@ -0,0 +1,205 @@
+"""
+robotmon ingestion: SSH connection and the read/parse loop.
+
+RobotmonReader works on anything that looks like a paramiko channel (fileno,
+recv, recv_ready, closed, exit_status_ready), so a ReplayChannel from
+robotmon_capture can stand in for the controller.
+"""
+import select
+import time
+
+import pyte
+
+from robotmon_parser import JOINT_NAMES, PLC_FIELDS, RobotmonParser
+from robotmon_screen import RobotmonScreen
+
+# Terminal dimensions
+ROWS, COLS = 24, 84
+ROBOTMON_COMMAND = "cd /rbctrl && ./robotmon"
+# Upper bound on how much of a burst is merged before it is parsed
+MAX_BURST_BYTES = 16384
+# Shell prompts end in one of these (after trailing blanks)
+PROMPT_ENDINGS = (b"$", b"#", b">")
+
+
+def wait_for_prompt(channel, timeout=5.0, quiet=0.2):
+    """
+    Reads and discards shell output (banner, MOTD) until the shell prompt
+    shows or the output pauses for `quiet` seconds after something arrived.
+    Returns True if the shell looked ready before `timeout`.
+    """
+    deadline = time.monotonic() + timeout
+    seen = b""
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        readable, _, _ = select.select([channel], [], [], min(quiet, remaining) if seen else remaining)
+        if not readable:
+            if seen:
+                return True
+            continue
+        data = channel.recv(4096)
+        if not data:
+            return False
+        seen = (seen + data)[-256:]
+        if seen.rstrip().endswith(PROMPT_ENDINGS):
+            return True
+
+
+def connect_robotmon(host, username, password, command=ROBOTMON_COMMAND,
+                     connect_timeout=10.0, prompt_timeout=5.0):
+    """
+    Opens an SSH shell on the controller and starts robotmon in it.
+
+    The command is sent as soon as the shell prompt appears instead of after
+    a fixed delay, and the function returns right away; whether robotmon is
+    up is judged from its output (the first complete joint sample).
+    Returns:
+        (ssh client, channel). paramiko exceptions are passed through.
+    """
+    import paramiko
+    ssh = paramiko.SSHClient()
+    ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    ssh.connect(host, username=username, password=password, timeout=connect_timeout,
+                banner_timeout=connect_timeout, auth_timeout=connect_timeout)
+    try:
+        channel = ssh.invoke_shell()
+        wait_for_prompt(channel, prompt_timeout)
+        channel.send(command + "\n")
+    except Exception:
+        ssh.close()
+        raise
+    return ssh, channel
+
+
+class RobotmonReader:
+    """Feeds robotmon output through a VT100 screen and the incremental parser."""
+
+    def __init__(self, on_joints=None, on_plc=None, capture=None, select_timeout=1.0, timings=None,
+                 decoder="fast"):
+        """
+        Args:
+            on_joints: Called with (arrival time, angles dict) when any joint changed.
+            on_plc: Called with (arrival time, plc states dict) when a PLC field changed.
+            capture: Optional CaptureWriter that records every raw chunk.
+            select_timeout: How long to block waiting for output before
+                checking whether the channel has closed.
+            timings: Optional instrumentation.StageTimings; records the recv,
+                feed, parse and enqueue stages plus bytes/chunks counters.
+            decoder: "fast" for robotmon_screen.RobotmonScreen (which hands over
+                to pyte by itself on sequences it does not know), "pyte" for
+                pyte.Screen throughout.
+        Arrival times come from time.perf_counter().
+        """
+        self.on_joints = on_joints
+        self.on_plc = on_plc
+        self.capture = capture
+        self.select_timeout = select_timeout
+        self.timings = timings
+        if decoder not in ("fast", "pyte"):
+            raise ValueError(f"decoder must be 'fast' or 'pyte', not {decoder!r}")
+        self.decoder = decoder
+        self.parser = RobotmonParser()
+        self.reset()
+        self.chunks = 0
+        self.bytes = 0
+        self._stopped = False
+
+    def reset(self):
+        """Starts over with a blank screen and no learned layout, e.g. for a new connection."""
+        if self.decoder == "fast":
+            self.screen = RobotmonScreen(COLS, ROWS)
+            self.stream = None
+            self._draw = self.screen.feed
+        else:
+            self.screen = pyte.Screen(COLS, ROWS)
+            self.stream = pyte.Stream(self.screen)
+            self._draw = lambda data: self.stream.feed(data.decode(errors="ignore"))
+        self.parser.reset()
+
+    def run(self, channel):
+        """Reads until the channel closes or stop() is called. Returns the reason."""
+        self._stopped = False
+        while not self._stopped:
+            # Block until robotmon sends something instead of polling recv_ready()
+            readable, _, _ = select.select([channel], [], [], self.select_timeout)
+            if not readable:
+                if channel.closed or channel.exit_status_ready():
+                    return "robotmon channel closed"
+                continue
+            data, arrival = self.read_burst(channel)
+            if not data:
+                return "robotmon stream ended"
+            self.feed(data, arrival)
+        return "stopped"
+
+    def read_burst(self, channel):
+        """
+        Reads a readable channel: the first chunk plus whatever else of the
+        burst is already buffered (up to MAX_BURST_BYTES), so one redraw is
+        parsed once. Returns (data, arrival); data is empty at end of stream.
+        """
+        started = time.perf_counter()
+        data = self._recv(channel)
+        arrival = time.perf_counter()
+        if not data:
+            return data, arrival
+        parts, size = [data], len(data)
+        while size < MAX_BURST_BYTES and channel.recv_ready():
+            data = self._recv(channel)
+            if not data:
+                break
+            parts.append(data)
+            size += len(data)
+        if self.timings is not None:
+            self.timings.record("recv", time.perf_counter() - started)
+        return b"".join(parts), arrival
+
+    def _recv(self, channel):
+        data = channel.recv(4096)
+        if data and self.capture is not None:
+            self.capture.write(data)
+        return data
+
+    def feed(self, data, arrival=None):
+        """Feeds one chunk and notifies the callbacks. Returns the changed fields."""
+        if arrival is None:
+            arrival = time.perf_counter()
+        self.chunks += 1
+        self.bytes += len(data)
+        timings = self.timings
+        if timings is not None:
+            return self._feed_timed(data, arrival, timings)
+        self._draw(data)
+        # Only the rows robotmon touched are parsed; only changed values come back
+        changes = self.parser.update(self.screen)
+        self._notify(changes, arrival)
+        return changes
+
+    def _feed_timed(self, data, arrival, timings):
+        t0 = time.perf_counter()
+        self._draw(data)
+        t1 = time.perf_counter()
+        changes = self.parser.update(self.screen)
+        t2 = time.perf_counter()
+        self._notify(changes, arrival)
+        t3 = time.perf_counter()
+        timings.record("feed", t1 - t0)
+        timings.record("parse", t2 - t1)
+        if changes:
+            timings.record("enqueue", t3 - t2)
+        timings.count("chunks")
+        timings.count("bytes", len(data))
+        return changes
+
+    def _notify(self, changes, arrival):
+        if self.on_joints is not None and not changes.keys().isdisjoint(JOINT_NAMES):
+            angles = self.parser.joints()
+            if angles:
+                self.on_joints(arrival, angles)
+        if self.on_plc is not None and not changes.keys().isdisjoint(PLC_FIELDS):
+            self.on_plc(arrival, self.parser.plc_states())
+
+    def stop(self):
+        self._stopped = True
@@ -0,0 +1,122 @@
+"""
+Synthetic robotmon output for benchmarks and offline testing.
+
+Draws a screen with the field layout the parser expects (joint values on
+rows 3-4 with the T value wrapping between them, PLC IN / PLC OUT bit rows)
+and then, like robotmon, only rewrites the characters that changed using
+cursor-addressed VT100 writes.
+"""
+import math
+import random
+
+ROWS, COLS = 24, 84
+JOINT_NAMES = ("S", "L", "U", "R", "B", "T", "J7", "J8")
+PLC_BITS = 64
+
+
+def format_bits(bits):
+    """Formats a '0'/'1' string the way robotmon shows it ("X------- --------")."""
+    marks = bits.replace('1', 'X').replace('0', '-')
+    return " ".join(marks[i:i + 8] for i in range(0, len(marks), 8))
+
+
+def render_rows(joints, plc_in, plc_out):
+    """Returns the 24 screen rows robotmon would show for the given state."""
+    rows = [""] * ROWS
+    rows[0] = "robotmon - Elite robot monitor"
+    rows[2] = "Joint position:"
+    # Five 16-character fields fill cols 0-79, so the T value wraps onto row 4
+    joint_text = "".join(f"{name}: {joints[name]:>11.6f}  " for name in JOINT_NAMES)
+    rows[3], rows[4] = joint_text[:COLS], joint_text[COLS:]
+    rows[7] = "PLC IN"
+    rows[8] = "0x0000: " + format_bits(plc_in)
+    rows[10] = "PLC OUT"
+    rows[11] = "0x0000: " + format_bits(plc_out)
+    return [row.ljust(COLS)[:COLS] for row in rows]
+
+
+def _goto(row, col):
+    return f"\x1b[{row + 1};{col + 1}H"
+
+
+def full_redraw(rows):
+    """Clears the screen and draws every row."""
+    parts = ["\x1b[2J\x1b[H"]
+    for row, text in enumerate(rows):
+        if text.strip():
+            parts.append(_goto(row, 0) + text.rstrip())
+    return "".join(parts).encode()
+
+
+def diff_redraw(old_rows, new_rows, gap=2):
+    """Rewrites only the changed characters, merging runs closer than `gap`."""
+    parts = []
+    for row, (old, new) in enumerate(zip(old_rows, new_rows)):
+        if old == new:
+            continue
+        col = 0
+        while col < COLS:
+            if old[col] == new[col]:
+                col += 1
+                continue
+            start = end = col
+            while col < COLS and col - end <= gap:
+                if old[col] != new[col]:
+                    end = col
+                col += 1
+            parts.append(_goto(row, start) + new[start:end + 1])
+            col = end + 1
+    return "".join(parts).encode()
+
+
+class RobotmonSimulator:
+    """Produces robotmon-like byte chunks for a robot moving along smooth paths."""
+
+    def __init__(self, seed=0, rate_hz=20.0, plc_toggle_probability=0.02):
+        self.rng = random.Random(seed)
+        self.dt = 1.0 / rate_hz
+        self.plc_toggle_probability = plc_toggle_probability
+        self.t = 0.0
+        self._phase = [self.rng.uniform(0, 2 * math.pi) for _ in JOINT_NAMES]
+        self._freq = [self.rng.uniform(0.05, 0.4) for _ in JOINT_NAMES]
+        self._amp = [self.rng.uniform(10, 170) for _ in JOINT_NAMES]
+        self.plc_in = "".join(self.rng.choice("01") for _ in range(PLC_BITS))
+        self.plc_out = "".join(self.rng.choice("01") for _ in range(PLC_BITS))
+        self.joints = self._joints_at(0.0)
+        self.rows = None
+
+    def _joints_at(self, t):
+        return {
+            name: amp * math.sin(2 * math.pi * freq * t + phase)
+            for name, amp, freq, phase in zip(JOINT_NAMES, self._amp, self._freq, self._phase)
+        }
+
+    def _toggle(self, bits):
+        if self.rng.random() >= self.plc_toggle_probability:
+            return bits
+        i = self.rng.randrange(len(bits))
+        return bits[:i] + ("1" if bits[i] == "0" else "0") + bits[i + 1:]
+
+    def initial(self):
+        """The first message: a full screen."""
+        self.rows = render_rows(self.joints, self.plc_in, self.plc_out)
+        return full_redraw(self.rows)
+
+    def step(self):
+        """Advances one refresh period and returns only the changed characters."""
+        if self.rows is None:
+            return self.initial()
+        self.t += self.dt
+        self.joints = self._joints_at(self.t)
+        self.plc_in = self._toggle(self.plc_in)
+        self.plc_out = self._toggle(self.plc_out)
+        rows = render_rows(self.joints, self.plc_in, self.plc_out)
+        data = diff_redraw(self.rows, rows)
+        self.rows = rows
+        return data
+
+    def chunks(self, frames):
+        """Yields the initial screen followed by `frames` incremental updates."""
+        yield self.initial()
+        for _ in range(frames):
+            yield self.step()
@@ -0,0 +1,153 @@
+"""
+Client-side motion envelope, checked before a runForward is queued.
+
+A target is refused when any joint is outside its limit, is not a finite
+number, or when the elbow, wrist or flange would enter a keep-out box on
+the way there. The way there is the straight line in joint space from the
+current joints, sampled every `max_step` degrees of the largest joint move;
+all samples go through one vectorized forward-kinematics call, so a check
+costs tens of microseconds rather than a Python loop per sample.
+
+Limits and boxes come from a JSON file (ei65_envelope.json by default):
+
+    {"limits": {"S": [-170, 170], ..., "J8": [-360, 360]},
+     "max_step": 2.0,
+     "keep_out": [{"name": "floor", "min": [x, y, z], "max": [x, y, z]}]}
+
+Arm joint limits are also clamped to the DH file's min/max. This is a
+guard against typos and bad programs on this side of mcserver, not a
+replacement for the controller's own limits or the cell's safety system.
+
+    envelope = SafetyEnvelope(EI65Kinematics())
+    envelope.check(target, current)    # raises EnvelopeViolation
+"""
+import json
+import math
+import os
+
+import numpy as np
+
+from kinematics import ARM_JOINTS
+from robot_state import JOINT_NAMES
+
+DEFAULT_ENVELOPE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ei65_envelope.json")
+
+# Kinematic frames whose origins are checked against the keep-out boxes: after
+# L (elbow), after U, after R (wrist centre) and after T; the tool point is added.
+CHECKED_FRAMES = (2, 3, 4, 6)
+POINT_NAMES = ("elbow", "forearm", "wrist", "flange", "tool")
+
+
+class EnvelopeViolation(ValueError):
+    """A move target or path outside the envelope. `values` is the offending 8-joint configuration."""
+
+    def __init__(self, message, values=None):
+        super().__init__(message)
+        self.values = values
+
+
+def load_envelope(path=DEFAULT_ENVELOPE_FILE):
+    """Reads the envelope file. Returns (limits {joint: (min, max)}, max_step, keep-out boxes)."""
+    with open(path, "r") as f:
+        data = json.load(f)
+    limits = {}
+    for name, bounds in data.get("limits", {}).items():
+        if name not in JOINT_NAMES or len(bounds) != 2 or bounds[0] > bounds[1]:
+            raise ValueError(f"{path}: bad limit for {name!r}: {bounds}")
+        limits[name] = (float(bounds[0]), float(bounds[1]))
+    boxes = []
+    for i, box in enumerate(data.get("keep_out", [])):
+        low, high = box.get("min"), box.get("max")
+        if low is None or high is None or len(low) != 3 or len(high) != 3:
+            raise ValueError(f"{path}: keep_out box {i + 1} needs min and max as [x, y, z]")
+        boxes.append((box.get("name", f"box {i + 1}"), [float(v) for v in low], [float(v) for v in high]))
+    max_step = float(data.get("max_step", 2.0))
+    if max_step <= 0:
+        raise ValueError(f"{path}: max_step must be positive")
+    return limits, max_step, boxes
+
+
+class SafetyEnvelope:
+    """Joint limits plus FK keep-out boxes for 8-joint runForward targets."""
+
+    def __init__(self, kinematics, envelope_file=DEFAULT_ENVELOPE_FILE):
+        """
+        Args:
+            kinematics: kinematics.EI65Kinematics used for the keep-out check.
+            envelope_file: JSON file with limits, max_step and keep_out (see module doc).
+        """
+        limits, self.max_step, boxes = load_envelope(envelope_file)
+        self.kinematics = kinematics
+        self.envelope_file = envelope_file
+        self.lower = np.full(len(JOINT_NAMES), -np.inf)
+        self.upper = np.full(len(JOINT_NAMES), np.inf)
+        for i, name in enumerate(ARM_JOINTS):
+            self.lower[i] = kinematics.lower[i]
+            self.upper[i] = kinematics.upper[i]
+        for name, (low, high) in limits.items():
+            i = JOINT_NAMES.index(name)
+            self.lower[i] = max(self.lower[i], low)
+            self.upper[i] = min(self.upper[i], high)
+        self.box_names = [name for name, _, _ in boxes]
+        self.box_min = np.array([low for _, low, _ in boxes]).reshape(-1, 3)
+        self.box_max = np.array([high for _, _, high in boxes]).reshape(-1, 3)
+        self.checks = 0
+        self.rejections = 0
+
+    def limits(self):
+        """{joint: (min, max)} as enforced."""
+        return {name: (float(lo), float(hi)) for name, lo, hi in zip(JOINT_NAMES, self.lower, self.upper)}
+
+    def check(self, target, current=None):
+        """
+        Raises EnvelopeViolation unless `target` (8 joint values, JOINT_NAMES
+        order) is inside the limits and the path from `current` (8 values, or
+        None to check the target pose alone) stays out of every keep-out box.
+        Returns the number of configurations checked.
+        """
+        self.checks += 1
+        try:
+            q = np.array([float(v) for v in target])
+        except (TypeError, ValueError) as e:
+            self._reject(f"Move target is not numeric: {e}")
+        if q.shape != (len(JOINT_NAMES),):
+            self._reject(f"Move target needs {len(JOINT_NAMES)} joint values, got {q.size}")
+        if not np.isfinite(q).all():
+            self._reject("Move target contains NaN or infinity", q)
+        outside = np.flatnonzero((q < self.lower) | (q > self.upper))
+        if outside.size:
+            i = outside[0]
+            self._reject(f"{JOINT_NAMES[i]} = {q[i]:.3f} outside its limits "
+                         f"[{self.lower[i]:g}, {self.upper[i]:g}]", q)
+        if not len(self.box_names):
+            return 1
+        path = self.path(q, current)
+        self._check_boxes(path)
+        return len(path)
+
+    def path(self, target, current=None):
+        """(N, 8) configurations from current (exclusive) to target (inclusive), max_step apart."""
+        target = np.asarray(target, dtype=float)
+        if current is None:
+            return target[None]
+        current = np.asarray(current, dtype=float)
+        steps = max(1, math.ceil(float(np.abs(target - current).max()) / self.max_step))
+        fractions = np.arange(1, steps + 1) / steps
+        return current + fractions[:, None] * (target - current)
+
+    def _check_boxes(self, path):
+        frames, tool = self.kinematics._frames(path[:, :len(ARM_JOINTS)])
+        points = np.stack([frames[i][:, :3, 3] for i in CHECKED_FRAMES] + [tool[:, :3, 3]], axis=1)
+        # (N configurations, P points, B boxes)
+        inside = ((points[:, :, None] >= self.box_min) & (points[:, :, None] <= self.box_max)).all(axis=-1)
+        if not inside.any():
+            return
+        n, p, b = np.argwhere(inside)[0]
+        x, y, z = points[n, p]
+        where = "target" if n == len(path) - 1 else f"path step {n + 1}/{len(path)}"
+        self._reject(f"{POINT_NAMES[p]} enters keep-out {self.box_names[b]!r} at "
+                     f"({x:.1f}, {y:.1f}, {z:.1f}) mm ({where})", path[n])
+
+    def _reject(self, message, values=None):
+        self.rejections += 1
+        raise EnvelopeViolation(message, None if values is None else tuple(values.tolist()))
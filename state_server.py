@@ -0,0 +1,396 @@
+"""
+Local state/command server so other processes (vision, MES, scripts) share
+one robotmon session and one mcserver connection.
+
+Plain TCP with small binary frames; no extra dependencies. Every frame is
+
+    <u32 length> <u8 type> payload         (length counts type + payload)
+
+Server -> client:
+    HELLO   <u16 version> field names, comma separated (FIELD_NAMES order)
+    DELTA   <u64 seq> <f64 wall time> <u32 changed mask> <u32 null mask>, then for
+            each changed, non-null field in FIELD_NAMES order: joints f64,
+            plc_in/plc_out u64, mode/speed/coord/servo/link <u8 len> utf-8
+    REPLY   <u32 request id> <u8 ok> utf-8 message
+
+Client -> server:
+    COMMAND <u32 request id> utf-8 command line:
+            move S L U R B T J7 J8 | stop | speed N | status | control acquire | control release
+
+State is pushed, newest value only: each client's writer waits for the
+next change after the last sequence it sent and sends one delta with
+everything that changed since, so a slow client gets fewer, larger deltas
+and never a backlog. The first delta after HELLO carries every known field.
+
+Commands from all clients go to the one RobotLink (the mcserver worker runs
+them in order). stop is always accepted and jumps the queue. A client can
+take motion control with "control acquire"; while it holds it, move and
+speed from the others are refused. Control is released on disconnect.
+
+    server = StateServer(link, port=8056).start()
+    client = StateClient("127.0.0.1", 8056)
+    snap, changed = client.state.wait(0, timeout=1)
+    client.command("move 0 0 0 0 0 0 0 0").result()
+"""
+import itertools
+import socket
+import socketserver
+import struct
+import threading
+import time
+from concurrent.futures import Future
+
+from robot_state import FIELD_NAMES, JOINT_NAMES, RobotState
+
+DEFAULT_PORT = 8056
+PROTOCOL_VERSION = 2
+
+HELLO, DELTA, REPLY, COMMAND = 0x00, 0x01, 0x02, 0x10
+_FRAME = struct.Struct("<IB")
+_DELTA = struct.Struct("<QdII")
+_REPLY = struct.Struct("<IB")
+_REQUEST = struct.Struct("<I")
+_F64 = struct.Struct("<d")
+_U64 = struct.Struct("<Q")
+_PLC_FIELDS = ("plc_in", "plc_out")
+
+
+def _frame(kind, payload):
+    return _FRAME.pack(len(payload) + 1, kind) + payload
+
+
+def _recv_exact(sock, size):
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            raise ConnectionError("connection closed")
+        buf += chunk
+    return bytes(buf)
+
+
+def read_frame(sock):
+    """Returns (type, payload); raises ConnectionError at end of stream."""
+    length, kind = _FRAME.unpack(_recv_exact(sock, _FRAME.size))
+    return kind, _recv_exact(sock, length - 1) if length > 1 else b""
+
+
+def encode_delta(snap, changed, now=None):
+    """DELTA frame for the fields in `changed` of a RobotSnapshot."""
+    values = snap._asdict()
+    parts = []
+    nulls = 0
+    for i, name in enumerate(FIELD_NAMES):
+        bit = 1 << i
+        if not changed & bit:
+            continue
+        if i < len(JOINT_NAMES):
+            if snap.joints is None:
+                nulls |= bit
+            else:
+                parts.append(_F64.pack(snap.joints[i]))
+            continue
+        value = values[name]
+        if value is None:
+            nulls |= bit
+        elif name in _PLC_FIELDS:
+            parts.append(_U64.pack(value))
+        else:
+            text = str(value).encode()[:255]
+            parts.append(bytes((len(text),)) + text)
+    header = _DELTA.pack(snap.seq, time.time() if now is None else now, changed, nulls)
+    return _frame(DELTA, header + b"".join(parts))
+
+
+def decode_delta(payload):
+    """Returns (seq, wall time, changed mask, {field: value}) for a DELTA payload."""
+    seq, wall, changed, nulls = _DELTA.unpack_from(payload)
+    pos = _DELTA.size
+    fields = {}
+    for i, name in enumerate(FIELD_NAMES):
+        bit = 1 << i
+        if not changed & bit:
+            continue
+        if nulls & bit:
+            fields[name] = None
+        elif i < len(JOINT_NAMES):
+            fields[name] = _F64.unpack_from(payload, pos)[0]
+            pos += 8
+        elif name in _PLC_FIELDS:
+            fields[name] = _U64.unpack_from(payload, pos)[0]
+            pos += 8
+        else:
+            size = payload[pos]
+            fields[name] = payload[pos + 1:pos + 1 + size].decode()
+            pos += 1 + size
+    return seq, wall, changed, fields
+
+
+class _ClientHandler(socketserver.BaseRequestHandler):
+    def setup(self):
+        self.sock = self.request
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.send_lock = threading.Lock()
+        self.closed = False
+
+    def send(self, data):
+        with self.send_lock:
+            self.sock.sendall(data)
+
+    def handle(self):
+        server = self.server
+        names = ",".join(FIELD_NAMES).encode()
+        self.send(_frame(HELLO, struct.pack("<H", PROTOCOL_VERSION) + names))
+        writer = threading.Thread(target=self._push_state, name="state-push", daemon=True)
+        writer.start()
+        server.log(f"State server: client {self.client_address[0]}:{self.client_address[1]} connected")
+        try:
+            while True:
+                kind, payload = read_frame(self.sock)
+                if kind == COMMAND:
+                    request_id = _REQUEST.unpack_from(payload)[0]
+                    server.execute(self, request_id, payload[_REQUEST.size:].decode(errors="replace"))
+        except (ConnectionError, OSError, struct.error):
+            pass
+        finally:
+            self.closed = True
+            server.release_control(self)
+            server.log(f"State server: client {self.client_address[0]}:{self.client_address[1]} disconnected")
+
+    def reply(self, request_id, ok, message=""):
+        if self.closed:
+            return
+        try:
+            self.send(_frame(REPLY, _REPLY.pack(request_id, 1 if ok else 0) + message.encode()))
+        except OSError:
+            pass
+
+    def _push_state(self):
+        state = self.server.link.state
+        seq = 0
+        try:
+            while not self.closed and not self.server.closing:
+                result = state.wait(seq, timeout=0.5)
+                if result is None:
+                    continue
+                snap, changed = result
+                seq = snap.seq
+                if changed:
+                    self.send(encode_delta(snap, changed))
+        except OSError:
+            pass
+
+
+class StateServer(socketserver.ThreadingTCPServer):
+    """Publishes a RobotLink's state and arbitrates commands for local clients."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, link, host="127.0.0.1", port=DEFAULT_PORT):
+        """
+        Args:
+            link: robot_core.RobotLink whose state is served and which runs the commands.
+            host: Bind address; keep it on loopback unless the network is trusted,
+                there is no authentication.
+        """
+        super().__init__((host, port), _ClientHandler)
+        self.link = link
+        self.closing = False
+        self._controller = None
+        self._control_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def log(self, msg):
+        self.link.log(msg)
+
+    def start(self):
+        """Serves from a background thread and returns self."""
+        self._thread = threading.Thread(target=self.serve_forever, name="state-server", daemon=True)
+        self._thread.start()
+        self.log(f"State server listening on {self.server_address[0]}:{self.port}")
+        return self
+
+    def close(self):
+        self.closing = True
+        if self._thread is not None:
+            self.shutdown()
+            self._thread.join()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- Command arbitration ---
+    def release_control(self, client):
+        with self._control_lock:
+            if self._controller is client:
+                self._controller = None
+
+    def _may_move(self, client):
+        with self._control_lock:
+            return self._controller is None or self._controller is client
+
+    def execute(self, client, request_id, line):
+        """Runs one client command; the reply goes back asynchronously."""
+        parts = line.split()
+        if not parts:
+            client.reply(request_id, False, "empty command")
+            return
+        cmd, args = parts[0].lower(), parts[1:]
+        try:
+            if cmd == "stop":
+                self.link.stop()
+                client.reply(request_id, True, "stop")
+            elif cmd == "control":
+                self._control(client, request_id, args)
+            elif cmd in ("move", "speed"):
+                if not self._may_move(client):
+                    client.reply(request_id, False, "another client holds motion control")
+                    return
+                if cmd == "move":
+                    future = self.link.move([float(v) for v in args])
+                else:
+                    if len(args) != 1:
+                        raise ValueError("speed needs one value")
+                    future = self.link.set_speed(args[0])
+                future.add_done_callback(lambda f: self._reply_future(client, request_id, f, line))
+            elif cmd == "status":
+                # Answered from the mcserver worker, so a stop behind it is still read at once;
+                # the result is also pushed as a delta
+                future = self.link.submit_status()
+                future.add_done_callback(lambda f: client.reply(
+                    request_id, True, " ".join(f"{k}={v}" for k, v in f.result().items())))
+            else:
+                client.reply(request_id, False, f"unknown command: {cmd}")
+        except Exception as e:
+            client.reply(request_id, False, str(e))
+
+    def _control(self, client, request_id, args):
+        action = args[0].lower() if args else ""
+        with self._control_lock:
+            if action == "acquire":
+                ok = self._controller is None or self._controller is client
+                if ok:
+                    self._controller = client
+                client.reply(request_id, ok, "control acquired" if ok else "another client holds motion control")
+            elif action == "release":
+                if self._controller is client:
+                    self._controller = None
+                client.reply(request_id, True, "control released")
+            else:
+                client.reply(request_id, False, "control needs acquire or release")
+
+    @staticmethod
+    def _reply_future(client, request_id, future, line):
+        if future.cancelled():
+            client.reply(request_id, False, "cancelled by stop")
+        elif future.exception() is not None:
+            client.reply(request_id, False, str(future.exception()))
+        else:
+            client.reply(request_id, True, line)
+
+
+class StateClient:
+    """
+    Client side: mirrors the server's state into a local RobotState (same
+    snapshot()/wait()/add_listener() API as in-process code) and sends commands.
+    """
+
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, timeout=2.0):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.settimeout(None)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        kind, payload = read_frame(self.sock)
+        if kind != HELLO:
+            raise ConnectionError("state server did not send HELLO")
+        self.version = struct.unpack_from("<H", payload)[0]
+        names = tuple(payload[2:].decode().split(","))
+        if names != FIELD_NAMES:
+            raise ConnectionError(f"state server fields differ: {names}")
+        self.state = RobotState()
+        self.server_seq = 0
+        self.server_time = None
+        self.deltas = 0
+        self._joints = None
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._read_loop, name="state-client", daemon=True)
+        self._thread.start()
+
+    def command(self, line):
+        """Sends a command line. Returns a Future of the reply message; failures raise RuntimeError."""
+        future = Future()
+        with self._lock:
+            request_id = next(self._ids)
+            self._pending[request_id] = future
+        payload = _REQUEST.pack(request_id) + line.encode()
+        with self._send_lock:
+            self.sock.sendall(_frame(COMMAND, payload))
+        return future
+
+    def move(self, values):
+        return self.command("move " + " ".join(f"{v:.6f}" for v in values))
+
+    def stop(self):
+        return self.command("stop")
+
+    def _read_loop(self):
+        try:
+            while True:
+                kind, payload = read_frame(self.sock)
+                if kind == DELTA:
+                    self._apply(payload)
+                elif kind == REPLY:
+                    request_id, ok = _REPLY.unpack_from(payload)
+                    with self._lock:
+                        future = self._pending.pop(request_id, None)
+                    if future is not None:
+                        message = payload[_REPLY.size:].decode(errors="replace")
+                        if ok:
+                            future.set_result(message)
+                        else:
+                            future.set_exception(RuntimeError(message))
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            for future in pending.values():
+                future.set_exception(ConnectionError("state server connection closed"))
+
+    def _apply(self, payload):
+        seq, wall, changed, fields = decode_delta(payload)
+        self.server_seq = seq
+        self.server_time = wall
+        self.deltas += 1
+        joints = {name: fields.pop(name) for name in JOINT_NAMES if fields.get(name) is not None}
+        if joints:
+            self._joints = dict(self._joints or dict.fromkeys(JOINT_NAMES, 0.0), **joints)
+            self.state.update_joints(self._joints)
+        others = {name: value for name, value in fields.items() if name not in JOINT_NAMES}
+        if others:
+            self.state.update_fields(**others)
+
+    def close(self):
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+        self._thread.join(timeout=1.0)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,108 @@
+"""
+Background refresh of the MODE / SPEED / COORD / SERVO status fields.
+
+The queries run on the McServerClient worker, never on the caller's thread,
+pipelined by default: all four are written in one send and the replies read
+back in order, so a refresh costs one round trip. The parsed values are
+handed to a callback once all of them are back; RobotLink passes
+RobotState.update_status, so they reach update_gui like the joint angles.
+"""
+import threading
+import time
+
+from mcserver_client import STATUS_COMMANDS, parse_status_reply
+
+
+class StatusRefresher:
+    """Fetches the mcserver status fields off the UI thread, once or periodically."""
+
+    def __init__(self, client, on_result, commands=STATUS_COMMANDS, timeout=0.5, pipelined=True):
+        """
+        Args:
+            client: McServerClient used for the queries.
+            on_result: Called with {command: value} once every query has finished.
+                Failed queries report "ERROR". Runs on the client worker thread.
+            pipelined: Write all queries in one send and read the replies back in
+                order. Pass False for a controller that cannot take several commands
+                in one packet; the queries then go out one after another.
+        """
+        self.client = client
+        self.on_result = on_result
+        self.commands = tuple(commands)
+        self.timeout = timeout
+        self.pipelined = pipelined
+        self.last_duration = None
+        self._lock = threading.Lock()
+        self._in_flight = False
+        self._poll_stop = None
+
+    def refresh(self):
+        """Starts a refresh unless one is still running. Returns True if started."""
+        with self._lock:
+            if self._in_flight:
+                return False
+            self._in_flight = True
+        started = time.perf_counter()
+        try:
+            if self.pipelined:
+                future = self.client.submit_queries(self.commands, self.timeout)
+                future.add_done_callback(lambda f: self._finish_pipelined(f, started))
+            else:
+                futures = [self.client.submit_query(c, self.timeout) for c in self.commands]
+                # Replies come back in queue order, so the last one finishing
+                # means all of them have.
+                futures[-1].add_done_callback(lambda f: self._finish(futures, started))
+        except Exception:
+            with self._lock:
+                self._in_flight = False
+            raise
+        return True
+
+    def _finish(self, futures, started):
+        results = {}
+        for command, future in zip(self.commands, futures):
+            try:
+                results[command] = parse_status_reply(command, future.result(timeout=0))
+            except Exception:
+                results[command] = "ERROR"
+        self._deliver(results, started)
+
+    def _finish_pipelined(self, future, started):
+        try:
+            replies = future.result()
+            results = {c: parse_status_reply(c, r) for c, r in zip(self.commands, replies)}
+        except Exception:
+            results = dict.fromkeys(self.commands, "ERROR")
+        self._deliver(results, started)
+
+    def _deliver(self, results, started):
+        self.last_duration = time.perf_counter() - started
+        with self._lock:
+            self._in_flight = False
+        self.on_result(results)
+
+    # --- Periodic polling ---
+    def start_polling(self, interval):
+        """Refreshes every `interval` seconds until stop_polling() is called."""
+        self.stop_polling()
+        stop_event = threading.Event()
+        self._poll_stop = stop_event
+        threading.Thread(target=self._poll_loop, args=(interval, stop_event),
+                         name="status-poll", daemon=True).start()
+
+    def stop_polling(self):
+        if self._poll_stop is not None:
+            self._poll_stop.set()
+            self._poll_stop = None
+
+    @property
+    def polling(self):
+        return self._poll_stop is not None
+
+    def _poll_loop(self, interval, stop_event):
+        while not stop_event.is_set():
+            try:
+                self.refresh()
+            except RuntimeError:
+                return  # client closed
+            stop_event.wait(interval)
@@ -0,0 +1,238 @@
+"""
+Keeps one RobotLink's robotmon stream up.
+
+RobotLink.run_stream used to read until the SSH session ended and then
+return, leaving the last positions in RobotState as if they were current.
+StreamSupervisor runs the same select/read_burst/feed loop with a watchdog
+around it and reconnects with exponential backoff whenever the session is
+lost:
+
+    - the channel closes, robotmon exits or the stream hits EOF
+    - no complete joint sample arrives within ready_timeout of connecting
+      (robotmon did not start, or its screen could not be parsed)
+    - the data stops and the SSH transport does not answer a keepalive
+      within probe_timeout. robotmon only redraws what changes, so silence
+      alone is normal for a robot at rest; the probe tells a quiet session
+      from a dead one. With stall_timeout set, silence that long counts as
+      lost as well, for setups where robotmon is known to redraw regularly.
+
+While a session is suspect or being replaced, RobotState.link is "stale",
+"down" or "connecting", so consumers see RobotSnapshot.stale instead of
+acting on old positions. "stale" is set as soon as a keepalive has gone
+unanswered for stale_grace, and cleared again by its answer or new data.
+Each reconnect starts from a blank screen (RobotmonReader.reset) and counts
+as ready at the first complete joint sample; RobotLink.ready_latency /
+resync_latency measure how long that takes.
+
+The watchdog itself is SessionWatch, fed by whichever loop reads the
+channel: StreamSupervisor's own select loop here, or fleet.Fleet's shared
+selector thread, which also takes its reconnect delays from
+reconnect_delay().
+
+Replays are not reconnected: their end is the end of the stream.
+"""
+import select
+import threading
+import time
+
+from robot_state import LINK_LIVE
+
+# Connection states stored in RobotState.link
+LINK_CONNECTING, LINK_STALE, LINK_DOWN = "connecting", "stale", "down"
+
+
+class StreamSupervisor:
+    """Reads, watches and reconnects one RobotLink's robotmon stream."""
+
+    def __init__(self, link, reconnect=True, stale_after=1.0, probe_timeout=1.0, stale_grace=0.2,
+                 stall_timeout=None, ready_timeout=15.0, min_backoff=0.5, max_backoff=10.0, tick=0.25):
+        """
+        Args:
+            link: The RobotLink whose open_stream/close_stream/reader are used.
+            reconnect: Reconnect after a lost session (never for replays).
+            stale_after: Seconds without data before the SSH transport is probed.
+            probe_timeout: Seconds the keepalive may take before the session counts as lost.
+            stale_grace: Seconds the keepalive may take before the state is marked stale
+                (a healthy LAN answers in milliseconds); new data or the answer clears it.
+            stall_timeout: Seconds without data that count as lost regardless of the probe (None: off).
+            ready_timeout: Seconds from connecting to the first complete joint sample.
+            min_backoff, max_backoff: Reconnect delay bounds; the delay doubles per failed attempt
+                and is reset by a session that became ready.
+            tick: Longest select() wait, i.e. how often the watchdog runs.
+        """
+        self.link = link
+        self.reconnect = reconnect
+        self.stale_after = stale_after
+        self.probe_timeout = probe_timeout
+        self.stale_grace = stale_grace
+        self.stall_timeout = stall_timeout
+        self.ready_timeout = ready_timeout
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.tick = tick
+        self.sessions = 0
+        self.reconnects = 0
+        self._backoff = min_backoff
+        self._stopped = threading.Event()
+
+    def stop(self):
+        self._stopped.set()
+
+    def run(self):
+        """Connects, reads and reconnects until stop() or a session that should not be retried. Blocks."""
+        self._stopped.clear()
+        self._backoff = self.min_backoff
+        while not self._stopped.is_set():
+            opened = self.link.open_stream()
+            was_ready = False
+            if opened is not None:
+                self.sessions += 1
+                closeable, channel = opened
+                reason = "robotmon reader failed"
+                try:
+                    reason = self._read(channel)
+                finally:
+                    was_ready = self.link.ready
+                    self.link.close_stream(closeable, reason)
+            if self._stopped.is_set() or not self.reconnect or self.link.replay_file:
+                return
+            delay = self.reconnect_delay(was_ready)
+            self.link.log(f"SSH: Reconnecting in {delay:.1f} s.")
+            if self._stopped.wait(delay):
+                return
+            self.reconnects += 1
+
+    def reconnect_delay(self, was_ready):
+        """
+        Seconds to wait before the next connect attempt, after a session ended or failed to
+        open. Doubles per failed attempt; a session that became ready resets it.
+        """
+        if was_ready:
+            self._backoff = self.min_backoff
+        delay = self._backoff
+        self._backoff = min(self._backoff * 2, self.max_backoff)
+        return delay
+
+    def watch(self, channel):
+        """A SessionWatch for a session just opened on `channel`, using this supervisor's timeouts."""
+        return SessionWatch(self, channel, time.monotonic())
+
+    def _read(self, channel):
+        """One session: reads until it ends or the watchdog gives up on it. Returns the reason."""
+        reader = self.link.reader
+        watch = self.watch(channel)
+        tick = self.tick
+        while not self._stopped.is_set():
+            readable, _, _ = select.select([channel], [], [], tick)
+            now = time.monotonic()
+            if readable:
+                data, arrival = reader.read_burst(channel)
+                if not data:
+                    return "robotmon stream ended"
+                watch.data(arrival, now)
+                reader.feed(data, arrival)
+                tick = self.tick
+                if self.link.ready:
+                    continue
+            elif channel.closed or channel.exit_status_ready():
+                return "robotmon channel closed"
+            reason, tick = watch.check(now)
+            if reason is not None:
+                return reason
+        return "stopped"
+
+    def _mark_suspect(self, suspect):
+        """Sets the link to stale (or back to live) while a session is in doubt. Returns `suspect`."""
+        self.link.state.update_link(LINK_STALE if suspect else LINK_LIVE)
+        if suspect:
+            self.link.log("SSH: robotmon silent and keepalive unanswered; state marked stale.")
+        return suspect
+
+    def _probe(self, channel, now):
+        """
+        Sends an SSH keepalive from a helper thread (global_request blocks).
+        Returns {"sent", "answered": Event, "alive"} or None without a transport.
+        """
+        get_transport = getattr(channel, "get_transport", None)
+        transport = get_transport() if get_transport is not None else None
+        if transport is None:
+            return None
+        probe = {"sent": now, "answered": threading.Event(), "alive": False}
+
+        def send():
+            # OpenSSH refuses this request; any reply, even a refusal, means the peer is there.
+            # global_request() also returns (None) when the transport dies, hence is_active().
+            try:
+                transport.global_request("keepalive@openssh.com", wait=True)
+                probe["alive"] = transport.is_active()
+            except Exception:
+                probe["alive"] = False
+            probe["answered"].set()
+
+        threading.Thread(target=send, name="robotmon-keepalive", daemon=True).start()
+        return probe
+
+
+class SessionWatch:
+    """
+    Watchdog state of one robotmon session. The reading loop calls data() for every
+    burst it reads and check() whenever its wait runs out.
+    """
+
+    def __init__(self, supervisor, channel, opened_at):
+        self.supervisor = supervisor
+        self.link = supervisor.link
+        self.channel = channel
+        self.opened_at = opened_at
+        self.last_data = opened_at
+        self.probe = None
+        self.suspect = False   # this watch set the link to stale
+
+    def data(self, arrival, now):
+        """Records a burst read at `now` (call before feeding it to the reader)."""
+        self.link.state.note_data(arrival)
+        self.last_data = now
+        self.probe = None   # data proves the session alive
+        if self.suspect:
+            self.suspect = self.supervisor._mark_suspect(False)
+
+    def check(self, now):
+        """
+        Runs the watchdog. Returns (reason, wait): the reason the session counts as lost (None
+        while it is fine) and the longest wait before check() should run again.
+        """
+        sup = self.supervisor
+        if not self.link.ready:   # output that never parses counts as not started
+            if now - self.opened_at > sup.ready_timeout:
+                return f"no joint data within {sup.ready_timeout:g} s", sup.tick
+            return None, sup.tick
+        silent = now - self.last_data
+        if sup.stall_timeout is not None and silent > sup.stall_timeout:
+            return f"no robotmon data for {silent:.1f} s", sup.tick
+        if silent < sup.stale_after:
+            return None, sup.tick
+        probe = self.probe
+        if probe is None:
+            self.probe = sup._probe(self.channel, now)
+            if self.probe is None:   # nothing to probe (replay): silence is just silence
+                self.last_data = now
+                return None, sup.tick
+            return None, min(sup.tick, sup.stale_grace)   # look again when the grace runs out
+        if probe["answered"].is_set():
+            if not probe["alive"]:
+                return "SSH keepalive failed", sup.tick
+            self.probe = None
+            self.last_data = now   # quiet but connected; probe again after stale_after
+            if self.suspect:
+                self.suspect = sup._mark_suspect(False)
+            return None, sup.tick
+        if now - probe["sent"] > sup.probe_timeout:
+            if not self.suspect:
+                self.suspect = sup._mark_suspect(True)
+            return f"SSH keepalive unanswered for {sup.probe_timeout:g} s", sup.tick
+        if not self.suspect:
+            if now - probe["sent"] >= sup.stale_grace:
+                self.suspect = sup._mark_suspect(True)
+            else:
+                return None, min(sup.tick, sup.stale_grace - (now - probe["sent"]))
+        return None, sup.tick
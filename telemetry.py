@@ -0,0 +1,296 @@
+"""
+Columnar telemetry store for robot state samples.
+
+A store is a directory with one raw little-endian file per column plus
+meta.json (row count, capacity, label tables). The column files are
+preallocated and memory mapped; appending a sample writes into the mapped
+rows in place, and when the capacity runs out every file grows by a whole
+chunk and is re-mapped, so nothing is allocated per sample. Reading a shift
+back is just mapping the files; range queries binary-search the time column
+and return views, so loading hours of samples takes milliseconds.
+
+Columns (one row per RobotState change):
+    time     float64  wall clock, seconds since the epoch
+    seq      uint64   RobotState sequence number
+    joints   float64  x8, JOINT_NAMES order, NaN while unknown
+    plc_in   uint64   64 PLC input bits (bit i = i-th bit robotmon shows)
+    plc_out  uint64   64 PLC output bits
+    flags    uint8    FLAG_PLC_IN / FLAG_PLC_OUT set when that word is known
+    speed    int32    -1 unless the speed reply was a number
+    mode, coord, servo  uint8 codes into meta.json labels; 0 = unknown
+
+    store = TelemetryStore("telemetry/2025-04-15")
+    store.attach(robot_state)             # records every change
+    ...
+    rows = TelemetryStore("telemetry/2025-04-15", mode="r").query(t0, t1)
+    rows["joints"][:, 0]                  # S over that range
+"""
+import argparse
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from robot_state import JOINT_NAMES
+
+COLUMNS = {
+    "time": ("<f8", ()),
+    "seq": ("<u8", ()),
+    "joints": ("<f8", (len(JOINT_NAMES),)),
+    "plc_in": ("<u8", ()),
+    "plc_out": ("<u8", ()),
+    "flags": ("u1", ()),
+    "speed": ("<i4", ()),
+    "mode": ("u1", ()),
+    "coord": ("u1", ()),
+    "servo": ("u1", ()),
+}
+LABEL_COLUMNS = ("mode", "coord", "servo")
+FLAG_PLC_IN = 1
+FLAG_PLC_OUT = 2
+DEFAULT_CHUNK_ROWS = 65536
+META_FILE = "meta.json"
+
+
+def _speed_value(speed):
+    if isinstance(speed, int):
+        return speed
+    if isinstance(speed, str) and speed.isdigit():
+        return int(speed)
+    return -1
+
+
+class TelemetryStore:
+    """Append-only, memory-mapped columnar sample store. Thread-safe appends."""
+
+    def __init__(self, path, mode="a", chunk_rows=DEFAULT_CHUNK_ROWS, flush_interval=5.0):
+        """
+        Args:
+            path: Store directory; created when mode is "a" and it doesn't exist.
+            mode: "a" to append, "r" to read only.
+            chunk_rows: Rows added to every column file each time the store grows.
+            flush_interval: Seconds between automatic meta.json updates while appending.
+        """
+        if mode not in ("a", "r"):
+            raise ValueError(f"mode must be 'a' or 'r', not {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.chunk_rows = chunk_rows
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._listener = None
+        self._state = None
+
+        meta_path = os.path.join(path, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+            self._count = meta["count"]
+            self._capacity = meta["capacity"]
+            self._labels = {name: meta["labels"][name] for name in LABEL_COLUMNS}
+        elif mode == "a":
+            os.makedirs(path, exist_ok=True)
+            self._count = 0
+            self._capacity = 0
+            self._labels = {name: [None] for name in LABEL_COLUMNS}
+        else:
+            raise FileNotFoundError(f"No telemetry store at {path}")
+        self._codes = {name: {label: i for i, label in enumerate(labels)} for name, labels in self._labels.items()}
+        self._last_flush = time.monotonic()
+        self._maps = {}
+        if mode == "a" and self._capacity == 0:
+            self._grow_locked()
+        else:
+            self._map_locked()
+
+    # --- Files ---
+    def _file(self, name):
+        return os.path.join(self.path, f"{name}.bin")
+
+    def _map_locked(self):
+        self._maps = {}
+        if self._capacity == 0:
+            return
+        access = "r+" if self.mode == "a" else "r"
+        for name, (dtype, shape) in COLUMNS.items():
+            self._maps[name] = np.memmap(self._file(name), dtype=dtype, mode=access,
+                                         shape=(self._capacity,) + shape)
+        # Bound once so append() is plain item assignment
+        m = self._maps
+        self._time, self._seq, self._joints = m["time"], m["seq"], m["joints"]
+        self._plc_in, self._plc_out, self._flags = m["plc_in"], m["plc_out"], m["flags"]
+        self._speed, self._mode, self._coord, self._servo = m["speed"], m["mode"], m["coord"], m["servo"]
+
+    def _grow_locked(self):
+        for column in self._maps.values():
+            column.flush()
+        self._maps = {}
+        self._capacity += self.chunk_rows
+        for name, (dtype, shape) in COLUMNS.items():
+            row_bytes = np.dtype(dtype).itemsize * int(np.prod(shape, dtype=int))
+            with open(self._file(name), "ab") as f:
+                f.truncate(self._capacity * row_bytes)
+        self._map_locked()
+        self._write_meta_locked()
+
+    def _write_meta_locked(self):
+        meta = {
+            "count": self._count,
+            "capacity": self._capacity,
+            "columns": {name: [dtype, list(shape)] for name, (dtype, shape) in COLUMNS.items()},
+            "joint_names": list(JOINT_NAMES),
+            "labels": self._labels,
+        }
+        tmp = os.path.join(self.path, META_FILE + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(self.path, META_FILE))
+        self._last_flush = time.monotonic()
+
+    # --- Writing ---
+    def _code(self, column, label):
+        codes = self._codes[column]
+        code = codes.get(label)
+        if code is None:
+            code = codes[label] = len(self._labels[column])
+            self._labels[column].append(label)
+        return code
+
+    def append(self, t, seq, joints, plc_in, plc_out, mode=None, speed=None, coord=None, servo=None):
+        """Appends one sample. joints is 8 angles or None; PLC words ints or None."""
+        if self.mode != "a":
+            raise ValueError("Telemetry store is open read-only")
+        with self._lock:
+            n = self._count
+            if n == self._capacity:
+                self._grow_locked()
+            # Keep the time column sorted for searchsorted even if the wall clock steps back
+            if n and t < self._time[n - 1]:
+                t = self._time[n - 1]
+            self._time[n] = t
+            self._seq[n] = seq
+            if joints is None:
+                self._joints[n] = np.nan
+            else:
+                self._joints[n] = joints
+            flags = 0
+            if plc_in is not None:
+                self._plc_in[n] = plc_in
+                flags |= FLAG_PLC_IN
+            if plc_out is not None:
+                self._plc_out[n] = plc_out
+                flags |= FLAG_PLC_OUT
+            self._flags[n] = flags
+            self._speed[n] = _speed_value(speed)
+            self._mode[n] = self._code("mode", mode)
+            self._coord[n] = self._code("coord", coord)
+            self._servo[n] = self._code("servo", servo)
+            self._count = n + 1
+            if time.monotonic() - self._last_flush > self.flush_interval:
+                self._write_meta_locked()
+
+    def append_snapshot(self, snap, t=None):
+        """Appends a RobotSnapshot, stamped with `t` or the current wall clock."""
+        self.append(time.time() if t is None else t, snap.seq, snap.joints, snap.plc_in, snap.plc_out,
+                    snap.mode, snap.speed, snap.coord, snap.servo)
+
+    def attach(self, robot_state):
+        """Records every change of `robot_state` until detach()."""
+        self.detach()
+        self._listener = lambda snap, mask: self.append_snapshot(snap)
+        self._state = robot_state
+        robot_state.add_listener(self._listener)
+
+    def detach(self):
+        if self._listener is not None:
+            self._state.remove_listener(self._listener)
+            self._listener = None
+            self._state = None
+
+    def flush(self):
+        """Writes the mapped pages and the row count to disk."""
+        with self._lock:
+            for column in self._maps.values():
+                column.flush()
+            if self.mode == "a":
+                self._write_meta_locked()
+
+    def close(self):
+        self.detach()
+        if self.mode == "a":
+            self.flush()
+        self._maps = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- Reading ---
+    def __len__(self):
+        return self._count
+
+    def column(self, name):
+        """Zero-copy view of every recorded row of one column."""
+        return self._maps[name][:self._count] if self._maps else np.empty((0,) + COLUMNS[name][1], COLUMNS[name][0])
+
+    def labels(self, name):
+        """Label table of mode/coord/servo; code i means labels(name)[i]."""
+        return list(self._labels[name])
+
+    def decode(self, name, codes):
+        """Maps mode/coord/servo codes back to their strings."""
+        return np.array(self._labels[name], dtype=object)[codes]
+
+    def time_range(self):
+        if not self._count:
+            return None
+        t = self.column("time")
+        return float(t[0]), float(t[-1])
+
+    def index_range(self, t0=None, t1=None):
+        """Row slice covering t0 <= time < t1 (either end open when None)."""
+        t = self.column("time")
+        start = 0 if t0 is None else int(np.searchsorted(t, t0, side="left"))
+        stop = len(t) if t1 is None else int(np.searchsorted(t, t1, side="left"))
+        return slice(start, stop)
+
+    def query(self, t0=None, t1=None, columns=None):
+        """Views of `columns` (default all) for t0 <= time < t1."""
+        rows = self.index_range(t0, t1)
+        return {name: self.column(name)[rows] for name in (columns or COLUMNS)}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Telemetry store summary")
+    ap.add_argument("path")
+    args = ap.parse_args()
+
+    start = time.perf_counter()
+    store = TelemetryStore(args.path, mode="r")
+    rows = store.query()
+    elapsed = time.perf_counter() - start
+    print(f"{len(store)} rows, opened and mapped in {elapsed * 1e3:.1f} ms")
+    span = store.time_range()
+    if span:
+        t0, t1 = span
+        print(f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(t0))} .. "
+              f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(t1))} ({t1 - t0:.1f} s)")
+        if t1 > t0:
+            print(f"{len(store) / (t1 - t0):.1f} rows/s")
+        joints = rows["joints"]
+        for i, name in enumerate(JOINT_NAMES):
+            col = joints[:, i]
+            if np.isfinite(col).any():
+                print(f"  {name:>2}: {np.nanmin(col):9.3f} .. {np.nanmax(col):9.3f} deg")
+        for name in LABEL_COLUMNS:
+            labels = [label for label in store.labels(name) if label is not None]
+            if labels:
+                print(f"  {name}: {', '.join(labels)}")
+
+
+if __name__ == "__main__":
+    main()